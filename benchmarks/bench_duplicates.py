@@ -0,0 +1,77 @@
+"""
+Benchmark for cross-page duplicate detection.
+
+Synthetic section embeddings (a few topics, with a share of sections
+duplicated across pages) are written to a memory-mapped file, the way the
+vector index stores them, and the tiled all-pairs search is timed over them.
+The script reports elapsed time, pairs found and peak RSS, which should stay
+far below the size of a dense similarity matrix:
+
+    python -m benchmarks.bench_duplicates [--sections N] [--dim D] [--workers W] [--block-rows B]
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+import numpy as np
+from similarity_analyzer.duplicates import DisjointSet, similar_pairs
+
+def synthetic_index(path: str, count: int, dim: int, duplicate_share: float, rng) -> np.memmap:
+    """Writes unit-length vectors to `path` in blocks and returns them memory-mapped."""
+    vectors = np.memmap(path, dtype=np.float32, mode="w+", shape=(count, dim))
+    centroids = rng.normal(size=(64, dim)).astype(np.float32)
+    block = 65536
+    for start in range(0, count, block):
+        stop = min(start + block, count)
+        rows = centroids[rng.integers(0, len(centroids), size=stop - start)]
+        rows += rng.normal(scale=1.0, size=rows.shape).astype(np.float32)
+        vectors[start:stop] = rows / np.linalg.norm(rows, axis=1, keepdims=True)
+    # Copy a share of sections to random other rows, with a little noise
+    duplicates = int(count * duplicate_share)
+    sources = rng.integers(0, count, size=duplicates)
+    targets = rng.integers(0, count, size=duplicates)
+    for start in range(0, duplicates, block):
+        block_sources = np.sort(sources[start:start + block])
+        copies = vectors[block_sources] + rng.normal(scale=0.02, size=(len(block_sources), dim)).astype(np.float32)
+        vectors[np.sort(targets[start:start + block])] = copies / np.linalg.norm(copies, axis=1, keepdims=True)
+    vectors.flush()
+    return np.memmap(path, dtype=np.float32, mode="r", shape=(count, dim))
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2**20 if sys.platform == 'darwin' else 2**10)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sections', type=int, default=500000, help='Number of section embeddings.')
+    parser.add_argument('--dim', type=int, default=512, help='Embedding dimension.')
+    parser.add_argument('--duplicate-share', type=float, default=0.05, help='Share of sections copied elsewhere.')
+    parser.add_argument('--threshold', type=float, default=0.9, help='Cosine similarity threshold.')
+    parser.add_argument('--workers', type=int, default=None, help='Worker threads; defaults to DUPLICATE_WORKERS.')
+    parser.add_argument('--block-rows', type=int, default=None, help='Tile size; defaults to DUPLICATE_BLOCK_ROWS.')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        vectors = synthetic_index(os.path.join(tmp, 'vectors.f32'), args.sections, args.dim, args.duplicate_share, rng)
+        rss_before = peak_rss_mb()
+        start = time.perf_counter()
+        firsts, seconds, _ = similar_pairs(vectors, args.threshold, args.block_rows, args.workers)
+        elapsed = time.perf_counter() - start
+        groups = DisjointSet(args.sections)
+        for first, second in zip(firsts.tolist(), seconds.tolist()):
+            groups.union(first, second)
+        clusters = len(set(groups.find(row) for row in np.unique(np.concatenate((firsts, seconds))).tolist()))
+        cluster_elapsed = time.perf_counter() - start - elapsed
+
+    pairs = args.sections * (args.sections - 1) // 2
+    dense_gb = args.sections ** 2 * 4 / 2**30
+    print(f"{args.sections} sections x {args.dim} dims: {elapsed:.1f}s for {pairs:.3g} pairs "
+          f"({pairs / elapsed:.3g} pairs/s), clustering {cluster_elapsed:.1f}s")
+    print(f"{len(firsts)} pairs above {args.threshold}, {clusters} clusters")
+    print(f"Peak RSS {peak_rss_mb():.0f}MB ({rss_before:.0f}MB before the search; a dense matrix would need {dense_gb:.0f}GB)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark for quantized embedding storage and scoring.
+
+Synthetic clustered embeddings (shaped like sections of many pages on a few
+topics) are stored as float32, float16 and int8, and for each format the
+script reports memory per million sections, scoring throughput for a batch of
+queries, and score error and top-k recall against float32:
+
+    python -m benchmarks.bench_quantization [--sections N] [--dim D] [--queries Q]
+"""
+import argparse
+import time
+import numpy as np
+from similarity_analyzer.quantization import DTYPES, QuantizedEmbeddings, quantization_report
+from similarity_analyzer.similarity_scorer import calculate_similarity_matrix
+
+def synthetic_embeddings(count: int, dim: int, topics: int, rng) -> np.ndarray:
+    """Returns float32 vectors scattered around a few topic centroids."""
+    centroids = rng.normal(size=(topics, dim)).astype(np.float32)
+    embeddings = centroids[rng.integers(0, topics, size=count)]
+    embeddings += rng.normal(scale=0.6, size=(count, dim)).astype(np.float32)
+    return embeddings
+
+def best_of(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(sections: int, dim: int, queries: int, repeat: int) -> int:
+    rng = np.random.default_rng(0)
+    embeddings = synthetic_embeddings(sections, dim, 64, rng)
+    query_embeddings = synthetic_embeddings(queries, dim, 64, rng)
+
+    print(f"{sections} sections x {dim} dims, {queries} queries")
+    print(f"{'format':<10}{'MB per 1M':>11}{'sections/s':>14}{'max err':>10}{'mean err':>10}{'top-10 recall':>15}")
+    for dtype in DTYPES:
+        stored = QuantizedEmbeddings.quantize(embeddings, dtype)
+        seconds = best_of(lambda: calculate_similarity_matrix(query_embeddings, stored), repeat)
+        report = quantization_report(embeddings, query_embeddings, dtype)
+        print(f"{dtype:<10}{report['bytes_per_vector'] * 1e6 / 2**20:>11.0f}{sections * queries / seconds:>14.3g}"
+              f"{report['max_abs_error']:>10.4f}{report['mean_abs_error']:>10.4f}{report['top_k_recall']:>15.3f}")
+
+    # Unquantized float64 input, as the Gemini backend used to return it
+    raw = embeddings.astype(np.float64)
+    seconds = best_of(lambda: calculate_similarity_matrix(query_embeddings, raw), repeat)
+    print(f"{'raw f64':<10}{raw.nbytes / sections * 1e6 / 2**20:>11.0f}{sections * queries / seconds:>14.3g}")
+    return 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sections', type=int, default=200000, help='Number of section embeddings.')
+    parser.add_argument('--dim', type=int, default=512, help='Embedding dimension.')
+    parser.add_argument('--queries', type=int, default=32, help='Queries scored per batch.')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per format; the best is reported.')
+    args = parser.parse_args()
+    raise SystemExit(main(args.sections, args.dim, args.queries, args.repeat))
@@ -0,0 +1,53 @@
+"""
+Benchmark for cold import time of the package entry points.
+
+Each module is imported in a fresh interpreter several times, and the median
+import time and any heavy backends loaded at import time are reported. Heavy
+backends must only be imported on first use, so the script exits with status 1
+if one is loaded at import time or if an import exceeds its time budget:
+
+    python -m benchmarks.bench_startup [--budget SECONDS]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+ENTRY_POINTS = ['similarity_analyzer.pipeline', 'similarity_analyzer.cli', 'similarity_analyzer.main']
+# Backends that take seconds to import and are only needed once a model or API is used
+HEAVY_MODULES = ['tensorflow', 'tensorflow_hub', 'google.generativeai', 'google.cloud.language_v1',
+                 'sklearn', 'nltk']
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(','.join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+def measure(module: str) -> tuple:
+    """Imports a module in a fresh interpreter and returns (seconds, heavy modules loaded)."""
+    output = subprocess.run([sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                            capture_output=True, text=True, check=True).stdout.split('\n')
+    return float(output[0]), [name for name in output[1].split(',') if name]
+
+def main(repeat: int, budget: float) -> int:
+    failed = False
+    print(f"{'module':<32}{'median s':>10}{'min s':>8}  heavy modules loaded")
+    for module in ENTRY_POINTS:
+        runs = [measure(module) for _ in range(repeat)]
+        durations = [seconds for seconds, _ in runs]
+        heavy = sorted({name for _, loaded in runs for name in loaded})
+        median = statistics.median(durations)
+        print(f"{module:<32}{median:>10.3f}{min(durations):>8.3f}  {', '.join(heavy) or '-'}")
+        failed = failed or bool(heavy) or median > budget
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=2.0, help='Maximum median import time in seconds.')
+    args = parser.parse_args()
+    sys.exit(main(args.repeat, args.budget))
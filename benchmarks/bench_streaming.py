@@ -0,0 +1,80 @@
+"""
+Benchmark for streaming, memory-bounded page parsing.
+
+A synthetic catalog page of the requested size is generated chunk by chunk.
+It is parsed once the way `scrape_webpage` does it, from the full document
+text, and once the way `stream_webpage` does it, fed to the incremental
+parser in network-sized chunks and deduplicated in windows. The script
+reports elapsed time and the peak memory traced by tracemalloc for each:
+
+    python -m benchmarks.bench_streaming [--megabytes M] [--chunk-bytes B] [--window N]
+"""
+import argparse
+import itertools
+import time
+import tracemalloc
+import numpy as np
+from similarity_analyzer.config import CONFIG
+from similarity_analyzer.web_scraper import SectionDeduplicator, _extract_sections, parse_html, stream_html_events
+
+def catalog_chunks(megabytes: float, chunk_bytes: int):
+    """Yields a catalog page of about `megabytes` MB in chunks of `chunk_bytes` bytes."""
+    rng = np.random.default_rng(0)
+    vocabulary = [f"word{i}" for i in range(5000)]
+    head = b"<html><head><title>Catalog</title></head><body><main>"
+    yield head
+    size = len(head)
+    buffer = b""
+    for i in itertools.count():
+        if size >= megabytes * 2**20:
+            break
+        description = " ".join(vocabulary[j] for j in rng.integers(0, len(vocabulary), size=30))
+        item = (f"<div class='product'><h2>Product {i}</h2><p>{description}</p>"
+                f"<ul><li>SKU {i:08d}</li></ul></div>").encode()
+        buffer += item
+        size += len(item)
+        if len(buffer) >= chunk_bytes:
+            yield buffer
+            buffer = b""
+    yield buffer + b"</main></body></html>"
+
+def measure(function) -> tuple:
+    """Runs `function` and returns its result, elapsed seconds and traced peak memory in MB."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--megabytes', type=float, default=20, help='Size of the synthetic page.')
+    parser.add_argument('--chunk-bytes', type=int, default=65536, help='Bytes per network chunk.')
+    parser.add_argument('--window', type=int, default=64, help='Sections per streamed batch.')
+    args = parser.parse_args()
+
+    def full_parse():
+        html = b"".join(catalog_chunks(args.megabytes, args.chunk_bytes)).decode()
+        return len(parse_html(html)['sections'])
+
+    def streamed_parse():
+        deduplicator = SectionDeduplicator(max_sections=CONFIG["STREAM_DEDUP_MAX_SECTIONS"])
+        sections = _extract_sections(stream_html_events(catalog_chunks(args.megabytes, args.chunk_bytes)))
+        count = 0
+        while True:
+            window = [text for text, _ in itertools.islice(sections, args.window)]
+            if not window:
+                return count
+            count += len(deduplicator.filter(window))
+
+    full_count, full_seconds, full_peak = measure(full_parse)
+    stream_count, stream_seconds, stream_peak = measure(streamed_parse)
+    print(f"{args.megabytes:g}MB page, {full_count} sections")
+    print(f"Full parse:     {full_seconds:.2f}s, peak {full_peak:.1f}MB")
+    print(f"Streamed parse: {stream_seconds:.2f}s, peak {stream_peak:.1f}MB ({stream_count} sections, "
+          f"{args.chunk_bytes // 1024}KB chunks, windows of {args.window})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+"""
+Offline benchmark suite covering each stage of the analysis pipeline.
+
+Every case runs in a fresh interpreter, so its peak RSS is its own, and is
+timed over several iterations after a warm-up run. For each case the suite
+reports p50 and p95 latency, throughput and peak RSS:
+
+    scrape           parse_html on recorded pages (--html) or synthetic fixtures
+    preprocess       preprocess_texts on synthetic sections
+    embed            the preprocess/embed pipeline with a stub embedding backend
+                     that takes --embed-latency seconds per batch
+    score_<n>        calculate_similarity against n sections, for each --sizes
+    analyze_webpage  end to end against a local HTTP server, with stub embedding
+                     and NLP backends
+
+No network access, model or API key is needed. Runs are compared against the
+baseline committed as benchmarks/baseline.json; the suite exits with status 1
+if a case is slower or uses more memory than the baseline allows, or if there
+is no baseline to compare against. --save-baseline records a new one:
+
+    python -m benchmarks.bench_suite [--case NAME ...] [--save-baseline] [--baseline PATH]
+"""
+import argparse
+import asyncio
+import hashlib
+import http.server
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import numpy as np
+from benchmarks.bench_web_scraper import WORDS, default_fixtures
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+def synthetic_sections(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 60))).capitalize() + '.' for _ in range(count)]
+
+def stub_embed_fn(dim: int, latency: float):
+    """Returns an embed_fn with a fixed per-batch latency and deterministic vectors per text."""
+    def embed(model_name, texts):
+        time.sleep(latency)
+        seeds = [int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=4).digest(), 'big') for text in texts]
+        return np.stack([np.random.default_rng(seed).standard_normal(dim, dtype=np.float32) for seed in seeds])
+    return embed
+
+def stub_nlp(latency: float):
+    async def analyze_all_sections(sections, client=None, max_concurrency=None):
+        await asyncio.sleep(latency)
+        return [None] * len(sections), [[] for _ in sections]
+    return analyze_all_sections
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2**20 if sys.platform == 'darwin' else 2**10)
+
+# Each setup function prepares a case and returns (callable, items processed per call, item unit)
+
+def setup_scrape(args):
+    from similarity_analyzer.web_scraper import parse_html
+
+    pages = []
+    for path in args.html or default_fixtures():
+        with open(path, encoding='utf-8', errors='replace') as f:
+            pages.append(f.read())
+    return (lambda: [parse_html(html) for html in pages]), sum(map(len, pages)) / 2**20, 'MB'
+
+def setup_preprocess(args):
+    from similarity_analyzer.text_preprocessor import preprocess_texts
+
+    sections = synthetic_sections(args.sections)
+    return (lambda: preprocess_texts(sections)), len(sections), 'sections'
+
+def setup_embed(args):
+    from similarity_analyzer.config import CONFIG
+    from similarity_analyzer.pipeline import embed_sections_pipelined
+
+    CONFIG["EMBEDDING_CACHE_ENABLED"] = False
+    sections = synthetic_sections(args.sections)
+    embed_fn = stub_embed_fn(args.dim, args.embed_latency)
+    return (lambda: asyncio.run(embed_sections_pipelined(sections, 'stub', {}, embed_fn))), len(sections), 'sections'
+
+def setup_score(args, size: int):
+    from similarity_analyzer.similarity_scorer import calculate_similarity
+
+    rng = np.random.default_rng(0)
+    query = rng.standard_normal((1, args.dim), dtype=np.float32)
+    sections = rng.standard_normal((size, args.dim), dtype=np.float32)
+    return (lambda: calculate_similarity(query, sections)), size, 'sections'
+
+def setup_analyze_webpage(args):
+    from similarity_analyzer import pipeline
+    from similarity_analyzer.config import CONFIG
+
+    CONFIG["EMBEDDING_CACHE_ENABLED"] = False
+    pipeline.analyze_all_sections = stub_nlp(args.nlp_latency)
+    page = (args.html or default_fixtures())[0]
+    with open(page, 'rb') as f:
+        body = f.read()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_address[1]}/"
+    embed_fn = stub_embed_fn(args.dim, args.embed_latency)
+    sections = len(pipeline.scrape_webpage(url)['sections'])
+    return (lambda: asyncio.run(pipeline.analyze_webpage(url, 'content audit', 'stub', embed_fn=embed_fn))), sections, 'sections'
+
+def case_setups(args) -> dict:
+    setups = {
+        'scrape': setup_scrape,
+        'preprocess': setup_preprocess,
+        'embed': setup_embed,
+    }
+    for size in args.sizes:
+        setups[f'score_{size}'] = lambda args, size=size: setup_score(args, size)
+    setups['analyze_webpage'] = setup_analyze_webpage
+    return setups
+
+def run_case(name: str, args) -> dict:
+    """Runs one case in this process and returns its measurements."""
+    fn, items, unit = case_setups(args)[name](args)
+    fn()  # Warm-up: imports, lazily loaded resources, first-call allocations
+    durations = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    p50 = statistics.median(durations)
+    return {
+        'p50_s': p50,
+        'p95_s': durations[min(len(durations) - 1, round(0.95 * (len(durations) - 1)))],
+        'throughput': items / p50 if p50 else float('inf'),
+        'unit': f"{unit}/s",
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+def run_isolated(name: str, argv: list) -> dict:
+    """Runs one case in a fresh interpreter and returns its measurements."""
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_suite', '--run-case', name, *argv],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def compare(results: dict, baseline: dict, time_tolerance: float, rss_tolerance: float, time_slack: float = 0.0) -> list:
+    """
+    Returns a description of every case that regressed against the baseline.
+
+    A case regresses when its p50 exceeds the baseline by more than
+    `time_tolerance` (a fraction) plus `time_slack` seconds, which keeps
+    sub-millisecond cases from failing on timer noise, or when its peak RSS
+    exceeds the baseline by more than `rss_tolerance`.
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if result['p50_s'] > previous['p50_s'] * (1 + time_tolerance) + time_slack:
+            regressions.append(f"{name}: p50 {result['p50_s']:.4f}s vs baseline {previous['p50_s']:.4f}s")
+        if result['peak_rss_mb'] > previous['peak_rss_mb'] * (1 + rss_tolerance):
+            regressions.append(f"{name}: peak RSS {result['peak_rss_mb']:.0f}MB vs baseline {previous['peak_rss_mb']:.0f}MB")
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--case', action='append', help='Case to run; repeat for several. Defaults to all.')
+    parser.add_argument('--html', action='append', help='Recorded HTML page to parse; repeat for several.')
+    parser.add_argument('--sections', type=int, default=2000, help='Sections for the preprocess and embed cases.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10**3, 10**4, 10**5, 10**6],
+                        help='Section counts for the score cases.')
+    parser.add_argument('--dim', type=int, default=256, help='Embedding dimension of the stub backend.')
+    parser.add_argument('--embed-latency', type=float, default=0.02, help='Seconds per stub embedding batch.')
+    parser.add_argument('--nlp-latency', type=float, default=0.05, help='Seconds per stub NLP call.')
+    parser.add_argument('--repeat', type=int, default=7, help='Timed iterations per case.')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline results file.')
+    parser.add_argument('--save-baseline', action='store_true', help='Write this run as the new baseline.')
+    parser.add_argument('--time-tolerance', type=float, default=0.25, help='Allowed p50 slowdown, as a fraction.')
+    parser.add_argument('--time-slack', type=float, default=0.002, help='Allowed p50 slowdown in seconds, on top of the fraction.')
+    parser.add_argument('--rss-tolerance', type=float, default=0.2, help='Allowed peak RSS growth, as a fraction.')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    args = parse_args(argv)
+    if args.run_case:
+        print(json.dumps(run_case(args.run_case, args)))
+        return 0
+
+    names = args.case or list(case_setups(args))
+    unknown = set(names) - set(case_setups(args))
+    if unknown:
+        print(f"Unknown case(s): {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+    # Options other than the case selection and baseline handling are passed on to each case
+    case_argv = []
+    for option in ('--sections', '--dim', '--embed-latency', '--nlp-latency', '--repeat'):
+        case_argv += [option, str(getattr(args, option[2:].replace('-', '_')))]
+    case_argv += ['--sizes', *map(str, args.sizes)]
+    for path in args.html or []:
+        case_argv += ['--html', path]
+
+    results = {}
+    print(f"{'case':<18}{'p50 s':>10}{'p95 s':>10}{'throughput':>16}  {'unit':<14}{'peak RSS MB':>12}")
+    for name in names:
+        result = results[name] = run_isolated(name, case_argv)
+        print(f"{name:<18}{result['p50_s']:>10.4f}{result['p95_s']:>10.4f}{result['throughput']:>16.4g}  "
+              f"{result['unit']:<14}{result['peak_rss_mb']:>12.0f}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one", file=sys.stderr)
+        return 1
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.time_tolerance, args.rss_tolerance, args.time_slack)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    if not regressions:
+        print(f"No regressions against {args.baseline}")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,87 @@
+"""
+Benchmark for section extraction in web_scraper.
+
+Compares the previous find_all-based extraction with parse_html on large HTML
+fixtures and reports parse time, with and without duplicate collapsing, and the
+resulting section counts and total characters sent to the embedder. Pass saved pages as
+arguments, or run without arguments to generate synthetic fixtures under
+benchmarks/fixtures/:
+
+    python -m benchmarks.bench_web_scraper [page.html ...]
+"""
+import os
+import random
+import statistics
+import sys
+import time
+from bs4 import BeautifulSoup
+from similarity_analyzer import web_scraper
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+WORDS = ("search engine content page query relevance section keyword ranking audit site product "
+         "catalog documentation customer service pricing feature guide support article news").split()
+
+def legacy_extract(html: str) -> list:
+    """The extraction used before the single-pass engine, kept as the comparison baseline."""
+    soup = BeautifulSoup(html, 'html.parser')
+    sections = []
+    for element in soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'div', 'section', 'article', 'li']):
+        text = element.get_text(strip=True)
+        if text:
+            sections.append(text)
+    return sections
+
+def _sentence(rng: random.Random) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 30))).capitalize() + '.'
+
+def generate_fixture(path: str, blocks: int, depth: int, seed: int = 0):
+    """Writes a deeply nested page with repeated boilerplate, similar to large CMS pages."""
+    rng = random.Random(seed)
+    boilerplate = '<div class="cta"><p>Contact our team today to learn more about our products and services.</p></div>'
+    parts = ['<!DOCTYPE html><html><head><title>Fixture</title><script>var tracking = 1;</script></head><body>',
+             '<nav><ul>' + ''.join(f'<li><a href="/p{i}">Link {i}</a></li>' for i in range(40)) + '</ul></nav>']
+    for block in range(blocks):
+        opening = ''.join(f'<div class="wrap-{level}">' if level % 2 else '<section>' for level in range(depth))
+        closing = ''.join('</div>' if level % 2 else '</section>' for level in reversed(range(depth)))
+        body = f'<article><h2>Heading {block}</h2>' + ''.join(f'<p>{_sentence(rng)}</p>' for _ in range(3))
+        body += '<ul>' + ''.join(f'<li>{_sentence(rng)}</li>' for _ in range(2)) + '</ul></article>'
+        parts.append(opening + body + (boilerplate if block % 5 == 0 else '') + closing)
+    parts.append('<footer><p>Copyright Example Inc. All rights reserved.</p></footer></body></html>')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(''.join(parts))
+
+def default_fixtures() -> list:
+    specs = [('medium_nested.html', 200, 4), ('large_nested.html', 1000, 6), ('catalog_flat.html', 3000, 1)]
+    paths = []
+    for name, blocks, depth in specs:
+        path = os.path.join(FIXTURE_DIR, name)
+        if not os.path.exists(path):
+            generate_fixture(path, blocks, depth)
+        paths.append(path)
+    return paths
+
+def timed(func, *args, repeat: int = 3):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        durations.append(time.perf_counter() - start)
+    return result, statistics.median(durations)
+
+def main(paths: list):
+    print(f"parser backend: {'lxml' if web_scraper.HAS_LXML else 'html.parser'}")
+    print(f"{'fixture':<22}{'size':>9}{'legacy s':>10}{'extract s':>11}{'+dedup s':>10}"
+          f"{'legacy sec':>12}{'extract sec':>13}{'dedup sec':>11}{'legacy chars':>14}{'dedup chars':>13}")
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            html = f.read()
+        legacy, legacy_time = timed(legacy_extract, html)
+        extracted, extract_time = timed(web_scraper.parse_html, html, None, False)
+        parsed, dedup_time = timed(web_scraper.parse_html, html)
+        print(f"{os.path.basename(path):<22}{len(html) // 1024:>7}KB{legacy_time:>10.3f}{extract_time:>11.3f}"
+              f"{dedup_time:>10.3f}{len(legacy):>12}{len(extracted['sections']):>13}{len(parsed['sections']):>11}"
+              f"{sum(map(len, legacy)):>14}{sum(map(len, parsed['sections'])):>13}")
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or default_fixtures())
@@ -6,12 +6,14 @@ setup(
     description="A tool to analyze webpage content similarity to a given query",
     packages=find_packages(),
     include_package_data=True,
+    package_data={
+        'similarity_analyzer': ['data/*.txt'],
+    },
     install_requires=[
         'streamlit',
         'beautifulsoup4',
         'requests',
         'numpy',
-        'scikit-learn',
         'tensorflow-hub',
         'plotly',
         'nltk',
@@ -21,9 +23,18 @@ setup(
         'typer',
         'playwright',
     ],
+    extras_require={
+        'fast': ['lxml'],
+        'parquet': ['pyarrow'],
+        'onnx': ['onnxruntime', 'tokenizers'],
+    },
     entry_points={
         'console_scripts': [
             'similarity_analyzer=similarity_analyzer.main:main',
+            'similarity_analyzer_batch=similarity_analyzer.cli:app',
+            'similarity_analyzer_server=similarity_analyzer.server:app',
+            'similarity_analyzer_duplicates=similarity_analyzer.duplicates:app',
+            'similarity_analyzer_results=similarity_analyzer.result_store:app',
         ],
     },
 )
@@ -0,0 +1,198 @@
+import logging
+import re
+import numpy as np
+from similarity_analyzer.config import CONFIG
+from similarity_analyzer.text_preprocessor import split_sentences
+from similarity_analyzer.instrumentation import telemetry
+
+logger = logging.getLogger(__name__)
+
+# Words and punctuation marks; close to, and never far above, subword tokenizer counts for English text
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+def count_tokens(text: str) -> int:
+    """
+    Estimates the number of model tokens in a text.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: The number of words and punctuation marks in the text.
+    """
+    return len(TOKEN_PATTERN.findall(text))
+
+def _split_words(text: str, max_tokens: int) -> list:
+    """Cuts text at word boundaries into (piece, tokens) pairs of at most `max_tokens` tokens."""
+    pieces, words, total = [], [], 0
+    for word in text.split():
+        tokens = count_tokens(word)
+        if words and total + tokens > max_tokens:
+            pieces.append((" ".join(words), total))
+            words, total = [], 0
+        words.append(word)
+        total += tokens
+    if words:
+        pieces.append((" ".join(words), total))
+    return pieces
+
+def split_section(text: str, max_tokens: int, overlap_tokens: int) -> list:
+    """
+    Splits a long text at sentence boundaries into overlapping windows.
+
+    Sentences are packed into windows of at most `max_tokens` tokens, and each
+    window repeats the trailing sentences of the previous one, up to
+    `overlap_tokens` tokens, so no sentence loses its context at a window
+    boundary. A sentence longer than a window is cut at word boundaries.
+
+    Args:
+        text (str): The text to split.
+        max_tokens (int): Maximum tokens per window.
+        overlap_tokens (int): Maximum tokens repeated from the previous window.
+
+    Returns:
+        list: The window texts, in order.
+    """
+    # Oversized sentences are cut into overlap-sized pieces so the overlap can still be carried over
+    piece_tokens = overlap_tokens or max_tokens
+    pieces = []
+    for sentence in split_sentences(text):
+        tokens = count_tokens(sentence)
+        if tokens > max_tokens:
+            pieces.extend(_split_words(sentence, piece_tokens))
+        elif tokens:
+            pieces.append((sentence, tokens))
+
+    windows, current, total = [], [], 0
+    for piece, tokens in pieces:
+        if current and total + tokens > max_tokens:
+            windows.append(" ".join(text for text, _ in current))
+            carried, carried_total = [], 0
+            for previous, previous_tokens in reversed(current):
+                if carried_total + previous_tokens > overlap_tokens or \
+                        carried_total + previous_tokens + tokens > max_tokens:
+                    break
+                carried.insert(0, (previous, previous_tokens))
+                carried_total += previous_tokens
+            current, total = carried, carried_total
+        current.append((piece, tokens))
+        total += tokens
+    if current:
+        windows.append(" ".join(text for text, _ in current))
+    return windows or [text]
+
+def chunk_sections(sections: list, max_tokens: int = None, min_tokens: int = None, overlap_tokens: int = None,
+                   regions: list = None) -> tuple:
+    """
+    Repacks page sections into chunks of bounded size for embedding.
+
+    Runs of adjacent sections shorter than `min_tokens` (list items, captions,
+    buttons) are merged until the chunk reaches `min_tokens`, never across two
+    page regions. Sections longer than `max_tokens` are split into overlapping
+    windows with `split_section`. Other sections become one chunk each.
+
+    Args:
+        sections (list): The raw text sections, in page order.
+        max_tokens (int): Maximum tokens per chunk. Defaults to CONFIG["CHUNK_MAX_TOKENS"].
+        min_tokens (int): Sections below this size are merged with their neighbours;
+            0 disables merging. Defaults to CONFIG["CHUNK_MIN_TOKENS"].
+        overlap_tokens (int): Tokens repeated between windows of a split section.
+            Defaults to CONFIG["CHUNK_OVERLAP_TOKENS"].
+        regions (list): Optional region label of each section (see `web_scraper.parse_html`).
+
+    Returns:
+        tuple: The chunk texts, and for each chunk the (start, stop) range of
+               sections it was built from. Chunks are in page order and every
+               section belongs to at least one chunk.
+    """
+    max_tokens = max_tokens or CONFIG["CHUNK_MAX_TOKENS"]
+    min_tokens = CONFIG["CHUNK_MIN_TOKENS"] if min_tokens is None else min_tokens
+    overlap_tokens = CONFIG["CHUNK_OVERLAP_TOKENS"] if overlap_tokens is None else overlap_tokens
+    overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    with telemetry.span("chunk_sections"):
+        counts = [count_tokens(section) for section in sections]
+        chunks, spans = [], []
+        index = 0
+        while index < len(sections):
+            if counts[index] > max_tokens:
+                windows = split_section(sections[index], max_tokens, overlap_tokens)
+                chunks.extend(windows)
+                spans.extend([(index, index + 1)] * len(windows))
+                index += 1
+                continue
+            start, total = index, counts[index]
+            index += 1
+            while (total < min_tokens and index < len(sections) and counts[index] < min_tokens
+                   and total + counts[index] <= max_tokens
+                   and (regions is None or regions[index] == regions[start])):
+                total += counts[index]
+                index += 1
+            chunks.append("\n".join(sections[start:index]))
+            spans.append((start, index))
+
+    telemetry.count("chunks_total", len(chunks))
+    logger.debug(f"Chunked {len(sections)} sections into {len(chunks)} chunks")
+    return chunks, spans
+
+def _section_entries(spans: list, count: int) -> tuple:
+    """
+    Lists every (chunk, section) pair of a chunking.
+
+    Returns:
+        tuple: The chunk and section index of each pair, ordered by section, and
+               the position of each section's first pair.
+    """
+    spans = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+    lengths = spans[:, 1] - spans[:, 0]
+    # Sections are non-decreasing because chunks are in page order
+    chunk_index = np.repeat(np.arange(len(spans)), lengths)
+    offsets = np.arange(len(chunk_index)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    section_index = spans[chunk_index, 0] + offsets
+    return chunk_index, section_index, np.searchsorted(section_index, np.arange(count))
+
+def rollup_scores(chunk_scores, spans: list, count: int) -> np.ndarray:
+    """
+    Maps chunk scores back to the sections the chunks were built from.
+
+    A section takes the best score of the chunks that contain it: a split
+    section scores as its best-matching window, and merged sections share the
+    score of their chunk.
+
+    Args:
+        chunk_scores: Chunk scores, or a (queries x chunks) score matrix.
+        spans (list): The section range of each chunk, from `chunk_sections`.
+        count (int): The number of sections.
+
+    Returns:
+        numpy.ndarray: Section scores, or a (queries x sections) score matrix.
+    """
+    chunk_scores = np.asarray(chunk_scores)
+    if count == 0:
+        return chunk_scores[..., :0]
+    chunk_index, _, starts = _section_entries(spans, count)
+    return np.maximum.reduceat(chunk_scores[..., chunk_index], starts, axis=-1)
+
+def best_chunks(chunk_scores, spans: list, count: int) -> np.ndarray:
+    """
+    Returns the index of the best-scoring chunk of each section.
+
+    Args:
+        chunk_scores: The score of each chunk.
+        spans (list): The section range of each chunk, from `chunk_sections`.
+        count (int): The number of sections.
+
+    Returns:
+        numpy.ndarray: One chunk index per section; `chunk_scores` at these
+                       indices equals `rollup_scores(chunk_scores, spans, count)`.
+    """
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+    chunk_scores = np.asarray(chunk_scores, dtype=float)
+    chunk_index, section_index, starts = _section_entries(spans, count)
+    values = chunk_scores[chunk_index]
+    is_best = values == np.maximum.reduceat(values, starts)[section_index]
+    best_entries = np.flatnonzero(is_best)
+    # Keep the first best chunk of each section
+    _, first = np.unique(section_index[best_entries], return_index=True)
+    return chunk_index[best_entries[first]]
@@ -0,0 +1,459 @@
+import asyncio
+import csv
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import typer
+from similarity_analyzer.client import analyze_remote
+from similarity_analyzer.config import CONFIG
+from similarity_analyzer.embedding_generator import EMBEDDING_MODELS
+from similarity_analyzer.instrumentation import start_from_config
+from similarity_analyzer.quota import BATCH, request_priority
+from similarity_analyzer.result_store import get_result_store, section_rows
+from similarity_analyzer.pipeline import analyze_webpage, analyze_webpage_stream, reanalyze_webpage
+
+logger = logging.getLogger(__name__)
+
+app = typer.Typer(help="Headless batch analysis of (url, query) pairs.")
+
+# A Parquet part file is finished after this many pages
+PARQUET_PAGES_PER_PART = 50
+
+# Parquet rows are buffered up to this many before they are written out as a row group
+PARQUET_ROWS_PER_GROUP = 10000
+
+def read_pairs(path: str):
+    """
+    Reads (url, query) pairs from a CSV, TSV or JSON Lines file.
+
+    CSV and TSV files have the URL in the first column and the query in the
+    second; a "url,query" header row is skipped. JSON Lines files contain
+    objects with "url" and "query" keys. Duplicate pairs are yielded once.
+
+    Args:
+        path (str): The input file.
+
+    Yields:
+        tuple: (url, query) pairs in file order.
+    """
+    seen = set()
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            rows = ((record["url"], record["query"]) for record in map(json.loads, f) if record)
+        else:
+            reader = csv.reader(f, delimiter="\t" if path.endswith(".tsv") else ",")
+            rows = (row[:2] for row in reader if len(row) >= 2)
+        for url, query in rows:
+            url, query = url.strip(), query.strip()
+            if (url.lower(), query.lower()) == ("url", "query") or not url or (url, query) in seen:
+                continue
+            seen.add((url, query))
+            yield url, query
+
+class SpooledRows:
+    """
+    Section records of one streamed page, spooled to a temporary JSON Lines file.
+
+    Rows are appended batch by batch while the page is analyzed and read back
+    lazily by the result writer, so a page's rows are never all in memory.
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+        self.count = 0
+
+    def extend(self, rows: list):
+        self._file.write("".join(json.dumps(row) + "\n" for row in rows))
+        self.count += len(rows)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self):
+        self._file.seek(0)
+        return (json.loads(line) for line in self._file)
+
+    def close(self):
+        self._file.close()
+
+class ProgressLog:
+    """
+    Append-only record of finished pages, written after their rows are durable.
+
+    Each line records the page key, its status and where its rows ended up in
+    the output, so a resumed run can skip finished pages and discard output
+    written after the last recorded page.
+    """
+
+    def __init__(self, path: str, resume: bool):
+        self.path = path
+        self.entries = []
+        valid_bytes = 0
+        if resume and os.path.exists(path):
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    self.entries.append(json.loads(line))
+                    valid_bytes += len(line)
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+        # Drop a partially written last line
+        self._file.truncate(valid_bytes)
+
+    def completed(self) -> set:
+        return {(entry["url"], entry["query"]) for entry in self.entries if entry["status"] == "ok"}
+
+    def record(self, entries: list):
+        for entry in entries:
+            self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.entries.extend(entries)
+
+    def close(self):
+        self._file.close()
+
+def open_page_log(path: str, completed: set, resume: bool):
+    """
+    Opens a JSON Lines file of per-page records, such as score changes or summaries.
+
+    When resuming, lines of pages missing from `completed` are dropped first:
+    those pages are analyzed again and would otherwise be written twice.
+
+    Args:
+        path (str): Path of the file.
+        completed (set): (url, query) pairs recorded in the progress log.
+        resume (bool): Whether to continue an interrupted run.
+
+    Returns:
+        file: The file, opened for appending.
+    """
+    if resume and os.path.exists(path):
+        kept = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                record = json.loads(line)
+                if (record["url"], record["query"]) in completed:
+                    kept.append(line)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.writelines(kept)
+        os.replace(path + ".tmp", path)
+    return open(path, "a" if resume else "w", encoding="utf-8")
+
+class JsonlResultWriter:
+    """
+    Streams section records to a JSON Lines file, one page at a time.
+    """
+
+    def __init__(self, path: str, progress: ProgressLog, resume: bool):
+        self.progress = progress
+        offsets = [entry["offset"] for entry in progress.entries if "offset" in entry]
+        self._file = open(path, "r+b" if resume and os.path.exists(path) else "wb")
+        # Rows written after the last recorded page belong to an unfinished write
+        self._file.truncate(offsets[-1] if offsets else 0)
+        self._file.seek(0, os.SEEK_END)
+
+    def add_page(self, entry: dict, rows: list):
+        for row in rows:
+            self._file.write(json.dumps(row).encode("utf-8") + b"\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.progress.record([dict(entry, offset=self._file.tell())])
+
+    def close(self):
+        self._file.close()
+
+class ParquetResultWriter:
+    """
+    Writes section records as a directory of Parquet part files.
+
+    Each part holds `pages_per_part` pages. Rows are written to it in row
+    groups of at most `rows_per_group` rows, so memory stays bounded even for
+    streamed pages with very many sections. Parts are written to a temporary
+    file and renamed once finished, so a crash never leaves a truncated part
+    behind.
+    """
+
+    def __init__(self, path: str, progress: ProgressLog, resume: bool, pages_per_part: int = None,
+                 rows_per_group: int = None):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise typer.BadParameter("Parquet output requires pyarrow (pip install pyarrow)")
+        self.pa, self.pq = pa, pq
+        self.path = path
+        self.progress = progress
+        self.pages_per_part = pages_per_part or PARQUET_PAGES_PER_PART
+        self.rows_per_group = rows_per_group or PARQUET_ROWS_PER_GROUP
+        self.schema = pa.schema([
+            ("url", pa.string()),
+            ("query", pa.string()),
+            ("section_index", pa.int32()),
+            ("section", pa.string()),
+            ("score", pa.float64()),
+            ("sentiment_score", pa.float64()),
+            ("sentiment_magnitude", pa.float64()),
+            ("entities", pa.list_(pa.struct([("name", pa.string()), ("type", pa.string()), ("salience", pa.float64())]))),
+        ])
+        os.makedirs(path, exist_ok=True)
+        recorded = {entry["part"] for entry in progress.entries if "part" in entry}
+        if not resume:
+            recorded = set()
+        for name in os.listdir(path):
+            if name not in recorded and (name.endswith(".parquet") or name.endswith(".tmp")):
+                os.remove(os.path.join(path, name))
+        self.part_number = len(recorded)
+        self.pending_entries = []
+        self.pending_rows = []
+        self._writer = None
+
+    def _part_name(self) -> str:
+        return f"part-{self.part_number:05d}.parquet"
+
+    def _write_rows(self):
+        if not self.pending_rows:
+            return
+        if self._writer is None:
+            tmp_path = os.path.join(self.path, self._part_name() + ".tmp")
+            self._writer = self.pq.ParquetWriter(tmp_path, self.schema)
+        self._writer.write_table(self.pa.Table.from_pylist(self.pending_rows, schema=self.schema))
+        self.pending_rows = []
+
+    def add_page(self, entry: dict, rows):
+        self.pending_entries.append(entry)
+        for row in rows:
+            self.pending_rows.append(row)
+            if len(self.pending_rows) >= self.rows_per_group:
+                self._write_rows()
+        if len(self.pending_entries) >= self.pages_per_part:
+            self.flush()
+
+    def flush(self):
+        if not self.pending_entries:
+            return
+        self._write_rows()
+        if self._writer is not None:
+            name = self._part_name()
+            self._writer.close()
+            self._writer = None
+            os.replace(os.path.join(self.path, name + ".tmp"), os.path.join(self.path, name))
+            self.part_number += 1
+            self.progress.record([dict(entry, part=name) for entry in self.pending_entries])
+        else:
+            self.progress.record(self.pending_entries)
+        self.pending_entries = []
+
+    def close(self):
+        self.flush()
+
+def _analyze_page(url: str, query: str, model_name: str, server_url: str = None, incremental: bool = False,
+                  stream: bool = False):
+    """
+    Runs analyze_webpage on its own event loop in a worker thread, or on the scoring server.
+
+    Remote API calls are made at batch priority, so interactive sessions
+    sharing the quota are served first.
+
+    With `incremental`, reanalyze_webpage is used instead, and its score
+    changes are returned along with the rows. With `stream`,
+    analyze_webpage_stream is used; the rows are returned as SpooledRows and
+    the page's score summary takes the place of the changes.
+    """
+    start = time.perf_counter()
+    timings = {}
+    changes = None
+    try:
+        with request_priority(BATCH):
+            if stream:
+                rows = SpooledRows()
+
+                def write_batch(offset, *batch):
+                    rows.extend(section_rows(url, query, *batch, offset=offset))
+
+                summary = asyncio.run(analyze_webpage_stream(url, query, model_name, write_batch, timings=timings))
+                if summary is None:
+                    rows.close()
+                    return None, time.perf_counter() - start, None, timings
+                return rows, time.perf_counter() - start, summary, timings
+            if server_url:
+                sections, scores, sentiments, entities = analyze_remote(server_url, url, query, model_name,
+                                                                        priority="batch")
+            elif incremental:
+                sections, scores, sentiments, entities, changes = asyncio.run(
+                    reanalyze_webpage(url, query, model_name, timings))
+            else:
+                sections, scores, sentiments, entities = asyncio.run(analyze_webpage(url, query, model_name))
+    except Exception as e:
+        logger.error(f"Analysis of {url} failed: {type(e).__name__} - {e}")
+        sections = None
+    if sections is None:
+        return None, time.perf_counter() - start, None, timings
+    rows = section_rows(url, query, sections, scores, sentiments, entities)
+    return rows, time.perf_counter() - start, changes, timings
+
+def run_batch(input_path: str, output_path: str, model_name: str, concurrency: int = 4,
+              output_format: str = None, resume: bool = False, server_url: str = None,
+              incremental: bool = False, stream: bool = False) -> dict:
+    """
+    Analyzes every (url, query) pair in a file and streams the results to disk.
+
+    Pages are analyzed by a pool of `concurrency` workers and their section
+    records are written as each page finishes. A progress log next to the
+    output records finished pages; with `resume`, pages finished by an earlier
+    run are skipped and output written after the last finished page is
+    discarded.
+
+    With `incremental`, each page is re-analyzed against its last snapshot, so
+    only changed sections are recomputed, and score changes are appended to
+    `<output>.changes.jsonl`.
+
+    Finished pages are also recorded in the result store (see
+    `result_store.ResultStore`) unless CONFIG["RESULT_STORE_ENABLED"] is off.
+    Pages analyzed on a scoring server are recorded in the server's store instead.
+
+    With `stream`, each page is analyzed with memory bounded by
+    CONFIG["STREAM_BATCH_SECTIONS"] (see `pipeline.analyze_webpage_stream`),
+    and each page's score summary is appended to `<output>.summary.jsonl`.
+
+    Args:
+        input_path (str): CSV, TSV or JSON Lines file of (url, query) pairs.
+        output_path (str): JSON Lines file, or directory of Parquet part files.
+        model_name (str): The name of the embedding model to use.
+        concurrency (int): Maximum number of pages analyzed at once.
+        output_format (str): "jsonl" or "parquet". Inferred from `output_path` when None.
+        resume (bool): Whether to continue an interrupted run.
+        server_url (str): Scoring server to send pages to instead of analyzing
+            them in this process.
+        incremental (bool): Whether to recompute only sections changed since
+            the last run and record score changes.
+        stream (bool): Whether to analyze pages in memory-bounded batches.
+
+    Returns:
+        dict: Throughput statistics for this run.
+    """
+    output_format = output_format or ("parquet" if output_path.endswith(".parquet") else "jsonl")
+    progress = ProgressLog(output_path.rstrip("/") + ".progress", resume)
+    if output_format == "parquet":
+        writer = ParquetResultWriter(output_path, progress, resume)
+    else:
+        writer = JsonlResultWriter(output_path, progress, resume)
+
+    completed = progress.completed()
+    changes_file = open_page_log(output_path.rstrip("/") + ".changes.jsonl", completed,
+                                 resume) if incremental else None
+    summary_file = open_page_log(output_path.rstrip("/") + ".summary.jsonl", completed,
+                                 resume) if stream else None
+
+    store = get_result_store()
+    stats = {"pages": 0, "failed": 0, "skipped": 0, "sections": 0, "page_seconds": 0.0}
+    if incremental:
+        stats.update(recomputed_sections=0, reused_sections=0, changed_sections=0)
+    start = time.perf_counter()
+    pairs = iter(read_pairs(input_path))
+    in_flight = {}
+
+    def submit_next(executor):
+        for url, query in pairs:
+            if (url, query) in completed:
+                stats["skipped"] += 1
+                continue
+            in_flight[executor.submit(_analyze_page, url, query, model_name, server_url, incremental, stream)] = (url, query)
+            return True
+        return False
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            # Keep a bounded window of pages in flight instead of queueing the whole file
+            while len(in_flight) < concurrency * 2 and submit_next(executor):
+                pass
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, query = in_flight.pop(future)
+                    rows, seconds, changes, timings = future.result()
+                    stats["page_seconds"] += seconds
+                    if rows is None:
+                        stats["failed"] += 1
+                        writer.add_page({"url": url, "query": query, "status": "error"}, [])
+                    else:
+                        stats["pages"] += 1
+                        stats["sections"] += len(rows)
+                        if stream:
+                            summary_file.write(json.dumps(dict(changes, url=url, query=query)) + "\n")
+                            summary_file.flush()
+                        elif changes is not None:
+                            changed = [dict(change, url=url, query=query) for change in changes
+                                       if change["status"] != "unchanged"]
+                            changes_file.write("".join(json.dumps(change) + "\n" for change in changed))
+                            changes_file.flush()
+                            stats["changed_sections"] += len(changed)
+                            stats["recomputed_sections"] += timings.get("recomputed", 0)
+                            stats["reused_sections"] += timings.get("reused", 0)
+                        writer.add_page({"url": url, "query": query, "status": "ok"}, rows)
+                        if store is not None and (stream or not server_url):
+                            store.record(url, query, model_name, rows, title=changes.get("title") if stream else None)
+                        if stream:
+                            rows.close()
+                    submit_next(executor)
+    finally:
+        writer.close()
+        progress.close()
+        if changes_file is not None:
+            changes_file.close()
+        if summary_file is not None:
+            summary_file.close()
+
+    stats["elapsed_seconds"] = time.perf_counter() - start
+    attempted = stats["pages"] + stats["failed"]
+    stats["pages_per_second"] = attempted / stats["elapsed_seconds"] if stats["elapsed_seconds"] else 0.0
+    stats["sections_per_second"] = stats["sections"] / stats["elapsed_seconds"] if stats["elapsed_seconds"] else 0.0
+    stats["mean_page_seconds"] = stats["page_seconds"] / attempted if attempted else 0.0
+    return stats
+
+@app.command()
+def run(
+    input_path: str = typer.Argument(..., help="CSV, TSV or JSON Lines file of (url, query) pairs."),
+    output: str = typer.Option("results.jsonl", "--output", "-o", help="Output .jsonl file or .parquet directory."),
+    model: str = typer.Option("Universal Sentence Encoder", help="Embedding model name."),
+    concurrency: int = typer.Option(4, min=1, help="Maximum number of pages analyzed at once."),
+    output_format: str = typer.Option(None, "--format", help="jsonl or parquet; inferred from the output path by default."),
+    resume: bool = typer.Option(False, help="Skip pages finished by an earlier, interrupted run."),
+    server: str = typer.Option(None, help="Scoring server URL to analyze pages on. Defaults to SERVER_URL."),
+    incremental: bool = typer.Option(False, help="Recompute only sections changed since the last run and "
+                                                 "write score changes to <output>.changes.jsonl."),
+    stream: bool = typer.Option(False, help="Analyze very large pages in memory-bounded batches and write "
+                                            "per-page score summaries to <output>.summary.jsonl."),
+):
+    """
+    Analyzes (url, query) pairs and streams per-section results to disk.
+    """
+    if model not in EMBEDDING_MODELS:
+        raise typer.BadParameter(f"Unknown model {model!r}; choose one of {', '.join(EMBEDDING_MODELS)}")
+    if output_format not in (None, "jsonl", "parquet"):
+        raise typer.BadParameter("--format must be jsonl or parquet")
+
+    server = server or CONFIG["SERVER_URL"]
+    if incremental and server:
+        raise typer.BadParameter("--incremental runs locally and cannot be combined with a scoring server")
+    if stream and (server or incremental):
+        raise typer.BadParameter("--stream runs locally and cannot be combined with a scoring server or --incremental")
+
+    start_from_config()
+    stats = run_batch(input_path, output, model, concurrency, output_format, resume, server, incremental, stream)
+
+    typer.echo(f"Analyzed {stats['pages']} pages ({stats['failed']} failed, {stats['skipped']} skipped as already done)")
+    typer.echo(f"Wrote {stats['sections']} sections to {output}")
+    typer.echo(f"Elapsed {stats['elapsed_seconds']:.1f}s: {stats['pages_per_second']:.2f} pages/s, "
+               f"{stats['sections_per_second']:.1f} sections/s, {stats['mean_page_seconds']:.2f}s mean page latency")
+    if incremental:
+        typer.echo(f"Recomputed {stats['recomputed_sections']} sections, reused {stats['reused_sections']}; "
+                   f"{stats['changed_sections']} changes written to {output.rstrip('/')}.changes.jsonl")
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,158 @@
+import base64
+import json
+import logging
+from types import SimpleNamespace
+import numpy as np
+import requests
+from similarity_analyzer.config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+def _post(server_url: str, path: str, payload: dict, timeout: float = None, session: requests.Session = None) -> dict:
+    """Posts a JSON request to the scoring server and returns the decoded response, or None on failure."""
+    post = session.post if session is not None else requests.post
+    try:
+        response = post(f"{server_url.rstrip('/')}{path}", json=payload, timeout=timeout or CONFIG["SERVER_TIMEOUT"])
+        response.raise_for_status()
+        return response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.error(f"Scoring server request {path} failed: {e}")
+        return None
+
+def _array(values):
+    return None if values is None else np.asarray(values, dtype=np.float32)
+
+def decode_array(encoded: dict):
+    """Decodes an array encoded by `server.encode_array` to float32."""
+    if encoded is None:
+        return None
+    values = np.frombuffer(base64.b64decode(encoded["data"]), dtype="<f2")
+    return values.reshape(encoded["shape"]).astype(np.float32)
+
+def analyze_remote(server_url: str, url: str, query: str, model_name: str, timings: dict = None,
+                   timeout: float = None, session: requests.Session = None, page: dict = None,
+                   priority: str = "interactive"):
+    """
+    Runs analyze_webpage on a scoring server.
+
+    Sentiments and entities are returned as simple objects with the same
+    attributes the Cloud NLP types have (score, magnitude; name, type_,
+    salience), so callers can use them like local results.
+
+    Args:
+        server_url (str): Base URL of the scoring server.
+        url (str): The URL of the webpage to analyze.
+        query (str): The query to optimize for.
+        model_name (str): The name of the embedding model to use.
+        timings (dict): Optional dict that receives the server's per-stage timings.
+        timeout (float): Request timeout in seconds. Defaults to CONFIG["SERVER_TIMEOUT"].
+        session (requests.Session): Optional session to reuse a keep-alive connection.
+        page (dict): Optional dict that receives the page data described in
+            `pipeline.analyze_webpage` (title, regions, section embeddings, query
+            embedding, terms and term embeddings), for suggestions. Embeddings
+            are only requested from the server when `page` is given.
+        priority (str): "interactive" or "batch"; the server admits interactive
+            requests to remote APIs first.
+
+    Returns:
+        tuple: Sections, similarity scores, sentiments, and entities, or four
+               Nones if the analysis failed.
+    """
+    result = _post(server_url, "/analyze", {"url": url, "query": query, "model": model_name, "priority": priority,
+                                            "include_embeddings": page is not None}, timeout, session)
+    if result is None:
+        return None, None, None, None
+
+    if timings is not None:
+        timings.update(result.get("timings", {}))
+    if page is not None:
+        page.update(title=result.get("title"), regions=result.get("regions"),
+                    embeddings=decode_array(result.get("embeddings")),
+                    query_embedding=decode_array(result.get("query_embedding")), terms=result.get("terms") or [],
+                    term_embeddings=decode_array(result.get("term_embeddings")))
+    sentiments = [None if sentiment is None else SimpleNamespace(**sentiment) for sentiment in result["sentiments"]]
+    entities = [
+        [SimpleNamespace(name=entity["name"], type_=entity["type"], salience=entity["salience"]) for entity in section_entities]
+        for section_entities in result["entities"]
+    ]
+    return result["sections"], result["scores"], sentiments, entities
+
+def analyze_queries_remote(server_url: str, url: str, queries: list, model_name: str, top_k: int = 5,
+                           timeout: float = None, priority: str = "interactive"):
+    """
+    Runs analyze_webpage_queries on a scoring server.
+
+    Returns:
+        tuple: Sections, the (queries x sections) score matrix and the per-query
+               summaries, as `pipeline.analyze_webpage_queries` returns them, or
+               three Nones if the analysis failed.
+    """
+    result = _post(server_url, "/analyze_queries", {"url": url, "queries": queries, "model": model_name,
+                                                    "top_k": top_k, "priority": priority}, timeout)
+    if result is None:
+        return None, None, None
+    summaries = [dict(summary, top_sections=[tuple(top) for top in summary["top_sections"]])
+                 for summary in result["summaries"]]
+    return result["sections"], _array(result["scores"]), summaries
+
+def analyze_site_remote(server_url: str, query: str, model_name: str, seeds: list = None, sitemap: str = None,
+                        max_pages: int = None, max_depth: int = None, timeout: float = None,
+                        priority: str = "interactive"):
+    """
+    Crawls and scores a site on a scoring server, which also adds the pages to its vector index.
+
+    Pages are read from the streamed response as the server analyzes them.
+
+    Yields:
+        tuple: The page URL, page title, sections and similarity scores, as `pipeline.analyze_site` yields them.
+    """
+    payload = {"query": query, "model": model_name, "seeds": seeds, "sitemap": sitemap,
+               "max_pages": max_pages, "max_depth": max_depth, "priority": priority}
+    try:
+        with requests.post(f"{server_url.rstrip('/')}/analyze_site", json=payload, stream=True,
+                           timeout=timeout or CONFIG["SERVER_TIMEOUT"]) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                page = json.loads(line)
+                if "error" in page:
+                    logger.error(f"Site analysis on the scoring server stopped: {page['error']}")
+                    return
+                yield page["url"], page["title"], page["sections"], page["scores"]
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.error(f"Scoring server request /analyze_site failed: {e}")
+
+def search_remote(server_url: str, query: str, model_name: str, k: int = 10, timeout: float = None,
+                  priority: str = "interactive") -> list:
+    """
+    Runs search_site against the scoring server's vector index.
+
+    Returns:
+        list: Dicts with url, section_index, section and score, best first, or None if the search failed.
+    """
+    result = _post(server_url, "/search", {"query": query, "model": model_name, "k": k, "priority": priority}, timeout)
+    return None if result is None else result["results"]
+
+def history_remote(server_url: str, url: str, query: str, model_name: str, limit: int = 20,
+                   timeout: float = None) -> dict:
+    """
+    Reads stored results from the scoring server's result store.
+
+    Returns:
+        dict: "trend", the runs of `url` oldest first (see `ResultStore.score_trend`),
+              and "worst", the worst sections for `query` (see
+              `ResultStore.worst_sections`), or None if the request failed.
+    """
+    return _post(server_url, "/history", {"url": url, "query": query, "model": model_name, "limit": limit}, timeout)
+
+def server_health(server_url: str, timeout: float = 5) -> dict:
+    """
+    Returns the scoring server's /healthz status, or None if it is unreachable.
+    """
+    try:
+        response = requests.get(f"{server_url.rstrip('/')}/healthz", timeout=timeout)
+        return response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        logger.warning(f"Scoring server at {server_url} is unreachable: {e}")
+        return None
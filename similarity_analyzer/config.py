@@ -3,9 +3,136 @@ from dotenv import load_dotenv
 
 load_dotenv()  # Load environment variables from .env file
 
+CACHE_DIR = os.getenv("SIMILARITY_ANALYZER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "similarity_analyzer"))
+
 # Configuration settings
 CONFIG = {
     "GOOGLE_CLOUD_NLP_API_KEY": os.getenv("GOOGLE_CLOUD_NLP_API_KEY"),
     "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY"),
     "MODEL_NAME": "Universal Sentence Encoder",
-}
\ No newline at end of file
+    # Optional override of the Gemini API endpoint (e.g. a local fake server for tests)
+    "GEMINI_API_ENDPOINT": os.getenv("GEMINI_API_ENDPOINT"),
+    # Number of texts sent per batchEmbedContents request (the API accepts at most 100)
+    "GEMINI_BATCH_SIZE": int(os.getenv("GEMINI_BATCH_SIZE", "100")),
+    # Maximum number of embedding batches in flight at once
+    "GEMINI_MAX_CONCURRENCY": int(os.getenv("GEMINI_MAX_CONCURRENCY", "4")),
+    # Root directory for on-disk caches
+    "CACHE_DIR": CACHE_DIR,
+    # Persistent embedding cache shared by sections and queries
+    "EMBEDDING_CACHE_ENABLED": os.getenv("EMBEDDING_CACHE_ENABLED", "1") != "0",
+    "EMBEDDING_CACHE_DIR": os.getenv("EMBEDDING_CACHE_DIR", os.path.join(CACHE_DIR, "embeddings")),
+    # Maximum number of embeddings kept per model before least-recently-used entries are evicted
+    "EMBEDDING_CACHE_MAX_ENTRIES": int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000")),
+    # Timeout in seconds for fetching a webpage
+    "REQUEST_TIMEOUT": float(os.getenv("REQUEST_TIMEOUT", "30")),
+    # Site crawl settings
+    "CRAWL_STORAGE_DIR": os.getenv("CRAWL_STORAGE_DIR", "./storage"),
+    "CRAWL_MAX_CONCURRENCY": int(os.getenv("CRAWL_MAX_CONCURRENCY", "10")),
+    "CRAWL_MAX_PER_HOST": int(os.getenv("CRAWL_MAX_PER_HOST", "2")),
+    # Minimum delay in seconds between two requests to the same host
+    "CRAWL_HOST_DELAY": float(os.getenv("CRAWL_HOST_DELAY", "0.5")),
+    "CRAWL_MAX_RETRIES": int(os.getenv("CRAWL_MAX_RETRIES", "2")),
+    # Never download NLTK data; fall back to the resources bundled with the package
+    "NLTK_OFFLINE": os.getenv("NLTK_OFFLINE", "0") == "1",
+    # Worker processes used to preprocess large pages (0 or 1 = preprocess in-process)
+    "PREPROCESS_PROCESSES": int(os.getenv("PREPROCESS_PROCESSES", "0")),
+    # Number of distinct tokens whose stems are memoized
+    "STEM_CACHE_SIZE": int(os.getenv("STEM_CACHE_SIZE", "100000")),
+    # Storage type of section embeddings in the vector index and result store: float32, float16 or int8
+    "EMBEDDING_STORAGE_DTYPE": os.getenv("EMBEDDING_STORAGE_DTYPE", "float16"),
+    # Section embedding index used for site-wide search
+    "VECTOR_INDEX_DIR": os.getenv("VECTOR_INDEX_DIR", os.path.join(CACHE_DIR, "vector_index")),
+    # Inverted lists searched per query once the index has an IVF partition
+    "VECTOR_INDEX_NPROBE": int(os.getenv("VECTOR_INDEX_NPROBE", "8")),
+    # Index size at which searches switch from exact to IVF approximate search
+    "VECTOR_INDEX_IVF_MIN_SIZE": int(os.getenv("VECTOR_INDEX_IVF_MIN_SIZE", "200000")),
+    # Google Cloud NLP requests per second, shared by all threads and coroutines
+    "NLP_MAX_QPS": float(os.getenv("NLP_MAX_QPS", "10")),
+    # Google Cloud NLP requests in flight at once
+    "NLP_MAX_CONCURRENCY": int(os.getenv("NLP_MAX_CONCURRENCY", "8")),
+    # Persistent cache of Google Cloud NLP responses, shared across sessions and processes
+    "NLP_CACHE_ENABLED": os.getenv("NLP_CACHE_ENABLED", "1") != "0",
+    "NLP_CACHE_DIR": os.getenv("NLP_CACHE_DIR", os.path.join(CACHE_DIR, "nlp")),
+    # Seconds before a cached NLP response is considered stale
+    "NLP_CACHE_TTL": float(os.getenv("NLP_CACHE_TTL", str(7 * 24 * 3600))),
+    # Maximum number of cached NLP responses before least-recently-used entries are evicted
+    "NLP_CACHE_MAX_ENTRIES": int(os.getenv("NLP_CACHE_MAX_ENTRIES", "100000")),
+    # Sections preprocessed and embedded per batch in the single-page pipeline
+    "PIPELINE_BATCH_SIZE": int(os.getenv("PIPELINE_BATCH_SIZE", "128")),
+    # Preprocessed batches allowed to wait for embedding before preprocessing pauses
+    "PIPELINE_QUEUE_SIZE": int(os.getenv("PIPELINE_QUEUE_SIZE", "2")),
+    # TensorFlow Hub download cache; models are fetched once and loaded from here afterwards
+    "TFHUB_CACHE_DIR": os.getenv("TFHUB_CACHE_DIR", os.path.join(CACHE_DIR, "tfhub")),
+    # Optional local SavedModel directory for the Universal Sentence Encoder, e.g. baked into a worker image
+    "USE_MODEL_PATH": os.getenv("USE_MODEL_PATH"),
+    # Local ONNX sentence embedding model directory (model.onnx and tokenizer.json); enables the offline backend
+    "ONNX_MODEL_DIR": os.getenv("ONNX_MODEL_DIR"),
+    # onnxruntime intra-op threads; 0 lets onnxruntime use all cores
+    "ONNX_THREADS": int(os.getenv("ONNX_THREADS", "0")),
+    # Tokens per text before truncation
+    "ONNX_MAX_LENGTH": int(os.getenv("ONNX_MAX_LENGTH", "256")),
+    # Padded tokens per inference batch; texts are batched by similar length
+    "ONNX_BATCH_TOKENS": int(os.getenv("ONNX_BATCH_TOKENS", "16384")),
+    # Embedding output type: float32, float16 or int8
+    "ONNX_OUTPUT_DTYPE": os.getenv("ONNX_OUTPUT_DTYPE", "float32"),
+    # Scoring server: address, embedding worker processes and the models each worker preloads
+    "SERVER_HOST": os.getenv("SERVER_HOST", "127.0.0.1"),
+    "SERVER_PORT": int(os.getenv("SERVER_PORT", "8765")),
+    "SERVER_WORKERS": int(os.getenv("SERVER_WORKERS", "2")),
+    "SERVER_MODELS": [name.strip() for name in os.getenv("SERVER_MODELS", "Universal Sentence Encoder").split(",") if name.strip()],
+    # Requests arriving within this window are merged into one embedding batch of at most SERVER_BATCH_MAX_TEXTS texts
+    "SERVER_BATCH_WAIT_MS": float(os.getenv("SERVER_BATCH_WAIT_MS", "10")),
+    "SERVER_BATCH_MAX_TEXTS": int(os.getenv("SERVER_BATCH_MAX_TEXTS", "512")),
+    # When set, the Streamlit app and batch CLI send analyses to this scoring server instead of loading models themselves
+    "SERVER_URL": os.getenv("SERVER_URL"),
+    "SERVER_TIMEOUT": float(os.getenv("SERVER_TIMEOUT", "300")),
+    # Per-page snapshots of section hashes and results used by incremental re-analysis
+    "SNAPSHOT_DIR": os.getenv("SNAPSHOT_DIR", os.path.join(CACHE_DIR, "snapshots")),
+    # Instrumentation: Chrome trace file written at exit, local Prometheus /metrics port, and a sampling profiler
+    # that writes collapsed stacks for flame graphs; each is off unless set
+    "TRACE_FILE": os.getenv("TRACE_FILE"),
+    "TRACE_MAX_EVENTS": int(os.getenv("TRACE_MAX_EVENTS", "1000000")),
+    "METRICS_PORT": int(os.getenv("METRICS_PORT", "0")),
+    "PROFILE_FILE": os.getenv("PROFILE_FILE"),
+    "PROFILE_INTERVAL_MS": float(os.getenv("PROFILE_INTERVAL_MS", "10")),
+    # Heatmap columns before sections are binned by page region, and rows per page of result tables
+    "HEATMAP_MAX_BINS": int(os.getenv("HEATMAP_MAX_BINS", "200")),
+    "TABLE_PAGE_SIZE": int(os.getenv("TABLE_PAGE_SIZE", "50")),
+    # Token-aware chunking before embedding: adjacent sections under CHUNK_MIN_TOKENS are merged, and sections over
+    # CHUNK_MAX_TOKENS are split at sentence boundaries into windows overlapping by CHUNK_OVERLAP_TOKENS
+    "CHUNKING_ENABLED": os.getenv("CHUNKING_ENABLED", "1") != "0",
+    "CHUNK_MAX_TOKENS": int(os.getenv("CHUNK_MAX_TOKENS", "256")),
+    "CHUNK_MIN_TOKENS": int(os.getenv("CHUNK_MIN_TOKENS", "32")),
+    "CHUNK_OVERLAP_TOKENS": int(os.getenv("CHUNK_OVERLAP_TOKENS", "32")),
+    # Sections scoring below this get optimization suggestions; sections at or above it serve as examples to follow
+    "SUGGESTION_SCORE_THRESHOLD": float(os.getenv("SUGGESTION_SCORE_THRESHOLD", "5")),
+    # Cross-page duplicate detection over the vector index: section pairs scoring at least DUPLICATE_THRESHOLD (0-10)
+    # are near-duplicates, compared in tiles of DUPLICATE_BLOCK_ROWS rows by DUPLICATE_WORKERS threads (0 = one per core)
+    "DUPLICATE_THRESHOLD": float(os.getenv("DUPLICATE_THRESHOLD", "9")),
+    "DUPLICATE_BLOCK_ROWS": int(os.getenv("DUPLICATE_BLOCK_ROWS", "2048")),
+    "DUPLICATE_WORKERS": int(os.getenv("DUPLICATE_WORKERS", "0")),
+    # Pages are linked when this fraction of one page's sections has a near-duplicate on the other; section clusters
+    # spread over more than DUPLICATE_BOILERPLATE_FRACTION of all pages are boilerplate and ignored for page links
+    "DUPLICATE_PAGE_OVERLAP": float(os.getenv("DUPLICATE_PAGE_OVERLAP", "0.5")),
+    "DUPLICATE_BOILERPLATE_FRACTION": float(os.getenv("DUPLICATE_BOILERPLATE_FRACTION", "0.2")),
+    # Quota scheduler shared by all remote backends: requests per second per API key (Gemini; Cloud NLP uses
+    # NLP_MAX_QPS), kept in QUOTA_DIR so threads and processes share one bucket holding QUOTA_BURST_SECONDS of requests
+    "GEMINI_MAX_QPS": float(os.getenv("GEMINI_MAX_QPS", "10")),
+    "QUOTA_DIR": os.getenv("QUOTA_DIR", os.path.join(CACHE_DIR, "quota")),
+    "QUOTA_BURST_SECONDS": float(os.getenv("QUOTA_BURST_SECONDS", "1")),
+    # Tokens batch requests leave for interactive ones; after a 429 the rate is halved (down to QUOTA_MIN_RATE_FACTOR)
+    # and recovers linearly over QUOTA_RECOVERY_SECONDS
+    "QUOTA_INTERACTIVE_RESERVE": float(os.getenv("QUOTA_INTERACTIVE_RESERVE", "1")),
+    "QUOTA_MIN_RATE_FACTOR": float(os.getenv("QUOTA_MIN_RATE_FACTOR", "0.05")),
+    "QUOTA_RECOVERY_SECONDS": float(os.getenv("QUOTA_RECOVERY_SECONDS", "60")),
+    # Streaming mode for very large pages: the body is parsed in chunks of STREAM_CHUNK_BYTES and sections flow
+    # through preprocessing, embedding and NLP in batches of STREAM_BATCH_SECTIONS, bounding memory by the batch size
+    "STREAM_CHUNK_BYTES": int(os.getenv("STREAM_CHUNK_BYTES", "65536")),
+    "STREAM_BATCH_SECTIONS": int(os.getenv("STREAM_BATCH_SECTIONS", "64")),
+    # Distinct sections a streamed page remembers for deduplication (about 1KB each); a section repeated
+    # further back than this is kept again
+    "STREAM_DEDUP_MAX_SECTIONS": int(os.getenv("STREAM_DEDUP_MAX_SECTIONS", "20000")),
+    # History of analysis runs (scores, sentiment, entities and optional embeddings) kept for trend and ranking queries
+    "RESULT_STORE_ENABLED": os.getenv("RESULT_STORE_ENABLED", "1") != "0",
+    "RESULTS_DIR": os.getenv("RESULTS_DIR", os.path.join(CACHE_DIR, "results")),
+}
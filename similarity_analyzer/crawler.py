@@ -0,0 +1,419 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import requests
+from requests.adapters import HTTPAdapter
+from similarity_analyzer.config import CONFIG
+from similarity_analyzer.web_scraper import parse_html
+
+logger = logging.getLogger(__name__)
+
+def unique_key(url: str) -> str:
+    """
+    Normalizes a URL so that trivially different spellings are crawled once.
+
+    The scheme and host are lowercased, the fragment is dropped, query
+    parameters are sorted and a trailing slash is removed.
+
+    Args:
+        url (str): The URL to normalize.
+
+    Returns:
+        str: The normalized URL.
+    """
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    path = parts.path.rstrip('/')
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ''))
+
+def _request_id(key: str) -> str:
+    """Derives a short, filesystem-safe id from a request's unique key."""
+    digest = hashlib.sha256(key.encode('utf-8')).digest()
+    return base64.b64encode(digest).decode('ascii').replace('+', '').replace('/', '').replace('=', '')[:15]
+
+def _now() -> str:
+    return str(datetime.now(timezone.utc))
+
+class RequestQueue:
+    """
+    Resumable on-disk request queue.
+
+    Requests are stored one JSON file per request under
+    `<storage_dir>/request_queues/<name>/`, in the same layout crawlee uses, with
+    a `__metadata__.json` holding the counters. Requests that were not handled
+    when a crawl was interrupted are picked up again by the next crawl using the
+    same queue name. A crawl that runs to its end, including one that stops at
+    its page limit, records `finished_at` with `mark_finished`, and the next
+    crawl clears the queue with `reset` and starts over.
+    """
+
+    def __init__(self, name: str = 'default', storage_dir: str = None):
+        self.name = name
+        self.directory = os.path.join(storage_dir or CONFIG["CRAWL_STORAGE_DIR"], 'request_queues', name)
+        self.requests = {}
+        self.pending = deque()
+        self.in_progress = set()
+        self.handled = 0
+        self.finished_at = None
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.directory, '__metadata__.json')) as f:
+                self.finished_at = json.load(f).get('finished_at')
+        except (OSError, ValueError):
+            pass
+        stored = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json') or filename == '__metadata__.json':
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    request = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable queued request {filename}: {e}")
+                continue
+            stored.append(request)
+        stored.sort(key=lambda request: str(request.get('order_no') or ''))
+        for request in stored:
+            self.requests[request['id']] = request
+            if request.get('handled_at') is None:
+                self.pending.append(request['id'])
+            else:
+                self.handled += 1
+
+    def _write(self, request: dict):
+        path = os.path.join(self.directory, f"{request['id']}.json")
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(request, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def _write_metadata(self):
+        handled = self.handled
+        metadata = {
+            'id': self.name,
+            'name': self.name,
+            'modified_at': _now(),
+            'handled_request_count': handled,
+            'pending_request_count': len(self.requests) - handled,
+            'total_request_count': len(self.requests),
+            'resource_directory': self.directory,
+            'finished_at': self.finished_at,
+        }
+        with open(os.path.join(self.directory, '__metadata__.json'), 'w') as f:
+            json.dump(metadata, f, indent=2)
+
+    def add(self, url: str, depth: int = 0) -> bool:
+        """
+        Adds a URL to the queue unless an equivalent URL was already queued.
+
+        Args:
+            url (str): The URL to crawl.
+            depth (int): Number of links followed from a seed to reach the URL.
+
+        Returns:
+            bool: True if the URL was newly added.
+        """
+        key = unique_key(url)
+        request_id = _request_id(key)
+        if request_id in self.requests:
+            return False
+        request = {
+            'id': request_id,
+            'url': url,
+            'unique_key': key,
+            'method': 'GET',
+            'user_data': {'depth': depth},
+            'retry_count': 0,
+            'handled_at': None,
+            'order_no': f"{time.time():.6f}",
+        }
+        self.requests[request_id] = request
+        self.pending.append(request_id)
+        self._write(request)
+        self._write_metadata()
+        return True
+
+    def fetch_next(self) -> dict:
+        """
+        Takes the next pending request, or returns None if none is available.
+        """
+        while self.pending:
+            request_id = self.pending.popleft()
+            if request_id not in self.in_progress:
+                self.in_progress.add(request_id)
+                return self.requests[request_id]
+        return None
+
+    def mark_handled(self, request: dict, error: str = None):
+        """
+        Marks a request as done so it is not fetched again, even after a restart.
+        """
+        if request.get('handled_at') is None:
+            self.handled += 1
+        request['handled_at'] = _now()
+        if error:
+            request['error'] = error
+        self.in_progress.discard(request['id'])
+        self._write(request)
+        self._write_metadata()
+
+    def reclaim(self, request: dict):
+        """
+        Puts a failed request back at the end of the queue for another attempt.
+        """
+        request['retry_count'] += 1
+        self.in_progress.discard(request['id'])
+        self.pending.append(request['id'])
+        self._write(request)
+
+    def reset(self):
+        """
+        Removes every stored request, so URLs handled by an earlier crawl are fetched again.
+        """
+        for request_id in self.requests:
+            try:
+                os.remove(os.path.join(self.directory, f"{request_id}.json"))
+            except FileNotFoundError:
+                pass
+        self.requests.clear()
+        self.pending.clear()
+        self.in_progress.clear()
+        self.handled = 0
+        self.finished_at = None
+        self._write_metadata()
+
+    def mark_finished(self):
+        """
+        Records that a crawl ran to its end, so the next crawl with this queue starts over instead of resuming.
+        """
+        self.finished_at = _now()
+        self._write_metadata()
+
+    def is_finished(self) -> bool:
+        return not self.pending and not self.in_progress
+
+    @property
+    def handled_count(self) -> int:
+        return self.handled
+
+def create_session(pool_size: int = None) -> requests.Session:
+    """
+    Creates a requests session with a keep-alive connection pool.
+
+    Args:
+        pool_size (int): Maximum number of pooled connections per host.
+                         Defaults to CONFIG["CRAWL_MAX_CONCURRENCY"].
+
+    Returns:
+        requests.Session: The configured session.
+    """
+    pool_size = pool_size or CONFIG["CRAWL_MAX_CONCURRENCY"]
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def fetch_sitemap_urls(sitemap_url: str, session: requests.Session = None, timeout: float = None) -> list:
+    """
+    Reads page URLs from a sitemap, following nested sitemap indexes.
+
+    Args:
+        sitemap_url (str): The URL of the sitemap or sitemap index.
+        session (requests.Session): Optional session to reuse connections.
+        timeout (float): Request timeout in seconds. Defaults to CONFIG["REQUEST_TIMEOUT"].
+
+    Returns:
+        list: The page URLs listed in the sitemap.
+    """
+    session = session or create_session()
+    timeout = timeout or CONFIG["REQUEST_TIMEOUT"]
+    urls = []
+    pending = [sitemap_url]
+    seen = set()
+    while pending:
+        current = pending.pop(0)
+        if current in seen:
+            continue
+        seen.add(current)
+        try:
+            response = session.get(current, timeout=timeout)
+            response.raise_for_status()
+            root = ET.fromstring(response.content)
+        except (requests.exceptions.RequestException, ET.ParseError) as e:
+            logger.error(f"Could not read sitemap {current}: {e}")
+            continue
+        for element in root.iter():
+            if not element.tag.endswith('loc') or not element.text:
+                continue
+            # <loc> entries of a <sitemapindex> point to further sitemaps
+            if root.tag.endswith('sitemapindex'):
+                pending.append(element.text.strip())
+            else:
+                urls.append(element.text.strip())
+    return urls
+
+def _is_retryable(error: Exception) -> bool:
+    """Returns False for client errors such as 404 that will not go away on retry."""
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return True
+
+class _HostThrottle:
+    """Per-host concurrency limit plus a minimum delay between request starts."""
+
+    def __init__(self, max_per_host: int, delay: float):
+        self.semaphore = asyncio.Semaphore(max_per_host)
+        self.delay = delay
+        self.lock = asyncio.Lock()
+        self.last_start = 0.0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        async with self.lock:
+            wait = self.last_start + self.delay - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self.last_start = time.monotonic()
+
+    async def __aexit__(self, *exc_info):
+        self.semaphore.release()
+
+async def crawl(seeds: list = None, sitemap: str = None, queue_name: str = 'default', max_pages: int = None,
+                max_depth: int = 0, same_host_only: bool = True, max_concurrency: int = None,
+                max_per_host: int = None, host_delay: float = None, timeout: float = None,
+                max_retries: int = None, storage_dir: str = None):
+    """
+    Crawls pages concurrently and yields each parsed page as soon as it arrives.
+
+    Pages are fetched through one pooled keep-alive session, with a global
+    concurrency limit, a per-host concurrency limit and a minimum delay between
+    requests to the same host. The request queue lives on disk, so an interrupted
+    crawl (one whose consumer stopped early or failed) resumes where it stopped
+    when called again with the same `queue_name`, and pages handled before the
+    interruption count against `max_pages`. A page is only marked handled once
+    the consumer asks for the next page, so pages that were yielded but not yet
+    processed are fetched again on resume. If the queue's last crawl ran to its
+    end, including stopping at `max_pages`, it is cleared and the crawl starts over.
+
+    Args:
+        seeds (list): Seed URLs to start from.
+        sitemap (str): URL of a sitemap whose pages are added as seeds.
+        queue_name (str): Name of the on-disk request queue.
+        max_pages (int): Stop after this many pages have been handled, counting those of an interrupted run.
+        max_depth (int): How many links to follow from a seed (0 = seeds only).
+        same_host_only (bool): Only follow links to the hosts of the seeds.
+        max_concurrency (int): Maximum requests in flight. Defaults to CONFIG["CRAWL_MAX_CONCURRENCY"].
+        max_per_host (int): Maximum requests in flight per host. Defaults to CONFIG["CRAWL_MAX_PER_HOST"].
+        host_delay (float): Minimum seconds between requests to one host. Defaults to CONFIG["CRAWL_HOST_DELAY"].
+        timeout (float): Request timeout in seconds. Defaults to CONFIG["REQUEST_TIMEOUT"].
+        max_retries (int): Retries per failed request. Defaults to CONFIG["CRAWL_MAX_RETRIES"].
+        storage_dir (str): Root directory of the request queue. Defaults to CONFIG["CRAWL_STORAGE_DIR"].
+
+    Yields:
+        dict: The page URL, title, text sections and links.
+    """
+    max_concurrency = max_concurrency or CONFIG["CRAWL_MAX_CONCURRENCY"]
+    max_per_host = max_per_host or CONFIG["CRAWL_MAX_PER_HOST"]
+    host_delay = CONFIG["CRAWL_HOST_DELAY"] if host_delay is None else host_delay
+    timeout = timeout or CONFIG["REQUEST_TIMEOUT"]
+    max_retries = CONFIG["CRAWL_MAX_RETRIES"] if max_retries is None else max_retries
+
+    session = create_session(max_concurrency)
+    queue = RequestQueue(queue_name, storage_dir)
+    if queue.finished_at is not None or (queue.requests and not queue.pending):
+        queue.reset()
+    seeds = list(seeds or [])
+    if sitemap:
+        seeds.extend(await asyncio.to_thread(fetch_sitemap_urls, sitemap, session, timeout))
+    for seed in seeds:
+        queue.add(seed)
+    allowed_hosts = {urlsplit(url).netloc.lower() for url in seeds} | \
+                    {urlsplit(request['url']).netloc.lower() for request in queue.requests.values()}
+
+    throttles = {}
+    # Bounded so that a slow consumer applies backpressure to the fetchers
+    results = asyncio.Queue(maxsize=max_concurrency)
+    wakeup = asyncio.Event()
+    handled = queue.handled_count
+    budget = [None if max_pages is None else max(0, max_pages - handled)]
+
+    async def fetch(request):
+        host = urlsplit(request['url']).netloc.lower()
+        throttle = throttles.setdefault(host, _HostThrottle(max_per_host, host_delay))
+        async with throttle:
+            response = await asyncio.to_thread(session.get, request['url'], timeout=timeout)
+        response.raise_for_status()
+        # Decoding and parsing are CPU-bound; on the event loop they would hold up every other fetch
+        return await asyncio.to_thread(lambda: parse_html(response.text, response.url or request['url']))
+
+    async def worker():
+        while True:
+            if budget[0] is not None and budget[0] <= 0:
+                return
+            request = queue.fetch_next()
+            if request is None:
+                if queue.is_finished():
+                    wakeup.set()
+                    return
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+            if budget[0] is not None:
+                budget[0] -= 1
+            try:
+                page = await fetch(request)
+            except Exception as e:
+                if request['retry_count'] < max_retries and _is_retryable(e):
+                    logger.warning(f"Retrying {request['url']} after error: {e}")
+                    queue.reclaim(request)
+                    if budget[0] is not None:
+                        budget[0] += 1
+                else:
+                    logger.error(f"Giving up on {request['url']}: {e}")
+                    queue.mark_handled(request, error=str(e))
+                wakeup.set()
+                continue
+
+            depth = request['user_data'].get('depth', 0)
+            if depth < max_depth:
+                for link in page['links']:
+                    if same_host_only and urlsplit(link).netloc.lower() not in allowed_hosts:
+                        continue
+                    queue.add(link, depth + 1)
+            page['url'] = request['url']
+            await results.put((request, page))
+
+    async def run_workers():
+        try:
+            await asyncio.gather(*(worker() for _ in range(max_concurrency)))
+        finally:
+            await results.put(None)
+
+    logger.info(f"Crawling with queue '{queue_name}': {len(queue.pending)} pending, {handled} already handled")
+    runner = asyncio.create_task(run_workers())
+    try:
+        while True:
+            item = await results.get()
+            if item is None:
+                break
+            request, page = item
+            yield page
+            queue.mark_handled(request)
+            wakeup.set()
+        queue.mark_finished()
+    finally:
+        runner.cancel()
+        session.close()
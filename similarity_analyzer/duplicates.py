@@ -0,0 +1,227 @@
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import typer
+from similarity_analyzer.config import CONFIG
+from similarity_analyzer.embedding_generator import EMBEDDING_MODELS
+from similarity_analyzer.quantization import QuantizedEmbeddings
+from similarity_analyzer.vector_index import get_vector_index
+from similarity_analyzer.instrumentation import telemetry, start_from_config
+
+logger = logging.getLogger(__name__)
+
+app = typer.Typer(help="Finds near-duplicate sections and pages among crawled pages in the vector index.")
+
+def similar_pairs(vectors, threshold: float, block_rows: int = None, workers: int = None) -> tuple:
+    """
+    Finds all pairs of rows whose cosine similarity reaches a threshold.
+
+    The (n x n) similarity matrix is never materialized. Its upper triangle is
+    computed one (block_rows x block_rows) tile at a time, and only the entries
+    above the threshold are kept, so memory is bounded by the tile size times
+    the number of workers, plus the matching pairs. Row blocks are spread over
+    a thread pool; the matrix multiply releases the GIL, so tiles are computed
+    on all cores.
+
+    Args:
+        vectors (numpy.ndarray | QuantizedEmbeddings): Unit-length rows, e.g. the
+            memory-mapped index matrix. Quantized rows are converted to float32
+            one block at a time.
+        threshold (float): Minimum cosine similarity of a pair.
+        block_rows (int): Rows per tile side. Defaults to CONFIG["DUPLICATE_BLOCK_ROWS"].
+        workers (int): Worker threads. Defaults to CONFIG["DUPLICATE_WORKERS"], or one per core.
+
+    Returns:
+        tuple: Arrays of the first row, second row (always greater than the
+               first) and cosine similarity of each pair.
+    """
+    block_rows = block_rows or CONFIG["DUPLICATE_BLOCK_ROWS"]
+    workers = workers or CONFIG["DUPLICATE_WORKERS"] or os.cpu_count() or 1
+    if not isinstance(vectors, QuantizedEmbeddings):
+        vectors = QuantizedEmbeddings(vectors)
+    count = len(vectors)
+
+    def row_block(start):
+        stop = min(start + block_rows, count)
+        left = vectors.dequantize(start, stop)
+        firsts, seconds, similarities = [], [], []
+        for column_start in range(start, count, block_rows):
+            with telemetry.span("duplicate_tile"):
+                tile = left @ vectors.dequantize(column_start, column_start + block_rows).T
+                if column_start == start:
+                    # Diagonal tile: keep each pair once and skip self-similarity
+                    tile[np.tril_indices(len(tile), m=tile.shape[1])] = -np.inf
+                rows, columns = np.nonzero(tile >= threshold)
+            firsts.append(rows + start)
+            seconds.append(columns + column_start)
+            similarities.append(tile[rows, columns])
+        return np.concatenate(firsts), np.concatenate(seconds), np.concatenate(similarities)
+
+    if count < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        blocks = list(executor.map(row_block, range(0, count, block_rows)))
+    firsts, seconds, similarities = (np.concatenate(parts) for parts in zip(*blocks))
+    return firsts, seconds, similarities
+
+class DisjointSet:
+    """
+    Union-find over the integers 0..n-1, with path halving and union by size.
+    """
+
+    def __init__(self, count: int):
+        self.parent = list(range(count))
+        self.size = [1] * count
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, first: int, second: int):
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return
+        if self.size[first] < self.size[second]:
+            first, second = second, first
+        self.parent[second] = first
+        self.size[first] += self.size[second]
+
+    def labels(self) -> np.ndarray:
+        """Returns the root of every item."""
+        return np.array([self.find(item) for item in range(len(self.parent))], dtype=np.int64)
+
+def _clusters(count: int, firsts, seconds) -> tuple:
+    """Returns the cluster label of every item and the members of each cluster with more than one item."""
+    groups = DisjointSet(count)
+    for first, second in zip(firsts.tolist(), seconds.tolist()):
+        groups.union(first, second)
+    labels = groups.labels()
+    order = np.argsort(labels, kind="stable")
+    bounds = np.flatnonzero(np.diff(labels[order])) + 1
+    return labels, [members for members in np.split(order, bounds) if len(members) > 1]
+
+def find_duplicates(index, threshold: float = None, page_overlap: float = None, boilerplate_fraction: float = None,
+                    block_rows: int = None, workers: int = None) -> dict:
+    """
+    Finds clusters of near-duplicate sections and of pages that compete for the same content.
+
+    Every pair of indexed sections from `similar_pairs` scoring at least the
+    threshold is linked, and linked sections form a cluster. A cluster that
+    spans more than `boilerplate_fraction` of all pages (navigation, footers,
+    cookie banners) is reported as boilerplate and ignored when comparing
+    pages. Two pages are linked when, for one of them, at least `page_overlap`
+    of its sections have a near-duplicate on the other, and linked pages form
+    a page cluster.
+
+    Args:
+        index (VectorIndex): The vector index filled by site crawls.
+        threshold (float): Minimum section similarity on the 0-10 score scale.
+            Defaults to CONFIG["DUPLICATE_THRESHOLD"].
+        page_overlap (float): Fraction of a page's sections that must be duplicated
+            on another page. Defaults to CONFIG["DUPLICATE_PAGE_OVERLAP"].
+        boilerplate_fraction (float): Fraction of pages above which a section
+            cluster is boilerplate. Defaults to CONFIG["DUPLICATE_BOILERPLATE_FRACTION"].
+        block_rows (int): Rows per tile side, see `similar_pairs`.
+        workers (int): Worker threads, see `similar_pairs`.
+
+    Returns:
+        dict: "sections", a list of section clusters (members with url,
+              section_index and section, page count, boilerplate flag and best
+              score), "pages", a list of page clusters (urls and the largest
+              overlap between two of them), and "stats".
+    """
+    threshold = CONFIG["DUPLICATE_THRESHOLD"] if threshold is None else threshold
+    page_overlap = CONFIG["DUPLICATE_PAGE_OVERLAP"] if page_overlap is None else page_overlap
+    boilerplate_fraction = CONFIG["DUPLICATE_BOILERPLATE_FRACTION"] if boilerplate_fraction is None else boilerplate_fraction
+    start = time.perf_counter()
+
+    vectors = index.live_vectors()
+    count = len(vectors)
+    urls, row_pages = index.row_pages()
+
+    firsts, seconds, similarities = similar_pairs(vectors, threshold / 10, block_rows, workers)
+    # Rows of pages deleted while the job ran have no page any more
+    live = (row_pages[firsts] >= 0) & (row_pages[seconds] >= 0)
+    firsts, seconds, similarities = firsts[live], seconds[live], similarities[live]
+
+    labels, section_clusters = _clusters(count, firsts, seconds)
+    page_count = max(1, len(urls))
+    boilerplate = set()
+    cluster_pages = {}
+    for members in section_clusters:
+        pages = np.unique(row_pages[members])
+        cluster_pages[labels[members[0]]] = len(pages)
+        if len(pages) > max(2, boilerplate_fraction * page_count):
+            boilerplate.add(labels[members[0]])
+
+    # Count, for each ordered pair of pages, the sections of the first that have a duplicate on the second
+    cross = (row_pages[firsts] != row_pages[seconds]) & ~np.isin(labels[firsts], list(boilerplate))
+    rows = np.concatenate((firsts[cross], seconds[cross]))
+    other_pages = np.concatenate((row_pages[seconds[cross]], row_pages[firsts[cross]]))
+    matched = np.unique(np.stack((rows, other_pages)), axis=1)
+    page_pairs, matched_sections = np.unique(np.stack((row_pages[matched[0]], matched[1])), axis=1, return_counts=True)
+    sections_per_page = np.bincount(row_pages[row_pages >= 0], minlength=len(urls))
+    overlaps = matched_sections / sections_per_page[page_pairs[0]]
+    linked = overlaps >= page_overlap
+    page_labels, page_clusters = _clusters(len(urls), page_pairs[0][linked], page_pairs[1][linked])
+
+    metadata = index.metadata(np.concatenate(section_clusters) if section_clusters else [])
+    pair_scores = np.zeros(count)
+    np.maximum.at(pair_scores, labels[firsts], similarities)
+    best_overlap = np.zeros(len(urls))
+    np.maximum.at(best_overlap, page_labels[page_pairs[0][linked]], overlaps[linked])
+
+    report = {
+        "sections": sorted((
+            {
+                "members": [{"url": metadata[row][0], "section_index": metadata[row][1], "section": metadata[row][2]}
+                            for row in members.tolist() if row in metadata],
+                "pages": cluster_pages[labels[members[0]]],
+                "boilerplate": labels[members[0]] in boilerplate,
+                "score": float(pair_scores[labels[members[0]]]) * 10,
+            } for members in section_clusters), key=lambda cluster: (cluster["boilerplate"], -len(cluster["members"]))),
+        "pages": sorted((
+            {"urls": [urls[page] for page in members.tolist()], "overlap": float(best_overlap[page_labels[members[0]]])}
+            for members in page_clusters), key=lambda cluster: -len(cluster["urls"])),
+    }
+    report["stats"] = {"sections": count, "pages": len(urls), "pairs": len(firsts),
+                       "seconds": time.perf_counter() - start}
+    logger.info(f"Compared {count} sections in {report['stats']['seconds']:.1f}s: {len(firsts)} near-duplicate pairs, "
+                f"{len(section_clusters)} section clusters ({len(boilerplate)} boilerplate), "
+                f"{len(page_clusters)} page clusters")
+    return report
+
+@app.command()
+def run(
+    model: str = typer.Option("Universal Sentence Encoder", help="Embedding model the site was crawled with."),
+    output: str = typer.Option("duplicates.jsonl", "--output", "-o", help="Output JSON Lines file, one cluster per line."),
+    threshold: float = typer.Option(None, help="Minimum section similarity (0-10). Defaults to DUPLICATE_THRESHOLD."),
+    page_overlap: float = typer.Option(None, help="Fraction of a page's sections duplicated on another page to link "
+                                                  "the pages. Defaults to DUPLICATE_PAGE_OVERLAP."),
+    workers: int = typer.Option(None, min=1, help="Worker threads. Defaults to DUPLICATE_WORKERS, or one per core."),
+):
+    """
+    Writes clusters of near-duplicate sections and pages from the vector index.
+    """
+    if model not in EMBEDDING_MODELS:
+        raise typer.BadParameter(f"Unknown model {model!r}; choose one of {', '.join(EMBEDDING_MODELS)}")
+    logging.basicConfig(level=logging.INFO)
+    start_from_config()
+    report = find_duplicates(get_vector_index(model), threshold, page_overlap, workers=workers)
+    with open(output, "w", encoding="utf-8") as f:
+        for cluster in report["pages"]:
+            f.write(json.dumps({"type": "pages", **cluster}) + "\n")
+        for cluster in report["sections"]:
+            f.write(json.dumps({"type": "sections", **cluster}) + "\n")
+    stats = report["stats"]
+    typer.echo(f"Compared {stats['sections']} sections on {stats['pages']} pages in {stats['seconds']:.1f}s")
+    typer.echo(f"Wrote {len(report['pages'])} page clusters and {len(report['sections'])} section clusters to {output}")
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,283 @@
+import contextlib
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import numpy as np
+from similarity_analyzer.config import CONFIG
+from similarity_analyzer.instrumentation import telemetry
+
+logger = logging.getLogger(__name__)
+
+# Rows are allocated in chunks so the backing file does not grow on every insert
+_GROWTH_CHUNK = 1024
+
+# Recency updates from cache hits are written in batches of this many keys
+_TOUCH_BATCH = 1024
+
+def content_key(text: str) -> str:
+    """
+    Returns the content hash used to key a text in the cache.
+
+    Args:
+        text (str): The (preprocessed) text.
+
+    Returns:
+        str: Hex SHA-256 digest of the UTF-8 encoded text.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class _ModelStore:
+    """
+    Embeddings of a single model: a memory-mapped float32 matrix plus an SQLite index.
+
+    The index maps content keys to matrix rows and records when each entry was
+    last used, so eviction reuses the row of the least recently used entry.
+    Lookups and row allocation run in IMMEDIATE transactions, so Streamlit, the
+    CLI and server workers sharing one cache directory never hand out the same
+    row or read a row while another process rewrites it. Hits are recorded in
+    memory and written with the next insert, or every _TOUCH_BATCH hits.
+    """
+
+    def __init__(self, directory: str, max_entries: int):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.matrix_path = os.path.join(directory, "embeddings.f32")
+        self.index_path = os.path.join(directory, "index.sqlite")
+        self.dim = None
+        self.capacity = 0
+        self.matrix = None
+        self.touched = set()
+        self._local = threading.local()
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS entries ("
+                     " key TEXT PRIMARY KEY, row INTEGER NOT NULL UNIQUE, used INTEGER NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (used)")
+        conn.execute("CREATE TABLE IF NOT EXISTS free_rows (row INTEGER PRIMARY KEY)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections may not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Holds the store's write lock and maps the matrix at the size other processes may have grown it to."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            meta = dict(conn.execute("SELECT name, value FROM meta").fetchall())
+            self.dim = meta.get("dim")
+            if meta.get("capacity", 0) != self.capacity or (self.matrix is None and self.capacity):
+                self._map(meta.get("capacity", 0))
+            yield conn, meta.get("clock", 0) + 1
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _map(self, capacity: int):
+        self.matrix = None
+        if capacity:
+            self.matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self.capacity = capacity
+
+    def _grow(self, conn):
+        new_capacity = min(max(self.capacity * 2, _GROWTH_CHUNK), self.max_entries)
+        if self.matrix is not None:
+            self.matrix.flush()
+        with open(self.matrix_path, "ab") as f:
+            f.truncate(new_capacity * self.dim * 4)
+        conn.executemany("INSERT INTO free_rows (row) VALUES (?)", [(row,) for row in range(self.capacity, new_capacity)])
+        conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('capacity', ?)", (new_capacity,))
+        self._map(new_capacity)
+
+    def _allocate_row(self, conn) -> int:
+        free = conn.execute("SELECT row FROM free_rows LIMIT 1").fetchone()
+        if free is None and self.capacity < self.max_entries:
+            self._grow(conn)
+            free = conn.execute("SELECT row FROM free_rows LIMIT 1").fetchone()
+        if free is not None:
+            conn.execute("DELETE FROM free_rows WHERE row = ?", free)
+            return free[0]
+        key, row = conn.execute("SELECT key, row FROM entries ORDER BY used LIMIT 1").fetchone()
+        conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        return row
+
+    def _write_touched(self, conn, clock: int):
+        touched = list(self.touched)
+        for start in range(0, len(touched), 500):
+            chunk = touched[start:start + 500]
+            conn.execute(f"UPDATE entries SET used = ? WHERE key IN ({','.join('?' * len(chunk))})", [clock, *chunk])
+        self.touched.clear()
+
+    def get_many(self, keys: list) -> dict:
+        """Returns copies of the cached vectors of `keys`, keyed by content key."""
+        found = {}
+        with self._transaction() as (conn, _):
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = conn.execute(f"SELECT key, row FROM entries WHERE key IN ({','.join('?' * len(chunk))})",
+                                    chunk).fetchall()
+                for key, row in rows:
+                    found[key] = np.array(self.matrix[row])
+        self.touched.update(found)
+        return found
+
+    def put_many(self, items: list):
+        """Stores (content key, vector) pairs, evicting the least recently used entries when full."""
+        with self._transaction() as (conn, clock):
+            for key, vector in items:
+                if self.dim is None:
+                    self.dim = int(vector.shape[0])
+                    conn.execute("INSERT INTO meta (name, value) VALUES ('dim', ?)", (self.dim,))
+                elif vector.shape[0] != self.dim:
+                    raise ValueError(f"Embedding dimension {vector.shape[0]} does not match cached dimension {self.dim}")
+            self._write_touched(conn, clock)
+            for key, vector in items:
+                existing = conn.execute("SELECT row FROM entries WHERE key = ?", (key,)).fetchone()
+                row = existing[0] if existing else self._allocate_row(conn)
+                self.matrix[row] = vector
+                conn.execute("INSERT OR REPLACE INTO entries (key, row, used) VALUES (?, ?, ?)", (key, row, clock))
+            self.matrix.flush()
+            conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('clock', ?)", (clock,))
+
+    def flush_touched(self):
+        """Writes the recorded hits once _TOUCH_BATCH of them have accumulated."""
+        if len(self.touched) < _TOUCH_BATCH:
+            return
+        with self._transaction() as (conn, clock):
+            self._write_touched(conn, clock)
+            conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('clock', ?)", (clock,))
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding cache shared by sections and queries.
+
+    Embeddings are keyed by (model name, hash of the preprocessed text) and stored
+    per model in a memory-mapped float32 matrix with an SQLite index, which any
+    number of processes may share. Each model keeps at most `max_entries`
+    embeddings; the least recently used ones are evicted first.
+    """
+
+    def __init__(self, cache_dir: str = None, max_entries: int = None):
+        self.cache_dir = cache_dir or CONFIG["EMBEDDING_CACHE_DIR"]
+        self.max_entries = max_entries or CONFIG["EMBEDDING_CACHE_MAX_ENTRIES"]
+        self.hits = 0
+        self.misses = 0
+        self.miss_seconds = 0.0
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    def _store(self, model_name: str) -> _ModelStore:
+        store = self._stores.get(model_name)
+        if store is None:
+            slug = re.sub(r"[^A-Za-z0-9]+", "_", model_name).strip("_")
+            store = _ModelStore(os.path.join(self.cache_dir, slug), self.max_entries)
+            self._stores[model_name] = store
+        return store
+
+    def embed(self, model_name: str, texts: list, embed_fn) -> np.ndarray:
+        """
+        Returns embeddings for `texts`, computing only the ones not cached yet.
+
+        Args:
+            model_name (str): The name of the embedding model.
+            texts (list): A list of preprocessed text strings.
+            embed_fn (callable): Called with the list of uncached texts; must return
+                an array of embeddings in the same order, or None on error.
+
+        Returns:
+            numpy.ndarray: A float32 array of embeddings for `texts`, or None if
+            `embed_fn` failed.
+        """
+        keys = [content_key(text) for text in texts]
+        found = {}
+        with self._lock:
+            store = self._store(model_name)
+            try:
+                found = store.get_many(list(dict.fromkeys(keys)))
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache lookup for {model_name} failed: {e}")
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        hits = sum(1 for key in keys if key in found)
+        if missing:
+            start = time.perf_counter()
+            new_embeddings = embed_fn(list(missing.values()))
+            elapsed = time.perf_counter() - start
+            if new_embeddings is None:
+                return None
+            new_embeddings = np.asarray(new_embeddings, dtype=np.float32)
+            found.update(zip(missing, new_embeddings))
+            with self._lock:
+                try:
+                    store.put_many(list(zip(missing, new_embeddings)))
+                except sqlite3.Error as e:
+                    logger.warning(f"Embedding cache write for {model_name} failed: {e}")
+                self.miss_seconds += elapsed
+
+        with self._lock:
+            if not missing:
+                try:
+                    store.flush_touched()
+                except sqlite3.Error as e:
+                    logger.warning(f"Embedding cache update for {model_name} failed: {e}")
+            self.hits += hits
+            self.misses += len(keys) - hits
+
+        logger.debug(f"Embedding cache for {model_name}: {hits} hits, {len(keys) - hits} misses")
+        telemetry.count("embedding_cache_hits_total", hits, model=model_name)
+        telemetry.count("embedding_cache_misses_total", len(keys) - hits, model=model_name)
+        if not keys:
+            return np.empty((0, store.dim or 0), dtype=np.float32)
+        return np.stack([found[key] for key in keys])
+
+    def stats(self) -> dict:
+        """
+        Returns hit/miss counters and the estimated embedding time saved.
+
+        Returns:
+            dict: hits, misses, hit_rate, and estimated_seconds_saved (hits times
+            the average time spent embedding one missed text).
+        """
+        total = self.hits + self.misses
+        seconds_per_miss = self.miss_seconds / self.misses if self.misses else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "estimated_seconds_saved": self.hits * seconds_per_miss,
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Returns the process-wide embedding cache, or None if caching is disabled.
+
+    Returns:
+        EmbeddingCache: The shared cache instance.
+    """
+    global _cache
+    if not CONFIG["EMBEDDING_CACHE_ENABLED"]:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
@@ -1,12 +1,16 @@
-import tensorflow_hub as hub
-import streamlit as st
 import numpy as np
 import logging
-import google.generativeai as genai
+import os
+import sys
+import threading
+import time
 from google.api_core import exceptions as google_exceptions
 from google.api_core import retry
 from similarity_analyzer.config import CONFIG
-import time
+from similarity_analyzer.instrumentation import telemetry
+from similarity_analyzer.quota import current_priority, get_quota_scheduler
+from concurrent.futures import ThreadPoolExecutor
+import functools
 
 logger = logging.getLogger(__name__)
 
@@ -15,38 +19,147 @@ EMBEDDING_MODELS = {
     "Gemini Text Embedding": "models/text-embedding-004"
 }
 
+# Backend that loads each model in EMBEDDING_MODELS
+MODEL_BACKENDS = {
+    "Universal Sentence Encoder": "tfhub",
+    "Gemini Text Embedding": "gemini",
+}
+
+LOCAL_ONNX_MODEL = "Local Sentence Encoder (ONNX)"
+
 class GeminiModel:
     """A simple class to represent the Gemini model."""
     def __init__(self, model_name):
         self.model_name = model_name
 
-@st.cache_resource
+_models = {}
+_models_lock = threading.Lock()
+
+def _show_error(message: str):
+    """Logs an error and, when running inside the Streamlit app, shows it there too."""
+    logger.error(message)
+    # Headless callers never import Streamlit, so never pay for importing it here
+    if "streamlit" in sys.modules:
+        sys.modules["streamlit"].error(message)
+
+def _load_tfhub_model(model_url: str):
+    """
+    Loads a TensorFlow Hub model, importing TensorFlow only now.
+
+    A SavedModel directory configured with USE_MODEL_PATH is loaded directly.
+    Otherwise the model is resolved through TFHUB_CACHE_DIR, so it is downloaded
+    once and later processes load the extracted SavedModel from local disk.
+    """
+    os.environ.setdefault("TFHUB_CACHE_DIR", CONFIG["TFHUB_CACHE_DIR"])
+    import tensorflow_hub as hub
+
+    local_path = CONFIG["USE_MODEL_PATH"]
+    if local_path and model_url == EMBEDDING_MODELS["Universal Sentence Encoder"]:
+        logger.info(f"Loading SavedModel from {local_path}")
+        return hub.load(local_path)
+    return hub.load(model_url)
+
+def _load_gemini_model(model_id: str):
+    configure_gemini()
+    return GeminiModel(model_id)
+
+def _load_onnx_model(model_dir: str):
+    from similarity_analyzer.onnx_embedding import OnnxEmbeddingModel
+    return OnnxEmbeddingModel(model_dir)
+
+# Loaders by backend name. Each takes the model's source from EMBEDDING_MODELS
+# (a URL, an API model name or a local directory) and returns a model that is
+# callable on a list of texts, has an `embed` method, or is a GeminiModel.
+EMBEDDING_BACKENDS = {
+    "tfhub": _load_tfhub_model,
+    "gemini": _load_gemini_model,
+    "onnx": _load_onnx_model,
+}
+
+def register_backend(name: str, loader):
+    """
+    Registers an embedding backend.
+
+    Args:
+        name (str): The backend name used by `register_model`.
+        loader (callable): Called with a model source; returns the loaded model.
+    """
+    EMBEDDING_BACKENDS[name] = loader
+
+def register_model(name: str, backend: str, source: str):
+    """
+    Makes a model available under a display name.
+
+    Args:
+        name (str): The model name shown to users and passed to `load_model`.
+        backend (str): The name of a registered backend.
+        source (str): What the backend loads, e.g. a URL or a model directory.
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}'")
+    EMBEDDING_MODELS[name] = source
+    MODEL_BACKENDS[name] = backend
+
+if CONFIG["ONNX_MODEL_DIR"]:
+    register_model(LOCAL_ONNX_MODEL, "onnx", CONFIG["ONNX_MODEL_DIR"])
+
 def load_model(model_name: str):
     """
     Loads the specified embedding model.
 
+    Each model is loaded once per process, on first use, and shared by all
+    sessions and threads. Backend libraries (TensorFlow Hub, the Gemini SDK,
+    onnxruntime) are imported only when a model that needs them is loaded.
+
     Args:
         model_name (str): The name of the model to load.
 
     Returns:
-        A TensorFlow Hub model or a GeminiModel instance.
+        The loaded model, or None if it is unknown or could not be loaded.
     """
-    logger.info(f"Loading model: {model_name}")
-    if model_name in EMBEDDING_MODELS:
-        if model_name == "Gemini Text Embedding":
-            genai.configure(api_key=CONFIG["GEMINI_API_KEY"])
-            return GeminiModel(EMBEDDING_MODELS[model_name])
-        else:
-            model_url = EMBEDDING_MODELS[model_name]
-            return hub.load(model_url)
-    else:
-        logger.error(f"Model '{model_name}' not supported.")
-        st.error(f"Model '{model_name}' not supported.")
+    if model_name not in EMBEDDING_MODELS:
+        _show_error(f"Model '{model_name}' not supported.")
         return None
+    with _models_lock:
+        model = _models.get(model_name)
+        if model is None:
+            backend = MODEL_BACKENDS[model_name]
+            logger.info(f"Loading model: {model_name} ({backend} backend)")
+            try:
+                model = EMBEDDING_BACKENDS[backend](EMBEDDING_MODELS[model_name])
+            except Exception as e:
+                _show_error(f"Could not load model '{model_name}': {type(e).__name__} - {e}")
+                return None
+            _models[model_name] = model
+        return model
 
-@retry.Retry(
+def configure_gemini(api_key: str = None, api_endpoint: str = None):
+    """
+    Configures the Gemini client.
+
+    When an API endpoint is given (or set through GEMINI_API_ENDPOINT), the client
+    talks REST to that endpoint instead of gRPC to Google, which is how the batch
+    embedding path is exercised against a local fake server.
+
+    Args:
+        api_key (str): The Gemini API key. Defaults to CONFIG["GEMINI_API_KEY"].
+        api_endpoint (str): Optional endpoint URL. Defaults to CONFIG["GEMINI_API_ENDPOINT"].
+    """
+    import google.generativeai as genai
+
+    api_key = api_key or CONFIG["GEMINI_API_KEY"]
+    api_endpoint = api_endpoint or CONFIG["GEMINI_API_ENDPOINT"]
+    if api_endpoint:
+        genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": api_endpoint})
+    else:
+        genai.configure(api_key=api_key)
+
+# Retry policy applied to each embedding batch independently, so a 429 only
+# re-sends the batch that failed and finished batches are kept.
+GEMINI_RETRY = retry.Retry(
     predicate=retry.if_exception_type(
         google_exceptions.ResourceExhausted,
+        google_exceptions.TooManyRequests,
         google_exceptions.ServiceUnavailable,
         google_exceptions.DeadlineExceeded,
     ),
@@ -55,39 +168,104 @@ def load_model(model_name: str):
     multiplier=2,
     timeout=600.0
 )
-def generate_gemini_embeddings(texts: list) -> np.ndarray:
-    """Generates embeddings using the Gemini API with retry logic."""
+
+def _embed_gemini_batch(model: str, batch: list) -> list:
+    """Sends one batchEmbedContents request and returns its list of embeddings."""
+    import google.generativeai as genai
+
+    result = genai.embed_content(
+        model=model,
+        content=batch,
+        request_options={
+            "timeout": 30.0  # Set a reasonable timeout for each request
+        }
+    )
+    return result['embedding']
+
+def _embed_gemini_batch_with_retries(model: str, batch: list, priority: int = None) -> list:
+    """
+    Sends one batch under GEMINI_RETRY, recording each attempt and the backoff between attempts.
+
+    Every attempt is first admitted by the quota scheduler at `priority`, and
+    a 429 slows down the shared Gemini quota before the retry. The retry
+    policy sleeps internally, so the backoff is the batch's wall time minus
+    the time spent in requests and waiting for quota.
+    """
+    scheduler = get_quota_scheduler()
+    attempts = []
+
+    def attempt():
+        start = time.perf_counter()
+        try:
+            scheduler.acquire("gemini", CONFIG["GEMINI_API_KEY"], priority)
+            with telemetry.span("gemini_request"):
+                return _embed_gemini_batch(model, batch)
+        except (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests):
+            scheduler.penalize("gemini", CONFIG["GEMINI_API_KEY"])
+            raise
+        finally:
+            attempts.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    try:
+        return GEMINI_RETRY(attempt)()
+    finally:
+        if len(attempts) > 1:
+            telemetry.count("retries_total", len(attempts) - 1, api="gemini")
+            telemetry.count("retry_backoff_seconds_total", time.perf_counter() - start - sum(attempts), api="gemini")
+
+def generate_gemini_embeddings(texts: list, batch_size: int = None, max_concurrency: int = None) -> np.ndarray:
+    """
+    Generates embeddings using the Gemini API in concurrent batches.
+
+    Texts are split into batches of `batch_size` and at most `max_concurrency`
+    batches are in flight at a time. Each batch is retried on its own, and
+    requests are admitted by the quota scheduler at the caller's priority.
+
+    Args:
+        texts (list): A list of text strings to generate embeddings for.
+        batch_size (int): Texts per request. Defaults to CONFIG["GEMINI_BATCH_SIZE"].
+        max_concurrency (int): Maximum concurrent requests. Defaults to CONFIG["GEMINI_MAX_CONCURRENCY"].
+
+    Returns:
+        numpy.ndarray: An array of embeddings in the same order as `texts`, or None on error.
+    """
+    batch_size = batch_size or CONFIG["GEMINI_BATCH_SIZE"]
+    max_concurrency = max_concurrency or CONFIG["GEMINI_MAX_CONCURRENCY"]
+    if not texts:
+        return np.array([])
+
+    model = EMBEDDING_MODELS["Gemini Text Embedding"]
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    # Executor threads do not inherit the caller's context, so the priority is passed explicitly
+    embed_batch = functools.partial(_embed_gemini_batch_with_retries, model, priority=current_priority())
+    executor = ThreadPoolExecutor(max_workers=min(max_concurrency, len(batches)))
     try:
-        model = EMBEDDING_MODELS["Gemini Text Embedding"]
-        embeddings = []
-        for text in texts:
-            result = genai.embed_content(
-                model=model, 
-                content=text,
-                request_options={
-                    "timeout": 30.0  # Set a reasonable timeout for each request
-                }
-            )
-            embeddings.append(result['embedding'])
-        return np.array(embeddings)
+        results = list(executor.map(embed_batch, batches))
+        return np.array([embedding for batch in results for embedding in batch], dtype=np.float32)
     except google_exceptions.GoogleAPICallError as e:
-        logger.error(f"Error generating Gemini embeddings: {e}")
-        st.error(f"An error occurred while generating embeddings: {e}")
+        _show_error(f"An error occurred while generating embeddings: {e}")
         return None
+    finally:
+        executor.shutdown(cancel_futures=True)
 
 def generate_embeddings(model, texts: list) -> np.ndarray:
     """
     Generates embeddings for a list of texts using the provided model.
 
     Args:
-        model: The loaded TensorFlow Hub model or GeminiModel instance.
+        model: A model returned by `load_model`.
         texts (list): A list of text strings to generate embeddings for.
 
     Returns:
         numpy.ndarray: An array of embeddings for the input texts.
     """
-    logger.info(f"Generating embeddings for {len(texts)} texts")
-    if isinstance(model, GeminiModel):
-        return generate_gemini_embeddings(texts)
-    else:
-        return model(texts)
\ No newline at end of file
+    logger.debug(f"Generating embeddings for {len(texts)} texts")
+    telemetry.count("embedded_texts_total", len(texts), backend=type(model).__name__)
+    with telemetry.span("embed_batch", backend=type(model).__name__):
+        if isinstance(model, GeminiModel):
+            return generate_gemini_embeddings(texts)
+        elif hasattr(model, "embed"):
+            return model.embed(texts)
+        else:
+            return model(texts)
\ No newline at end of file
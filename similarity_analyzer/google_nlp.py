@@ -1,117 +1,217 @@
-from google.cloud import language_v1
 from google.api_core import exceptions
 from similarity_analyzer.config import CONFIG
+from similarity_analyzer.nlp_cache import get_nlp_cache
+from similarity_analyzer.quota import get_quota_scheduler
+from similarity_analyzer.instrumentation import telemetry
 import logging
-import time
 import asyncio
-import functools
+import threading
 
 logger = logging.getLogger(__name__)
 
-def rate_limited(max_per_second):
+# Attempts per request; a 429 slows the shared quota down before the next attempt
+NLP_QUOTA_ATTEMPTS = 3
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
     """
-    Decorator to rate limit function calls.
+    Returns the process-wide LanguageServiceClient.
 
-    Args:
-        max_per_second (int): Maximum number of calls per second.
+    The client, and with it the gRPC channel, is created on first use and
+    shared by all threads.
 
     Returns:
-        function: Decorated function with rate limiting.
-    """
-    min_interval = 1.0 / max_per_second
-    def decorate(func):
-        last_time_called = [0.0]
-        def rate_limited_function(*args, **kwargs):
-            elapsed = time.time() - last_time_called[0]
-            left_to_wait = min_interval - elapsed
-            if left_to_wait > 0:
-                time.sleep(left_to_wait)
-            ret = func(*args, **kwargs)
-            last_time_called[0] = time.time()
-            return ret
-        return rate_limited_function
-    return decorate
-
-@rate_limited(10)  # 10 calls per second
-@functools.lru_cache(maxsize=128)
-def analyze_sentiment(text_content):
+        language_v1.LanguageServiceClient: The shared client.
+    """
+    from google.cloud import language_v1
+
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = language_v1.LanguageServiceClient()
+        return _client
+
+def reset_client():
+    """
+    Drops the shared client so the next call creates a new one.
+    """
+    global _client
+    with _client_lock:
+        _client = None
+
+def _document(text_content):
+    from google.cloud import language_v1
+
+    return language_v1.Document(content=text_content, type_=language_v1.Document.Type.PLAIN_TEXT, language="en")
+
+def _quota_call(kind, call):
+    """
+    Sends a request once the quota scheduler admits it.
+
+    A 429 halves the shared Cloud NLP rate and the request is sent again, up
+    to NLP_QUOTA_ATTEMPTS times.
+    """
+    scheduler = get_quota_scheduler()
+    for attempt in range(NLP_QUOTA_ATTEMPTS):
+        scheduler.acquire("cloud_nlp")
+        try:
+            with telemetry.span("nlp_request", kind=kind):
+                return call()
+        except (exceptions.ResourceExhausted, exceptions.TooManyRequests):
+            scheduler.penalize("cloud_nlp")
+            if attempt == NLP_QUOTA_ATTEMPTS - 1:
+                raise
+            telemetry.count("retries_total", api="cloud_nlp")
+
+def _cached_call(kind, response_type, text_content, call):
+    """
+    Returns the cached response for a text, calling the API on a miss.
+
+    Only misses wait for the quota scheduler; successful responses are cached.
+    """
+    cache = get_nlp_cache()
+    if cache is not None:
+        payload = cache.get(kind, text_content)
+        if payload is not None:
+            return response_type.deserialize(payload)
+    response = _quota_call(kind, call)
+    if cache is not None:
+        cache.put(kind, text_content, response_type.serialize(response))
+    return response
+
+def _annotate_request(text_content, client):
+    return client.annotate_text(request={
+        'document': _document(text_content),
+        'features': {'extract_entities': True, 'extract_document_sentiment': True},
+    })
+
+def analyze_sentiment(text_content, client=None):
     """
     Analyzing Sentiment in a String
 
     Args:
         text_content: The text content to analyze
-    
+        client: Optional LanguageServiceClient; defaults to the shared client.
+
     Returns:
         The document sentiment, or None if an error occurred
     """
+    from google.cloud import language_v1
+
     try:
-        client = language_v1.LanguageServiceClient()
-        document = language_v1.Document(content=text_content, type_=language_v1.Document.Type.PLAIN_TEXT, language="en")
-        response = client.analyze_sentiment(request={'document': document})
+        response = _cached_call('sentiment', language_v1.AnalyzeSentimentResponse, text_content,
+                                lambda: (client or get_client()).analyze_sentiment(request={'document': _document(text_content)}))
         return response.document_sentiment
     except exceptions.GoogleAPICallError as e:
         logger.error(f"Error in sentiment analysis: {e}")
         return None
 
-@rate_limited(10)  # 10 calls per second
-@functools.lru_cache(maxsize=128)
-def analyze_entities(text_content):
+def analyze_entities(text_content, client=None):
     """
     Analyzes entities in a string using Google Cloud Natural Language API.
 
     Args:
       text_content: The text content to analyze.
-    
+      client: Optional LanguageServiceClient; defaults to the shared client.
+
     Returns:
       A list of entities, or an empty list if an error occurred.
     """
+    from google.cloud import language_v1
+
     try:
-        client = language_v1.LanguageServiceClient()
-        document = language_v1.Document(content=text_content, type_=language_v1.Document.Type.PLAIN_TEXT, language="en")
-        response = client.analyze_entities(request={'document': document})
+        response = _cached_call('entities', language_v1.AnalyzeEntitiesResponse, text_content,
+                                lambda: (client or get_client()).analyze_entities(request={'document': _document(text_content)}))
         return list(response.entities)
     except exceptions.GoogleAPICallError as e:
         logger.error(f"Error in entity analysis: {e}")
         return []
 
-async def analyze_sentiment_async(text_content):
+def serialize_annotation(sentiment, entities: list) -> bytes:
     """
-    Asynchronous wrapper for sentiment analysis.
+    Packs one section's sentiment and entities into AnnotateTextResponse bytes.
 
     Args:
-        text_content (str): The text content to analyze.
+        sentiment: The document sentiment, or None if the analysis failed.
+        entities (list): The section's entities.
 
     Returns:
-        The document sentiment, or None if an error occurred.
+        bytes: The serialized response, or None for a failed analysis, which
+               should be retried rather than stored.
     """
-    return await asyncio.to_thread(analyze_sentiment, text_content)
+    from google.cloud import language_v1
 
-async def analyze_entities_async(text_content):
-    """
-    Asynchronous wrapper for entity analysis.
+    if sentiment is None:
+        return None
+    return language_v1.AnnotateTextResponse.serialize(
+        language_v1.AnnotateTextResponse(document_sentiment=sentiment, entities=entities))
 
-    Args:
-        text_content (str): The text content to analyze.
+def deserialize_annotation(payload: bytes) -> tuple:
+    """
+    Unpacks bytes written by `serialize_annotation`.
 
     Returns:
-        A list of entities, or an empty list if an error occurred.
+        tuple: The document sentiment and a list of entities.
     """
-    return await asyncio.to_thread(analyze_entities, text_content)
+    from google.cloud import language_v1
+
+    response = language_v1.AnnotateTextResponse.deserialize(payload)
+    return response.document_sentiment, list(response.entities)
 
-async def analyze_all_sections(sections):
+async def analyze_all_sections(sections, client=None, max_concurrency=None):
     """
     Analyzes sentiment and entities for all sections asynchronously.
 
+    Identical sections are analyzed once, and sections found in the NLP result
+    cache are not requested at all. Each remaining section costs one
+    annotateText request; requests are admitted by the shared quota scheduler
+    and at most `max_concurrency` are in flight.
+
     Args:
         sections (list): List of text sections to analyze.
+        client: Optional LanguageServiceClient; defaults to the shared client.
+        max_concurrency (int): Maximum requests in flight. Defaults to CONFIG["NLP_MAX_CONCURRENCY"].
 
     Returns:
         tuple: Two lists containing sentiment and entity analysis results for each section.
     """
-    sentiment_tasks = [analyze_sentiment_async(section) for section in sections]
-    entity_tasks = [analyze_entities_async(section) for section in sections]
-    
-    sentiments = await asyncio.gather(*sentiment_tasks)
-    entities = await asyncio.gather(*entity_tasks)
-    
+    from google.cloud import language_v1
+
+    semaphore = asyncio.Semaphore(max_concurrency or CONFIG["NLP_MAX_CONCURRENCY"])
+    unique_sections = list(dict.fromkeys(sections))
+    cache = get_nlp_cache()
+
+    results = {}
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.get_many, 'annotate', unique_sections)
+        for section, payload in cached.items():
+            response = language_v1.AnnotateTextResponse.deserialize(payload)
+            results[section] = (response.document_sentiment, list(response.entities))
+
+    def request(section):
+        try:
+            response = _quota_call("annotate", lambda: _annotate_request(section, client or get_client()))
+        except exceptions.GoogleAPICallError as e:
+            logger.error(f"Error in text annotation: {e}")
+            telemetry.count("nlp_errors_total")
+            return None, []
+        if cache is not None:
+            cache.put('annotate', section, language_v1.AnnotateTextResponse.serialize(response))
+        return response.document_sentiment, list(response.entities)
+
+    async def annotate(section):
+        async with semaphore:
+            return await asyncio.to_thread(request, section)
+
+    missing = [section for section in unique_sections if section not in results]
+    results.update(zip(missing, await asyncio.gather(*(annotate(section) for section in missing))))
+    telemetry.count("nlp_cache_hits_total", len(unique_sections) - len(missing))
+    telemetry.count("nlp_cache_misses_total", len(missing))
+    logger.info(f"Annotated {len(missing)} of {len(unique_sections)} distinct sections, "
+                f"{len(unique_sections) - len(missing)} served from cache")
+
+    sentiments = [results[section][0] for section in sections]
+    entities = [results[section][1] for section in sections]
     return sentiments, entities
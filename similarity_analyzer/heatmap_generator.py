@@ -1,21 +1,97 @@
-import plotly.graph_objects as go
+import math
+import numpy as np
 import logging
+from typing import TYPE_CHECKING
+from similarity_analyzer.config import CONFIG
+
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
 
 logger = logging.getLogger(__name__)
 
-def generate_heatmap(scores: list, labels: list) -> go.Figure:
+def bin_sections(count: int, regions: list = None, max_bins: int = None) -> list:
+    """
+    Groups consecutive sections into at most `max_bins` bins for display.
+
+    Consecutive sections of the same page region form a bin, and regions with
+    many sections are split into equal runs, so no bin spans two regions while
+    the bin count stays bounded. Without regions, or with more regions than
+    bins, sections are split into equal consecutive runs.
+
+    Args:
+        count (int): The number of sections.
+        regions (list): Optional region label of each section, e.g. from `parse_html`.
+        max_bins (int): Maximum number of bins. Defaults to CONFIG["HEATMAP_MAX_BINS"].
+
+    Returns:
+        list: Dicts with the bin "label" and the "start" and "stop" section indices.
+    """
+    max_bins = max_bins or CONFIG["HEATMAP_MAX_BINS"]
+    runs = []
+    if regions is not None:
+        for index, region in enumerate(regions):
+            if runs and runs[-1][0] == region:
+                runs[-1][2] = index + 1
+            else:
+                runs.append([region, index, index + 1])
+    if not runs or len(runs) >= max_bins:
+        runs = [[None, 0, count]]
+
+    # Each run adds at most one partial bin, so reserve one bin per run
+    size = max(1, math.ceil(count / max(1, max_bins - len(runs))))
+    if count <= max_bins:
+        size = 1
+    bins = []
+    for region, run_start, run_stop in runs:
+        for start in range(run_start, run_stop, size):
+            stop = min(start + size, run_stop)
+            sections = f"Section {start + 1}" if stop - start == 1 else f"Sections {start + 1}-{stop}"
+            bins.append({"label": f"{region}: {sections}" if region else sections, "start": start, "stop": stop})
+    return bins
+
+def generate_heatmap(scores, labels: list, query_labels: list = None, bins: list = None) -> "go.Figure":
     """
     Generates a heatmap visualization of similarity scores.
 
+    With `bins`, each column shows the mean score of one bin of sections and
+    its hover text the bin's minimum and maximum, so the figure size depends
+    on the number of bins rather than on the number of sections.
+
     Args:
-        scores (list): A list of similarity scores.
+        scores (list or numpy.ndarray): A list of similarity scores, or a 2D
+            (queries x sections) score matrix.
         labels (list): A list of labels for the x-axis (corresponding to sections).
+            Ignored when `bins` is given.
+        query_labels (list): Labels for the y-axis when `scores` is a matrix
+            (corresponding to queries).
+        bins (list): Optional section bins from `bin_sections`.
 
     Returns:
         plotly.graph_objs._figure.Figure: A Plotly heatmap figure object.
     """
-    logger.info("Generating heatmap")
-    fig = go.Figure(data=go.Heatmap(z=[scores], x=labels, y=["Similarity Score"],
-                                   colorscale='Viridis'))
+    import plotly.graph_objects as go
+
+    logger.debug("Generating heatmap")
+    z = np.asarray(scores, dtype=float)
+    if z.ndim == 1:
+        z = z[np.newaxis, :]
+        y = ["Similarity Score"]
+    else:
+        y = query_labels if query_labels is not None else [f"Query {i+1}" for i in range(z.shape[0])]
+
+    if bins is None:
+        fig = go.Figure(data=go.Heatmap(z=z, x=labels, y=y,
+                                       colorscale='Viridis'))
+    else:
+        starts = np.array([b["start"] for b in bins])
+        counts = np.array([b["stop"] - b["start"] for b in bins])
+        means = np.add.reduceat(z, starts, axis=1) / counts
+        lows = np.minimum.reduceat(z, starts, axis=1)
+        highs = np.maximum.reduceat(z, starts, axis=1)
+        text = [[f"{count} sections, min {low:.2f}, max {high:.2f}" for count, low, high in zip(counts, low_row, high_row)]
+                for low_row, high_row in zip(lows, highs)]
+        fig = go.Figure(data=go.Heatmap(z=np.round(means, 3), x=[b["label"] for b in bins], y=y, text=text,
+                                       hovertemplate="%{x}<br>mean %{z:.2f}<br>%{text}<extra></extra>",
+                                       colorscale='Viridis'))
     fig.update_layout(title="Section Similarity Scores")
     return fig
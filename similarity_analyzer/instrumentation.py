@@ -0,0 +1,245 @@
+import atexit
+import collections
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from similarity_analyzer.config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(key: tuple, **extra) -> str:
+    pairs = list(key) + sorted(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+class Telemetry:
+    """
+    Process-wide spans and counters for the analysis hot paths.
+
+    A span times one operation (a scrape, an embedding batch, a rate-limit
+    sleep) and is aggregated by name and labels into a count, a sum and a
+    maximum. Counters accumulate plain values such as retries or cache hits.
+    Both are rendered in the Prometheus text format. When tracing is enabled,
+    every span is also kept as a Chrome trace event (viewable in Perfetto or
+    chrome://tracing), up to `max_trace_events`.
+    """
+
+    def __init__(self, trace: bool = False, max_trace_events: int = None):
+        self.trace = trace
+        self.max_trace_events = max_trace_events or CONFIG["TRACE_MAX_EVENTS"]
+        self._lock = threading.Lock()
+        self._spans = {}
+        self._counters = collections.defaultdict(float)
+        self._events = []
+        self._epoch = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        """
+        Times the enclosed block as one span.
+
+        Args:
+            name (str): The span name, e.g. "embed_batch".
+            **labels: Low-cardinality labels, e.g. model or api names.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_span(name, start, time.perf_counter() - start, **labels)
+
+    def record_span(self, name: str, start: float, seconds: float, **labels):
+        """
+        Records a span measured by the caller.
+
+        Args:
+            name (str): The span name.
+            start (float): time.perf_counter() at the start of the span.
+            seconds (float): The span duration.
+            **labels: Labels, as for `span`.
+        """
+        key = (name, _label_key(labels))
+        with self._lock:
+            stats = self._spans.get(key)
+            if stats is None:
+                stats = self._spans[key] = [0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            if self.trace and len(self._events) < self.max_trace_events:
+                self._events.append({
+                    "name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                    "ts": (start - self._epoch) * 1e6, "dur": seconds * 1e6, "args": labels,
+                })
+
+    def count(self, name: str, value: float = 1, **labels):
+        """
+        Adds to a counter.
+
+        Args:
+            name (str): The counter name, e.g. "retries_total".
+            value (float): The amount to add.
+            **labels: Labels, as for `span`.
+        """
+        with self._lock:
+            self._counters[(name, _label_key(labels))] += value
+
+    def snapshot(self) -> dict:
+        """
+        Returns the current aggregates.
+
+        Returns:
+            dict: "spans" maps (name, labels) to {"count", "seconds", "max_seconds"}
+                  and "counters" maps (name, labels) to a value.
+        """
+        with self._lock:
+            return {
+                "spans": {key: {"count": c, "seconds": s, "max_seconds": m} for key, (c, s, m) in self._spans.items()},
+                "counters": dict(self._counters),
+            }
+
+    def render_prometheus(self) -> str:
+        """
+        Renders spans and counters in the Prometheus text format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        if snapshot["spans"]:
+            for suffix, field, kind in (("count", "count", "counter"), ("sum", "seconds", "counter"),
+                                        ("max", "max_seconds", "gauge")):
+                metric = f"similarity_analyzer_span_seconds_{suffix}"
+                lines.append(f"# TYPE {metric} {kind}")
+                for (name, key), stats in sorted(snapshot["spans"].items()):
+                    lines.append(f"{metric}{_format_labels(key, span=name)} {stats[field]}")
+        for name in sorted({name for name, _ in snapshot["counters"]}):
+            lines.append(f"# TYPE similarity_analyzer_{name} counter")
+            for (counter, key), value in sorted(snapshot["counters"].items()):
+                if counter == name:
+                    lines.append(f"similarity_analyzer_{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def write_trace(self, path: str):
+        """
+        Writes the recorded spans as a Chrome trace JSON file.
+
+        Args:
+            path (str): The output file.
+        """
+        with self._lock:
+            events = list(self._events)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        logger.info(f"Wrote {len(events)} trace events to {path}")
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+            self._events.clear()
+
+telemetry = Telemetry(trace=bool(CONFIG["TRACE_FILE"]))
+
+class SamplingProfiler:
+    """
+    Low-overhead sampling profiler for all threads of the process.
+
+    A background thread records every thread's stack each `interval` seconds.
+    Stacks are written in the collapsed format ("frame;frame;frame count") read
+    by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, path: str, interval: float = None):
+        self.path = path
+        self.interval = interval or CONFIG["PROFILE_INTERVAL_MS"] / 1000
+        self.samples = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        """Stops sampling and writes the collapsed stacks."""
+        self._stop.set()
+        self._thread.join()
+        with open(self.path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.info(f"Wrote {sum(self.samples.values())} profile samples to {self.path}")
+
+def serve_metrics(port: int, host: str = "127.0.0.1", render=None) -> ThreadingHTTPServer:
+    """
+    Serves GET /metrics in the Prometheus text format from a background thread.
+
+    Args:
+        port (int): The port to listen on; 0 picks a free port.
+        host (str): The interface to bind.
+        render (callable): Returns the metrics text. Defaults to the process telemetry.
+
+    Returns:
+        ThreadingHTTPServer: The running server.
+    """
+    render = render or telemetry.render_prometheus
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render().encode("utf-8") if self.path == "/metrics" else b"Not found\n"
+            self.send_response(200 if self.path == "/metrics" else 404)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{httpd.server_address[1]}/metrics")
+    return httpd
+
+_started = False
+
+def start_from_config():
+    """
+    Starts the exporters configured in CONFIG, once per process.
+
+    TRACE_FILE writes a Chrome trace at exit, METRICS_PORT serves /metrics and
+    PROFILE_FILE runs the sampling profiler until exit.
+    """
+    global _started
+    if _started:
+        return
+    _started = True
+    if CONFIG["TRACE_FILE"]:
+        telemetry.trace = True
+        atexit.register(telemetry.write_trace, CONFIG["TRACE_FILE"])
+    if CONFIG["METRICS_PORT"]:
+        serve_metrics(CONFIG["METRICS_PORT"])
+    if CONFIG["PROFILE_FILE"]:
+        atexit.register(SamplingProfiler(CONFIG["PROFILE_FILE"]).start().stop)
@@ -4,133 +4,417 @@ import os
 os.environ["GRPC_ENABLE_FORK_SUPPORT"] = "0"
 
 import asyncio
+import time
+import numpy as np
 import streamlit as st
 import logging
-from web_scraper import scrape_webpage
-from text_preprocessor import preprocess_text
-from embedding_generator import generate_embeddings, load_model, EMBEDDING_MODELS
-from similarity_scorer import calculate_similarity
-from heatmap_generator import generate_heatmap
-from google_nlp import analyze_all_sections
+from similarity_analyzer.embedding_generator import EMBEDDING_MODELS
+from similarity_analyzer.embedding_cache import get_embedding_cache
+from similarity_analyzer.nlp_cache import get_nlp_cache
+from similarity_analyzer.heatmap_generator import bin_sections, generate_heatmap
+from similarity_analyzer.pipeline import analyze_webpage, analyze_webpage_queries, analyze_site, search_site
+from similarity_analyzer.client import (analyze_remote, analyze_queries_remote, analyze_site_remote, search_remote,
+                                        history_remote)
+from similarity_analyzer.suggestions import suggest_improvements, format_suggestions
+from similarity_analyzer.result_store import get_result_store, section_rows
 from similarity_analyzer.config import CONFIG
+from similarity_analyzer.instrumentation import start_from_config
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def generate_optimization_suggestions(sections: list, scores: list, query: str) -> list:
+def paginate(rows: list, page: int, page_size: int) -> tuple:
     """
-    Generates optimization suggestions for webpage sections based on similarity scores.
+    Returns the rows of one page and the number of pages.
 
     Args:
-        sections (list): A list of text sections from the webpage.
-        scores (list): A list of similarity scores for each section.
-        query (str): The query term that the webpage sections are being optimized for.
+        rows (list): All rows.
+        page (int): The 1-based page number; clamped to the valid range.
+        page_size (int): Rows per page.
 
     Returns:
-        list: A list of suggestions for improving the relevance of sections with low similarity scores.
+        tuple: The rows on the page and the page count.
     """
-    suggestions = []
-    for i, (section, score) in enumerate(zip(sections, scores)):
-        if score < 5:
-            missing_keywords = [word for word in query.split() if word not in section.lower()]
-            suggestions.append(f"Section {i+1} (Score: {score:.2f}):")
-            suggestions.append(f"  - Consider adding these keywords: {', '.join(missing_keywords)}")
-            suggestions.append(f"  - Expand on topics related to: {query}")
-    return suggestions
+    pages = max(1, -(-len(rows) // page_size))
+    page = min(max(page, 1), pages)
+    return rows[(page - 1) * page_size:page * page_size], pages
 
-async def analyze_webpage(url: str, query: str, model_name: str):
+def display_paginated_table(rows: list, key: str, page_size: int = None):
     """
-    Asynchronous function to perform all analysis operations.
+    Renders a table one page at a time, so only a page of rows is sent to the browser.
+    """
+    page_size = page_size or CONFIG["TABLE_PAGE_SIZE"]
+    page = 1
+    if len(rows) > page_size:
+        pages = -(-len(rows) // page_size)
+        page = st.number_input(f"Page (of {pages}, {len(rows)} rows)", min_value=1, max_value=pages, value=1, key=key)
+    st.dataframe(paginate(rows, int(page), page_size)[0])
 
-    Args:
-        url (str): The URL of the webpage to analyze.
-        query (str): The query to optimize for.
-        model_name (str): The name of the embedding model to use.
+def display_score_heatmap(scores, regions: list = None, query_labels: list = None, key: str = "heatmap"):
+    """
+    Renders a section heatmap whose size stays bounded on pages with thousands of sections.
+
+    Up to CONFIG["HEATMAP_MAX_BINS"] sections are drawn one per column. Larger
+    pages are binned by page region; picking a bin drills down to its sections.
+    """
+    count = np.asarray(scores).shape[-1]
+    if count <= CONFIG["HEATMAP_MAX_BINS"]:
+        labels = [f"Section {i+1}" for i in range(count)]
+        st.plotly_chart(generate_heatmap(scores, labels, query_labels))
+        return None
+    bins = bin_sections(count, regions)
+    st.caption(f"{count} sections shown as {len(bins)} bins of consecutive sections; hover for min and max scores.")
+    st.plotly_chart(generate_heatmap(scores, None, query_labels, bins=bins))
+    selected = st.selectbox("Drill down into", [None] + bins, key=key,
+                            format_func=lambda b: "(all bins)" if b is None else b["label"])
+    return selected
+
+def store_results(url: str, query: str, selected_model: str, sections: list, scores, sentiments: list = None,
+                  entities: list = None, title: str = None, embeddings=None):
+    """
+    Records an analysis in the result store, so it stays available after the page re-renders.
+
+    Analyses run on the scoring server are recorded in its own result store, so nothing is recorded here.
+    """
+    store = get_result_store()
+    if store is not None and not CONFIG["SERVER_URL"]:
+        store.record(url, query, selected_model, section_rows(url, query, sections, scores, sentiments, entities),
+                     title=title, embeddings=embeddings)
+
+def run_single_query(url: str, query: str, selected_model: str) -> dict:
+    """
+    Runs a single-query analysis, records it and prepares its optimization suggestions.
+
+    When CONFIG["SERVER_URL"] is set the analysis runs on the scoring server,
+    whose warm worker pool is shared with other users and batch jobs. The same
+    holds for every other mode.
 
     Returns:
-        tuple: Processed sections, similarity scores, sentiments, and entities.
+        dict: The analysis to render with `display_single_query_results`, or None if it failed.
     """
-    logger.info(f"Analyzing URL: {url} with query: {query}")
+    timings = {}
+    page = {}
+    if CONFIG["SERVER_URL"]:
+        sections, scores, sentiments, entities = analyze_remote(CONFIG["SERVER_URL"], url, query, selected_model, timings,
+                                                                page=page)
+    else:
+        sections, scores, sentiments, entities = asyncio.run(analyze_webpage(url, query, selected_model, timings,
+                                                                             page=page))
 
-    # Scraping the webpage content
-    webpage_data = scrape_webpage(url)
-    if not webpage_data:
-        return None, None, None, None
+    if sections is None:
+        st.error("Failed to process the webpage. Please check the URL or embedding model.")
+        return None
 
-    sections = webpage_data["sections"]
+    store_results(url, query, selected_model, sections, scores, sentiments, entities, page.get("title"),
+                  page.get("embeddings"))
+    suggestions = format_suggestions(suggest_improvements(
+        sections, scores, query, section_embeddings=page.get("embeddings"), query_embedding=page.get("query_embedding"),
+        terms=page.get("terms"), term_embeddings=page.get("term_embeddings")), query)
+    return {"mode": "Single query", "sections": sections, "scores": scores, "sentiments": sentiments,
+            "entities": entities, "regions": page.get("regions") or ["body"] * len(sections), "timings": timings,
+            "suggestions": suggestions}
 
-    # Preprocess the text sections and the query
-    processed_sections = [preprocess_text(section) for section in sections]
-    processed_query = preprocess_text(query)
+def display_single_query_results(result: dict):
+    """
+    Renders a single-query analysis from `run_single_query`.
+    """
+    sections, scores, regions, timings = result["sections"], result["scores"], result["regions"], result["timings"]
+    sentiments, entities, suggestions = result["sentiments"], result["entities"], result["suggestions"]
+    display_cache_stats()
+    st.caption(f"Analyzed in {timings['total']:.2f}s (" +
+               ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items() if stage != "total") + ")")
 
-    # Load the selected embedding model
-    model = load_model(model_name)
-    if not model:
-        return None, None, None, None
+    # Display the overall similarity score
+    st.subheader("Overall Similarity Score (Average):")
+    st.write(sum(scores) / len(scores))
 
-    # Generate embeddings for the sections and the query
-    section_embeddings = generate_embeddings(model, processed_sections)
-    query_embedding = generate_embeddings(model, [processed_query])
+    # Display a heatmap of similarity scores
+    st.subheader("Section Similarity Scores Heatmap:")
+    selected = display_score_heatmap(scores, regions, key="single_heatmap")
+    indices = range(selected["start"], selected["stop"]) if selected else range(len(sections))
 
-    # Calculate similarity scores
-    scores = calculate_similarity(query_embedding, section_embeddings)
+    # Display optimization suggestions
+    st.subheader("Optimization Suggestions:")
+    # Each low-scoring section has three suggestion lines; one text block per page keeps the element count fixed
+    page_lines, pages = paginate(suggestions, 1, CONFIG["TABLE_PAGE_SIZE"] * 3)
+    if pages > 1:
+        suggestion_page = st.number_input(f"Suggestions page (of {pages})", min_value=1, max_value=pages, value=1,
+                                          key="suggestions_page")
+        page_lines = paginate(suggestions, int(suggestion_page), CONFIG["TABLE_PAGE_SIZE"] * 3)[0]
+    st.text("\n".join(page_lines))
 
-    # Perform sentiment and entity analysis
-    sentiments, entities = await analyze_all_sections(sections)
+    # Display sections with their sentiment and entity analysis
+    st.subheader("Sections and Google Cloud Natural Language API Analysis:")
+    rows = []
+    for i in indices:
+        sentiment = sentiments[i]
+        rows.append({
+            "Section": i + 1,
+            "Region": regions[i],
+            "Score": round(float(scores[i]), 2),
+            "Sentiment": round(sentiment.score, 2) if sentiment else None,
+            "Magnitude": round(sentiment.magnitude, 2) if sentiment else None,
+            "Entities": ", ".join(f"{entity.name} ({getattr(entity.type_, 'name', entity.type_)})" for entity in entities[i]),
+            "Text": sections[i],
+        })
+    display_paginated_table(rows, key="single_sections")
+
+def run_multi_query(url: str, queries: list, selected_model: str, top_k: int) -> dict:
+    """
+    Runs a multi-query analysis and records it.
 
-    return sections, scores, sentiments, entities
+    Returns:
+        dict: The analysis to render with `display_multi_query_results`, or None if it failed.
+    """
+    if CONFIG["SERVER_URL"]:
+        sections, score_matrix, summaries = analyze_queries_remote(CONFIG["SERVER_URL"], url, queries, selected_model,
+                                                                   top_k)
+    else:
+        sections, score_matrix, summaries = asyncio.run(analyze_webpage_queries(url, queries, selected_model, top_k))
+
+    if sections is None:
+        st.error("Failed to process the webpage. Please check the URL or embedding model.")
+        return None
+
+    for query, scores in zip(queries, score_matrix):
+        store_results(url, query, selected_model, sections, scores)
+    return {"mode": "Multiple queries", "queries": queries, "top_k": top_k, "sections": sections,
+            "score_matrix": score_matrix, "summaries": summaries}
+
+def display_multi_query_results(result: dict):
+    """
+    Renders a multi-query analysis from `run_multi_query`.
+    """
+    queries, sections, score_matrix = result["queries"], result["sections"], result["score_matrix"]
+    summaries = result["summaries"]
+    display_cache_stats()
+
+    # Display the average score per query
+    st.subheader("Average Similarity Score per Query:")
+    st.dataframe([{"Query": summary["query"], "Average Score": summary["average"]} for summary in summaries])
+
+    # Display a queries x sections heatmap
+    st.subheader("Query x Section Similarity Heatmap:")
+    selected = display_score_heatmap(score_matrix, query_labels=queries, key="multi_heatmap")
+    if selected:
+        rows = [{"Section": i + 1, **{query: round(float(score_matrix[q, i]), 2) for q, query in enumerate(queries)},
+                 "Text": sections[i]} for i in range(selected["start"], selected["stop"])]
+        display_paginated_table(rows, key="multi_sections")
+
+    # Display the best-matching sections for each query
+    st.subheader(f"Top {result['top_k']} Sections per Query:")
+    for summary in summaries:
+        with st.expander(f"{summary['query']} (Average: {summary['average']:.2f})"):
+            for index, score in summary["top_sections"]:
+                st.write(f"**Section {index+1}** (Score: {score:.2f}): {sections[index]}")
+
+def run_site_crawl(seeds: list, sitemap: str, query: str, selected_model: str, max_pages: int, max_depth: int) -> dict:
+    """
+    Crawls a site, showing a page-level score table that fills in as pages arrive.
+
+    Returns:
+        dict: The crawl to render with `display_site_results`, or None if no page could be analyzed.
+    """
+    status = st.empty()
+    table = st.empty()
+    rows = []
+
+    def show(url, title, sections, scores):
+        store_results(url, query, selected_model, sections, scores, title=title)
+        rows.append({"URL": url, "Title": title, "Sections": len(sections),
+                     "Average Score": sum(scores) / len(scores), "Best Score": max(scores)})
+        status.write(f"Analyzed {len(rows)} pages...")
+        table.dataframe(sorted(rows, key=lambda row: row["Average Score"]))
+
+    async def collect():
+        async for page in analyze_site(query, selected_model, seeds, sitemap, max_pages=max_pages, max_depth=max_depth):
+            show(*page)
+
+    if CONFIG["SERVER_URL"]:
+        for page in analyze_site_remote(CONFIG["SERVER_URL"], query, selected_model, seeds, sitemap, max_pages,
+                                        max_depth):
+            show(*page)
+    else:
+        asyncio.run(collect())
+    # The final table is drawn from the stored result, so it survives reruns
+    status.empty()
+    table.empty()
+    if not rows:
+        st.error("No pages could be analyzed. Please check the seed URLs or sitemap.")
+        return None
+    return {"mode": "Site crawl", "rows": sorted(rows, key=lambda row: row["Average Score"])}
+
+def display_site_results(result: dict):
+    """
+    Renders the page-level score table of a crawl from `run_site_crawl`.
+    """
+    st.write(f"Analyzed {len(result['rows'])} pages.")
+    display_paginated_table(result["rows"], key="site_pages")
+    display_cache_stats()
+
+def run_search(query: str, selected_model: str, k: int) -> dict:
+    """
+    Searches the indexed site for a query.
+
+    Returns:
+        dict: The results to render with `display_search_results`, or None if there are none.
+    """
+    if CONFIG["SERVER_URL"]:
+        results = search_remote(CONFIG["SERVER_URL"], query, selected_model, k)
+    else:
+        results = search_site(query, selected_model, k)
+    if results is None:
+        st.error("Failed to embed the query. Please check the embedding model.")
+        return None
+    if not results:
+        st.warning("The index is empty. Run a site crawl with this embedding model first.")
+        return None
+    return {"mode": "Site search", "results": results}
+
+def display_search_results(result: dict):
+    """
+    Renders the best sections across the site from `run_search`.
+    """
+    results = result["results"]
+    st.subheader(f"Top {len(results)} Sections Across the Site:")
+    st.dataframe([{"Score": r["score"], "URL": r["url"], "Section": r["section_index"] + 1, "Text": r["section"]}
+                  for r in results])
+
+def run_history(url: str, query: str, selected_model: str) -> dict:
+    """
+    Reads stored results: the score trend of a page, and the worst sections for a query across stored pages.
+
+    Nothing is scraped, embedded or sent to the Google APIs. With a query, `url`
+    may be a site or directory prefix that limits the worst sections. With
+    CONFIG["SERVER_URL"] set, the scoring server's result store is read.
+
+    Returns:
+        dict: The history to render with `display_history`, or None if it could not be read.
+    """
+    if CONFIG["SERVER_URL"]:
+        history = history_remote(CONFIG["SERVER_URL"], url or None, query or None, selected_model,
+                                 CONFIG["TABLE_PAGE_SIZE"])
+        if history is None:
+            st.error("Failed to read the history from the scoring server.")
+            return None
+        trend, worst = history["trend"], history["worst"]
+    else:
+        store = get_result_store()
+        if store is None:
+            st.error("The result store is disabled (RESULT_STORE_ENABLED=0).")
+            return None
+        trend = store.score_trend(url, query or None, selected_model) if url else []
+        worst = store.worst_sections(query, selected_model, url_prefix=url or None,
+                                     limit=CONFIG["TABLE_PAGE_SIZE"]) if query else []
+    return {"mode": "History", "url": url, "query": query, "trend": trend, "worst": worst}
+
+def display_history(result: dict):
+    """
+    Renders stored results from `run_history`.
+    """
+    if result["url"]:
+        st.subheader("Average Score Over Time:")
+        if result["trend"]:
+            rows = [{"Analyzed": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run["analyzed"])),
+                     "Query": run["query"], "Average Score": run["average"], "Sections": run["section_count"]}
+                    for run in result["trend"]]
+            st.line_chart(rows, x="Analyzed", y="Average Score")
+            display_paginated_table(rows, key="history_trend")
+        else:
+            st.warning("No stored runs for this URL and model.")
+    if result["query"]:
+        st.subheader("Worst Sections for This Query Across Stored Pages:")
+        if result["worst"]:
+            st.dataframe([{"Score": round(row["score"], 2), "URL": row["url"], "Section": row["section_index"] + 1,
+                           "Text": row["section"]} for row in result["worst"]])
+        else:
+            st.warning("No stored runs for this query and model.")
+
+# Renders the analysis kept in st.session_state["analysis"], by mode
+DISPLAYS = {
+    "Single query": display_single_query_results,
+    "Multiple queries": display_multi_query_results,
+    "Site crawl": display_site_results,
+    "Site search": display_search_results,
+    "History": display_history,
+}
+
+def display_cache_stats():
+    """
+    Shows how many embeddings and NLP results were served from the persistent caches.
+    """
+    cache = get_embedding_cache()
+    if cache is not None:
+        stats = cache.stats()
+        st.caption(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+                   f"(~{stats['estimated_seconds_saved']:.1f}s of embedding time saved)")
+    nlp_cache = get_nlp_cache()
+    if nlp_cache is not None:
+        stats = nlp_cache.stats()
+        st.caption(f"NLP cache: {stats['hits']} hits, {stats['misses']} misses")
 
 def main():
     """
     Main function to run the Similarity Score Analyzer Streamlit app.
     """
+    start_from_config()
     st.title("Similarity Score Analyzer")
 
-    # Input fields for the target URL and the query term
-    url = st.text_input("Enter Target URL")
-    query = st.text_input("Enter Query to Optimize For")
+    mode = st.radio("Mode", ["Single query", "Multiple queries", "Site crawl", "Site search", "History"], horizontal=True)
+
+    # Input fields for the target URL(s) and the query terms
+    if mode == "Site crawl":
+        seed_text = st.text_area("Enter Seed URLs (one per line)")
+        seeds = [line.strip() for line in seed_text.splitlines() if line.strip()]
+        sitemap = st.text_input("Or Enter a Sitemap URL")
+        url = seeds or sitemap
+        max_pages = st.number_input("Maximum pages", min_value=1, max_value=10000, value=100)
+        max_depth = st.number_input("Link depth to follow", min_value=0, max_value=10, value=1)
+    elif mode == "Site search":
+        url = None
+        search_k = st.number_input("Sections to return", min_value=1, max_value=500, value=20)
+    elif mode == "History":
+        url = st.text_input("Enter Target URL, or a Site Prefix for the Worst Sections (optional)")
+    else:
+        url = st.text_input("Enter Target URL")
+    if mode == "Multiple queries":
+        query_text = st.text_area("Enter Queries (one per line)")
+        queries = [line.strip() for line in query_text.splitlines() if line.strip()]
+        top_k = st.number_input("Top sections per query", min_value=1, max_value=50, value=5)
+    else:
+        query = st.text_input("Enter Query to Optimize For")
 
     # Dropdown to select the embedding model
     model_options = list(EMBEDDING_MODELS.keys())
     selected_model = st.selectbox("Choose Embedding Model", model_options)
 
+    # Results are kept in the session state, so paging and drill-down widgets, which rerun the script, keep them
     if st.button("Analyze"):
-        if url and query:
+        st.session_state.pop("analysis", None)
+        if mode == "History":
+            if url or query:
+                st.session_state["analysis"] = run_history(url, query, selected_model)
+            else:
+                st.warning("Please enter a URL or a query to look up.")
+        elif (url or mode == "Site search") and (queries if mode == "Multiple queries" else query):
             with st.spinner('Analyzing webpage...'):
                 if selected_model == "Gemini Text Embedding":
                     st.info("Using Gemini API for embedding generation. This may take a moment...")
-                
-                sections, scores, sentiments, entities = asyncio.run(analyze_webpage(url, query, selected_model))
-
-                if sections is None:
-                    st.error("Failed to process the webpage. Please check the URL or embedding model.")
-                    return
-
-                # Display the overall similarity score
-                st.subheader("Overall Similarity Score (Average):")
-                st.write(sum(scores) / len(scores))
-
-                # Display a heatmap of similarity scores
-                st.subheader("Section Similarity Scores Heatmap:")
-                st.plotly_chart(generate_heatmap(scores, [f"Section {i+1}" for i in range(len(scores))]))
-
-                # Generate and display optimization suggestions
-                suggestions = generate_optimization_suggestions(sections, scores, query)
-                st.subheader("Optimization Suggestions:")
-                for suggestion in suggestions:
-                    st.write(suggestion)
-
-                # Perform and display sentiment and entity analysis
-                st.subheader("Google Cloud Natural Language API Analysis:")
-                for i, (section, sentiment, section_entities) in enumerate(zip(sections, sentiments, entities)):
-                    st.write(f"**Section {i+1}:**")
-                    if sentiment:
-                        st.write(f"Sentiment: {sentiment.score:.2f} ({sentiment.magnitude:.2f})")
-                    else:
-                        st.write("Sentiment analysis failed.")
-                    st.write("Entities:")
-                    for entity in section_entities:
-                        st.write(f"  - {entity.name}: {entity.type_}")
+
+                if mode == "Single query":
+                    analysis = run_single_query(url, query, selected_model)
+                elif mode == "Multiple queries":
+                    analysis = run_multi_query(url, queries, selected_model, int(top_k))
+                elif mode == "Site search":
+                    analysis = run_search(query, selected_model, int(search_k))
+                else:
+                    analysis = run_site_crawl(seeds, sitemap or None, query, selected_model, int(max_pages),
+                                              int(max_depth))
+                st.session_state["analysis"] = analysis
+
+    analysis = st.session_state.get("analysis")
+    if analysis is not None and analysis["mode"] == mode:
+        DISPLAYS[mode](analysis)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,176 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from similarity_analyzer.config import CONFIG
+from similarity_analyzer.embedding_cache import content_key
+
+logger = logging.getLogger(__name__)
+
+# Expired and surplus entries are pruned after this many writes
+_PRUNE_INTERVAL = 256
+
+class NLPResultCache:
+    """
+    Persistent cache of serialized Google Cloud NLP responses.
+
+    Responses are keyed by request kind and the hash of the analyzed text and
+    stored in an SQLite database in WAL mode, so Streamlit sessions and worker
+    processes on the same machine share one cache. Entries older than `ttl`
+    seconds are ignored and pruned; beyond `max_entries` the least recently
+    used entries are evicted.
+    """
+
+    def __init__(self, path: str = None, ttl: float = None, max_entries: int = None):
+        self.path = path or os.path.join(CONFIG["NLP_CACHE_DIR"], "nlp_results.sqlite")
+        self.ttl = CONFIG["NLP_CACHE_TTL"] if ttl is None else ttl
+        self.max_entries = max_entries or CONFIG["NLP_CACHE_MAX_ENTRIES"]
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " kind TEXT NOT NULL, key TEXT NOT NULL, payload BLOB NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL, PRIMARY KEY (kind, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+        self.prune()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections may not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, kind: str, texts: list) -> dict:
+        """
+        Looks up cached responses for several texts.
+
+        Args:
+            kind (str): The request kind, e.g. "annotate".
+            texts (list): The analyzed texts.
+
+        Returns:
+            dict: Serialized responses keyed by text, for the texts that were cached.
+        """
+        keys = {content_key(text): text for text in texts}
+        found = {}
+        now = time.time()
+        try:
+            with self._connection() as conn:
+                key_list = list(keys)
+                for start in range(0, len(key_list), 500):
+                    chunk = key_list[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = conn.execute(
+                        f"SELECT key, payload FROM results WHERE kind = ? AND created >= ? AND key IN ({placeholders})",
+                        [kind, now - self.ttl, *chunk],
+                    ).fetchall()
+                    for key, payload in rows:
+                        found[keys[key]] = payload
+                    if rows:
+                        conn.execute(
+                            f"UPDATE results SET accessed = ? WHERE kind = ? AND key IN ({','.join('?' * len(rows))})",
+                            [now, kind, *(key for key, _ in rows)],
+                        )
+        except sqlite3.Error as e:
+            logger.warning(f"NLP cache lookup failed: {e}")
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, kind: str, text: str):
+        """
+        Looks up the cached response for a text.
+
+        Args:
+            kind (str): The request kind.
+            text (str): The analyzed text.
+
+        Returns:
+            bytes: The serialized response, or None if it is not cached or expired.
+        """
+        return self.get_many(kind, [text]).get(text)
+
+    def put(self, kind: str, text: str, payload: bytes):
+        """
+        Stores a serialized response.
+
+        Args:
+            kind (str): The request kind.
+            text (str): The analyzed text.
+            payload (bytes): The serialized response.
+        """
+        now = time.time()
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results (kind, key, payload, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (kind, content_key(text), payload, now, now),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"NLP cache write failed: {e}")
+            return
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % _PRUNE_INTERVAL == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """
+        Deletes expired entries and evicts the least recently used ones above `max_entries`.
+        """
+        try:
+            with self._connection() as conn:
+                conn.execute("DELETE FROM results WHERE created < ?", (time.time() - self.ttl,))
+                (count,) = conn.execute("SELECT COUNT(*) FROM results").fetchone()
+                if count > self.max_entries:
+                    conn.execute(
+                        "DELETE FROM results WHERE rowid IN (SELECT rowid FROM results ORDER BY accessed LIMIT ?)",
+                        (count - self.max_entries,),
+                    )
+        except sqlite3.Error as e:
+            logger.warning(f"NLP cache pruning failed: {e}")
+
+    def stats(self) -> dict:
+        """
+        Returns hit/miss counters.
+
+        Returns:
+            dict: hits, misses and hit_rate.
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_nlp_cache() -> NLPResultCache:
+    """
+    Returns the process-wide NLP result cache, or None if caching is disabled.
+
+    Returns:
+        NLPResultCache: The shared cache instance.
+    """
+    global _cache
+    if not CONFIG["NLP_CACHE_ENABLED"]:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = NLPResultCache()
+        return _cache
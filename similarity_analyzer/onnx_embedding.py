@@ -0,0 +1,115 @@
+import logging
+import os
+import numpy as np
+from similarity_analyzer.config import CONFIG
+from similarity_analyzer.quantization import DTYPES, quantize_rows
+
+logger = logging.getLogger(__name__)
+
+def length_batches(lengths: list, batch_tokens: int) -> list:
+    """
+    Groups sequence indices into batches of similar length.
+
+    Indices are sorted by length, and a batch is closed once padding every
+    sequence in it to the longest one would exceed `batch_tokens` tokens. Short
+    texts therefore share large batches and are never padded to the length of
+    a long one.
+
+    Args:
+        lengths (list): Token count of each sequence.
+        batch_tokens (int): Maximum padded tokens per batch.
+
+    Returns:
+        list: Lists of indices into `lengths`, one per batch.
+    """
+    batches = []
+    batch = []
+    for index in sorted(range(len(lengths)), key=lengths.__getitem__):
+        # Sorted ascending, so the newest sequence is the longest in the batch
+        if batch and (len(batch) + 1) * max(lengths[index], 1) > batch_tokens:
+            batches.append(batch)
+            batch = []
+        batch.append(index)
+    if batch:
+        batches.append(batch)
+    return batches
+
+class OnnxEmbeddingModel:
+    """
+    Sentence embedding model exported to ONNX and run on the CPU with onnxruntime.
+
+    The model directory holds `model.onnx` and a Hugging Face `tokenizer.json`,
+    as written by e.g. `optimum-cli export onnx` for a sentence-transformers
+    model. Token embeddings are mean-pooled over the attention mask unless the
+    model already outputs one vector per text, and the result is L2-normalized.
+    Nothing is downloaded, so the model works offline.
+    """
+
+    def __init__(self, model_dir: str, threads: int = None, max_length: int = None,
+                 batch_tokens: int = None, output_dtype: str = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_dir = model_dir
+        self.batch_tokens = batch_tokens or CONFIG["ONNX_BATCH_TOKENS"]
+        self.output_dtype = output_dtype or CONFIG["ONNX_OUTPUT_DTYPE"]
+        if self.output_dtype not in DTYPES:
+            raise ValueError(f"Unsupported embedding output type {self.output_dtype!r}")
+
+        options = ort.SessionOptions()
+        threads = CONFIG["ONNX_THREADS"] if threads is None else threads
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(os.path.join(model_dir, "model.onnx"), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.no_padding()
+        self.tokenizer.enable_truncation(max_length or CONFIG["ONNX_MAX_LENGTH"])
+        logger.info(f"Loaded ONNX embedding model from {model_dir} with inputs {sorted(self.input_names)}")
+
+    def _run_batch(self, encodings: list) -> np.ndarray:
+        seq_len = max(1, max(len(encoding.ids) for encoding in encodings))
+        input_ids = np.zeros((len(encodings), seq_len), dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), seq_len), dtype=np.int64)
+        for row, encoding in enumerate(encodings):
+            input_ids[row, :len(encoding.ids)] = encoding.ids
+            attention_mask[row, :len(encoding.ids)] = 1
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        output = self.session.run(None, {name: value for name, value in feeds.items() if name in self.input_names})[0]
+        if output.ndim == 2:
+            return output.astype(np.float32, copy=False)
+
+        mask = attention_mask[:, :, None].astype(np.float32)
+        return (output * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1.0)
+
+    def embed(self, texts: list) -> np.ndarray:
+        """
+        Embeds texts in length-sorted batches.
+
+        Args:
+            texts (list): A list of text strings.
+
+        Returns:
+            numpy.ndarray: One normalized embedding per text, in input order, in
+            the configured output type.
+        """
+        encodings = self.tokenizer.encode_batch(list(texts))
+        batches = length_batches([len(encoding.ids) for encoding in encodings], self.batch_tokens)
+        embeddings = None
+        for batch in batches:
+            batch_embeddings = self._run_batch([encodings[index] for index in batch])
+            if embeddings is None:
+                embeddings = np.empty((len(texts), batch_embeddings.shape[1]), dtype=np.float32)
+            embeddings[batch] = batch_embeddings
+        if embeddings is None:
+            return np.empty((0, 0), dtype=self.output_dtype)
+
+        logger.debug(f"Embedded {len(texts)} texts in {len(batches)} length-sorted batches")
+        # Per-row int8 scales are dropped; cosine similarity does not depend on them
+        return quantize_rows(embeddings, self.output_dtype)[0]
@@ -0,0 +1,580 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import time
+import numpy as np
+from similarity_analyzer.web_scraper import scrape_webpage, stream_webpage
+from similarity_analyzer.text_preprocessor import preprocess_text, preprocess_texts, uses_process_pool
+from similarity_analyzer.embedding_generator import generate_embeddings, load_model
+from similarity_analyzer.similarity_scorer import calculate_similarity, calculate_similarity_matrix, top_k_sections
+from similarity_analyzer.google_nlp import analyze_all_sections, serialize_annotation, deserialize_annotation
+from similarity_analyzer.crawler import crawl
+from similarity_analyzer.vector_index import get_vector_index
+from similarity_analyzer.snapshot_store import get_snapshot_store, diff_scores
+from similarity_analyzer.embedding_cache import get_embedding_cache, content_key
+from similarity_analyzer.chunker import chunk_sections, rollup_scores, best_chunks
+from similarity_analyzer.suggestions import query_terms
+from similarity_analyzer.config import CONFIG
+from similarity_analyzer.instrumentation import telemetry
+
+logger = logging.getLogger(__name__)
+
+def embed_texts(model_name: str, texts: list, embed_fn=None):
+    """
+    Generates embeddings through the persistent embedding cache.
+
+    The selected model is only loaded, and only called, for texts that are not
+    cached yet.
+
+    Args:
+        model_name (str): The name of the embedding model to use.
+        texts (list): A list of preprocessed text strings.
+        embed_fn (callable): Optional function called as embed_fn(model_name, texts)
+            for uncached texts instead of loading the model in this process.
+
+    Returns:
+        numpy.ndarray: An array of embeddings, or None if the model could not be loaded.
+    """
+    def embed_uncached(uncached_texts):
+        if embed_fn is not None:
+            return embed_fn(model_name, uncached_texts)
+        model = load_model(model_name)
+        if not model:
+            return None
+        return generate_embeddings(model, uncached_texts)
+
+    cache = get_embedding_cache()
+    if cache is None:
+        return embed_uncached(texts)
+    return cache.embed(model_name, texts, embed_uncached)
+
+def chunk_for_embedding(sections: list, regions: list = None, merge: bool = True) -> tuple:
+    """
+    Repacks sections into embedding chunks when CONFIG["CHUNKING_ENABLED"] is set.
+
+    Args:
+        sections (list): The raw text sections.
+        regions (list): Optional region label of each section; chunks never merge two regions.
+        merge (bool): Whether small adjacent sections may be merged, or only long ones split.
+
+    Returns:
+        tuple: The texts to embed and the section range of each (see
+               `chunker.chunk_sections`), or the sections themselves and None
+               when chunking is disabled.
+    """
+    if not CONFIG["CHUNKING_ENABLED"]:
+        return sections, None
+    return chunk_sections(sections, min_tokens=None if merge else 0, regions=regions)
+
+def score_sections(query_embedding, chunk_embeddings, spans: list, count: int) -> tuple:
+    """
+    Scores embedded chunks against the query and rolls the scores up to sections.
+
+    Args:
+        query_embedding (numpy.ndarray): The query embedding.
+        chunk_embeddings (numpy.ndarray): The chunk embeddings.
+        spans (list): The section range of each chunk, or None if sections were not chunked.
+        count (int): The number of sections.
+
+    Returns:
+        tuple: The similarity score of each section, and the embedding of each
+               section's best-matching chunk.
+    """
+    scores = calculate_similarity(query_embedding, chunk_embeddings)
+    if spans is None:
+        return scores, chunk_embeddings
+    best = best_chunks(scores, spans, count)
+    return np.asarray(scores)[best].tolist(), chunk_embeddings[best]
+
+async def embed_sections_pipelined(sections: list, model_name: str, timings: dict, embed_fn=None):
+    """
+    Preprocesses and embeds sections in batches, overlapping the two stages.
+
+    A producer preprocesses batches of CONFIG["PIPELINE_BATCH_SIZE"] sections in
+    a worker thread while the previous batch is being embedded. The queue between
+    the stages holds at most CONFIG["PIPELINE_QUEUE_SIZE"] batches, so a fast
+    preprocessor cannot run ahead of embedding and hold the whole page in memory.
+
+    Pipeline batches are smaller than `text_preprocessor.PROCESS_POOL_MIN_TEXTS`,
+    so they would never reach the process pool. When CONFIG["PREPROCESS_PROCESSES"]
+    is set and the page is large enough for the pool (see
+    `text_preprocessor.uses_process_pool`), the whole page is preprocessed in one
+    pool run instead, and only embedding proceeds in batches.
+
+    Args:
+        sections (list): The raw text sections.
+        model_name (str): The name of the embedding model to use.
+        timings (dict): Receives the seconds spent in the "preprocess" and "embed" stages.
+        embed_fn (callable): Optional embedding function, see `embed_texts`.
+
+    Returns:
+        numpy.ndarray: The section embeddings, or None if embedding failed.
+    """
+    batch_size = CONFIG["PIPELINE_BATCH_SIZE"]
+    queue = asyncio.Queue(maxsize=CONFIG["PIPELINE_QUEUE_SIZE"])
+    timings.setdefault("preprocess", 0.0)
+    timings.setdefault("embed", 0.0)
+
+    async def preprocess_stage():
+        if uses_process_pool(len(sections)):
+            stage_start = time.perf_counter()
+            processed = await asyncio.to_thread(preprocess_texts, sections)
+            timings["preprocess"] += time.perf_counter() - stage_start
+            for start in range(0, len(processed), batch_size):
+                await queue.put(processed[start:start + batch_size])
+        else:
+            for start in range(0, len(sections), batch_size):
+                stage_start = time.perf_counter()
+                processed = await asyncio.to_thread(preprocess_texts, sections[start:start + batch_size])
+                timings["preprocess"] += time.perf_counter() - stage_start
+                await queue.put(processed)
+        await queue.put(None)
+
+    async def next_batch():
+        getter = asyncio.ensure_future(queue.get())
+        try:
+            await asyncio.wait({getter, producer}, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                # The producer finished without queueing another batch: re-raise its error
+                producer.result()
+            return await getter
+        finally:
+            getter.cancel()
+
+    producer = asyncio.create_task(preprocess_stage())
+    embeddings = []
+    try:
+        while True:
+            batch = await next_batch()
+            if batch is None:
+                break
+            stage_start = time.perf_counter()
+            batch_embeddings = await asyncio.to_thread(embed_texts, model_name, batch, embed_fn)
+            timings["embed"] += time.perf_counter() - stage_start
+            telemetry.record_span("embed_texts", stage_start, time.perf_counter() - stage_start, model=model_name)
+            if batch_embeddings is None:
+                return None
+            embeddings.append(np.asarray(batch_embeddings))
+        await producer
+    finally:
+        producer.cancel()
+    return np.concatenate(embeddings)
+
+async def analyze_webpage(url: str, query: str, model_name: str, timings: dict = None, embed_fn=None,
+                          page: dict = None):
+    """
+    Asynchronous function to perform all analysis operations.
+
+    After scraping, sentiment and entity analysis runs concurrently with the
+    preprocessing and embedding pipeline, so page latency is bounded by the
+    slowest stage rather than the sum of all of them. Blocking work runs in
+    worker threads and never stalls the event loop. Sections are embedded as
+    token-bounded chunks (see `chunk_for_embedding`) and each section is scored
+    by the chunks it belongs to.
+
+    Args:
+        url (str): The URL of the webpage to analyze.
+        query (str): The query to optimize for.
+        model_name (str): The name of the embedding model to use.
+        timings (dict): Optional dict that receives the seconds spent in each
+            stage ("scrape", "preprocess", "embed", "score", "nlp") and "total".
+            Overlapping stages add up to more than the total.
+        embed_fn (callable): Optional embedding function, see `embed_texts`.
+        page (dict): Optional dict that receives the page "title", the
+            "regions" of its sections (see `web_scraper.parse_html`), the
+            section "embeddings", the "query_embedding", and the query "terms"
+            with their "term_embeddings", for `suggestions.suggest_improvements`.
+
+    Returns:
+        tuple: Processed sections, similarity scores, sentiments, and entities.
+    """
+    logger.info(f"Analyzing URL: {url} with query: {query}")
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+
+    # Scraping the webpage content
+    webpage_data = await asyncio.to_thread(scrape_webpage, url)
+    timings["scrape"] = time.perf_counter() - start
+    if not webpage_data:
+        return None, None, None, None
+
+    sections = webpage_data["sections"]
+    if page is not None:
+        page.update(title=webpage_data["title"], regions=webpage_data.get("regions"))
+
+    # Start sentiment and entity analysis while the sections are being embedded
+    async def nlp_stage():
+        stage_start = time.perf_counter()
+        try:
+            return await analyze_all_sections(sections)
+        finally:
+            timings["nlp"] = time.perf_counter() - stage_start
+            telemetry.record_span("nlp_stage", stage_start, timings["nlp"])
+
+    nlp_task = asyncio.create_task(nlp_stage())
+    try:
+        chunks, spans = await asyncio.to_thread(chunk_for_embedding, sections, webpage_data.get("regions"))
+        terms = query_terms(query) if page is not None else []
+        # The query (and its terms) ride along in the first batch rather than in a separate embedding call, so one
+        # analysis embeds one batch at a time; analyses in other threads (e.g. CLI workers) may still embed concurrently
+        embeddings = await embed_sections_pipelined([query] + terms + chunks, model_name, timings, embed_fn)
+        if embeddings is None:
+            return None, None, None, None
+        query_embedding, chunk_embeddings = embeddings[:1], embeddings[1 + len(terms):]
+
+        # Calculate similarity scores
+        stage_start = time.perf_counter()
+        scores, section_embeddings = score_sections(query_embedding, chunk_embeddings, spans, len(sections))
+        timings["score"] = time.perf_counter() - stage_start
+        if page is not None:
+            page.update(embeddings=section_embeddings, query_embedding=query_embedding[0], terms=terms,
+                        term_embeddings=embeddings[1:1 + len(terms)])
+
+        sentiments, entities = await nlp_task
+    finally:
+        nlp_task.cancel()
+        timings["total"] = time.perf_counter() - start
+        telemetry.record_span("analyze_webpage", start, timings["total"])
+
+    logger.info(f"Analyzed {url} in {timings['total']:.2f}s: " +
+                ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items() if stage != "total"))
+    return sections, scores, sentiments, entities
+
+async def analyze_webpage_stream(url: str, query: str, model_name: str, on_batch, batch_size: int = None,
+                                 timings: dict = None, embed_fn=None, top_k: int = 5, page: dict = None) -> dict:
+    """
+    Analyzes a webpage of any size with memory bounded by the batch size.
+
+    Sections are parsed from the response as it downloads (see
+    `web_scraper.stream_webpage`) and flow through chunking, preprocessing,
+    embedding, scoring and NLP in batches of `batch_size`. Each finished batch
+    is handed to `on_batch` and dropped; only running aggregates and the
+    `top_k` best and worst sections are kept. The next batch is parsed while
+    the current one is embedded and annotated.
+
+    Args:
+        url (str): The URL of the webpage to analyze.
+        query (str): The query to optimize for.
+        model_name (str): The name of the embedding model to use.
+        on_batch (callable): Called as on_batch(offset, sections, scores,
+            sentiments, entities) for each batch, where `offset` is the index
+            of the batch's first section on the page.
+        batch_size (int): Sections per batch. Defaults to CONFIG["STREAM_BATCH_SECTIONS"].
+        timings (dict): Optional dict that receives the seconds spent in the
+            "scrape", "embed" and "nlp" stages and "total".
+        embed_fn (callable): Optional embedding function, see `embed_texts`.
+        top_k (int): The number of best and worst sections to report.
+        page (dict): Optional dict that receives the page "title" and "links".
+
+    Returns:
+        dict: The page "title", its number of "sections", the "average",
+              "min" and "max" score, and the "best" and "worst" sections (dicts
+              with section_index, section and score), or None if the page could
+              not be fetched or embedded.
+    """
+    logger.info(f"Streaming analysis of URL: {url} with query: {query}")
+    batch_size = batch_size or CONFIG["STREAM_BATCH_SECTIONS"]
+    timings = {} if timings is None else timings
+    timings.update(scrape=0.0, embed=0.0, nlp=0.0)
+    page = {} if page is None else page
+    start = time.perf_counter()
+
+    query_embedding = await asyncio.to_thread(embed_texts, model_name, preprocess_texts([query]), embed_fn)
+    if query_embedding is None:
+        return None
+    sections = stream_webpage(url, page=page, dedup_window=batch_size)
+
+    def read_batch():
+        stage_start = time.perf_counter()
+        try:
+            return list(itertools.islice(sections, batch_size))
+        except Exception as e:
+            logger.error(f"An error occurred while streaming {url}: {type(e).__name__} - {e}")
+            return None
+        finally:
+            timings["scrape"] += time.perf_counter() - stage_start
+
+    def embed_batch(texts, regions):
+        chunks, spans = chunk_for_embedding(texts, regions)
+        return embed_texts(model_name, preprocess_texts(chunks), embed_fn), spans
+
+    async def nlp_stage(texts):
+        stage_start = time.perf_counter()
+        try:
+            return await analyze_all_sections(texts)
+        finally:
+            timings["nlp"] += time.perf_counter() - stage_start
+
+    summary = {"title": None, "sections": 0, "average": None, "min": None, "max": None, "best": [], "worst": []}
+    total = 0.0
+    batch = await asyncio.to_thread(read_batch)
+    try:
+        while batch:
+            next_batch = asyncio.create_task(asyncio.to_thread(read_batch))
+            texts = [text for text, _ in batch]
+            nlp_task = asyncio.create_task(nlp_stage(texts))
+            try:
+                stage_start = time.perf_counter()
+                chunk_embeddings, spans = await asyncio.to_thread(embed_batch, texts, [region for _, region in batch])
+                timings["embed"] += time.perf_counter() - stage_start
+                if chunk_embeddings is None:
+                    next_batch.cancel()
+                    return None
+                scores, _ = score_sections(query_embedding, chunk_embeddings, spans, len(texts))
+                sentiments, entities = await nlp_task
+            finally:
+                nlp_task.cancel()
+
+            offset = summary["sections"]
+            on_batch(offset, texts, scores, sentiments, entities)
+            ranked = [{"section_index": offset + i, "section": text, "score": float(score)}
+                      for i, (text, score) in enumerate(zip(texts, scores))]
+            summary["best"] = heapq.nlargest(top_k, summary["best"] + ranked, key=lambda row: row["score"])
+            summary["worst"] = heapq.nsmallest(top_k, summary["worst"] + ranked, key=lambda row: row["score"])
+            summary["sections"] += len(texts)
+            total += sum(scores)
+            telemetry.count("stream_batches_total")
+            batch = await next_batch
+    finally:
+        timings["total"] = time.perf_counter() - start
+        telemetry.record_span("analyze_webpage_stream", start, timings["total"])
+
+    if batch is None or not summary["sections"]:
+        if batch is not None:
+            logger.warning(f"No content found on {url}.")
+        return None
+    summary.update(title=page.get("title"), average=total / summary["sections"],
+                   min=summary["worst"][0]["score"], max=summary["best"][0]["score"])
+    logger.info(f"Streamed {summary['sections']} sections of {url} in {timings['total']:.2f}s")
+    return summary
+
+async def reanalyze_webpage(url: str, query: str, model_name: str, timings: dict = None, embed_fn=None, store=None):
+    """
+    Re-analyzes a webpage, recomputing only the sections that changed since its last snapshot.
+
+    The page is fetched conditionally with the snapshot's ETag and
+    Last-Modified validators; an unchanged page is not downloaded or parsed
+    again. Otherwise sections are matched to the snapshot by content hash, and
+    only new or edited sections are preprocessed, embedded and annotated. The
+    snapshot is then replaced by the new results.
+
+    Args:
+        url (str): The URL of the webpage to analyze.
+        query (str): The query to optimize for.
+        model_name (str): The name of the embedding model to use.
+        timings (dict): Optional dict that receives per-stage seconds, as in
+            `analyze_webpage`, plus "recomputed" and "reused" section counts.
+        embed_fn (callable): Optional embedding function, see `embed_texts`.
+        store (SnapshotStore): Snapshot store. Defaults to the shared store.
+
+    Returns:
+        tuple: Sections, similarity scores, sentiments, entities and the score
+               diff against the previous snapshot (see `snapshot_store.diff_scores`;
+               every section is "added" on the first run), or five Nones on failure.
+    """
+    logger.info(f"Re-analyzing URL: {url} with query: {query}")
+    timings = {} if timings is None else timings
+    store = store or get_snapshot_store()
+    start = time.perf_counter()
+
+    snapshot = await asyncio.to_thread(store.load, url, query, model_name)
+    webpage_data = await asyncio.to_thread(scrape_webpage, url, etag=snapshot and snapshot["etag"],
+                                           last_modified=snapshot and snapshot["last_modified"])
+    timings["scrape"] = time.perf_counter() - start
+    if not webpage_data:
+        return None, None, None, None, None
+    if snapshot is None:
+        snapshot = {"hashes": [], "sections": [], "scores": [], "annotations": []}
+
+    if webpage_data.get("not_modified"):
+        sections = snapshot["sections"]
+    else:
+        sections = webpage_data["sections"]
+    previous = {key: (score, annotation) for key, score, annotation
+                in zip(snapshot["hashes"], snapshot["scores"], snapshot["annotations"])}
+    keys = [content_key(section) for section in sections]
+    changed = list(dict.fromkeys(section for section, key in zip(sections, keys) if key not in previous))
+    # Sections whose earlier annotation failed are annotated again even if their text is unchanged
+    unannotated = list(dict.fromkeys(section for section, key in zip(sections, keys)
+                                     if key not in previous or previous[key][1] is None))
+
+    async def nlp_stage():
+        stage_start = time.perf_counter()
+        try:
+            return await analyze_all_sections(unannotated) if unannotated else ([], [])
+        finally:
+            timings["nlp"] = time.perf_counter() - stage_start
+            telemetry.record_span("nlp_stage", stage_start, timings["nlp"])
+
+    nlp_task = asyncio.create_task(nlp_stage())
+    try:
+        new_scores = {}
+        if changed:
+            # Changed sections are not adjacent in general, so they are only split, never merged
+            chunks, spans = await asyncio.to_thread(chunk_for_embedding, changed, None, False)
+            embeddings = await embed_sections_pipelined([query] + chunks, model_name, timings, embed_fn)
+            if embeddings is None:
+                return None, None, None, None, None
+            stage_start = time.perf_counter()
+            new_scores = dict(zip(changed, score_sections(embeddings[:1], embeddings[1:], spans, len(changed))[0]))
+            timings["score"] = time.perf_counter() - stage_start
+        new_sentiments, new_entities = await nlp_task
+    finally:
+        nlp_task.cancel()
+
+    annotated = {section: (sentiment, entities)
+                 for section, sentiment, entities in zip(unannotated, new_sentiments, new_entities)}
+    scores, sentiments, entities, annotations = [], [], [], []
+    for section, key in zip(sections, keys):
+        if section in new_scores:
+            scores.append(new_scores[section])
+        else:
+            scores.append(previous[key][0])
+        if section in annotated:
+            sentiment, section_entities = annotated[section]
+            annotation = serialize_annotation(sentiment, section_entities)
+        else:
+            annotation = previous[key][1]
+            sentiment, section_entities = deserialize_annotation(annotation)
+        sentiments.append(sentiment)
+        entities.append(section_entities)
+        annotations.append(annotation)
+
+    await asyncio.to_thread(store.save, url, query, model_name, sections, scores, annotations,
+                            webpage_data.get("etag"), webpage_data.get("last_modified"))
+    diff = diff_scores(snapshot["sections"], snapshot["scores"], sections, scores)
+    timings["recomputed"] = len(changed)
+    timings["reused"] = len(sections) - len(changed)
+    timings["total"] = time.perf_counter() - start
+    telemetry.record_span("reanalyze_webpage", start, timings["total"])
+    telemetry.count("sections_recomputed_total", len(changed))
+    telemetry.count("sections_reused_total", len(sections) - len(changed))
+    logger.info(f"Re-analyzed {url} in {timings['total']:.2f}s: {len(changed)} of {len(sections)} sections recomputed")
+    return sections, scores, sentiments, entities, diff
+
+async def analyze_webpage_queries(url: str, queries: list, model_name: str, top_k: int = 5, embed_fn=None):
+    """
+    Scores one webpage against a list of queries in a single pass.
+
+    The page is scraped, preprocessed and embedded once, all queries are
+    embedded in one batch, and the full score matrix is computed with a
+    single matrix multiply. Scraping and embedding run in worker threads and
+    never stall the event loop.
+
+    Args:
+        url (str): The URL of the webpage to analyze.
+        queries (list): The queries to score the page against.
+        model_name (str): The name of the embedding model to use.
+        top_k (int): The number of best-matching sections to report per query.
+        embed_fn (callable): Optional embedding function, see `embed_texts`.
+
+    Returns:
+        tuple: Sections, the (queries x sections) score matrix, and a list of
+               per-query summaries with the average score and top-k sections.
+    """
+    logger.info(f"Analyzing URL: {url} with {len(queries)} queries")
+
+    webpage_data = await asyncio.to_thread(scrape_webpage, url)
+    if not webpage_data:
+        return None, None, None
+
+    sections = webpage_data["sections"]
+
+    def embed_page():
+        chunks, spans = chunk_for_embedding(sections, webpage_data.get("regions"))
+        chunk_embeddings = embed_texts(model_name, preprocess_texts(chunks), embed_fn)
+        query_embeddings = embed_texts(model_name, preprocess_texts(queries), embed_fn)
+        return chunk_embeddings, query_embeddings, spans
+
+    chunk_embeddings, query_embeddings, spans = await asyncio.to_thread(embed_page)
+    if chunk_embeddings is None or query_embeddings is None:
+        return None, None, None
+
+    score_matrix = calculate_similarity_matrix(query_embeddings, chunk_embeddings)
+    if spans is not None:
+        score_matrix = rollup_scores(score_matrix, spans, len(sections))
+    summaries = [
+        {"query": query, "average": float(row.mean()), "top_sections": top}
+        for query, row, top in zip(queries, score_matrix, top_k_sections(score_matrix, top_k))
+    ]
+    return sections, score_matrix, summaries
+
+async def analyze_site(query: str, model_name: str, seeds: list = None, sitemap: str = None,
+                       index_pages: bool = True, embed_fn=None, **crawl_options):
+    """
+    Crawls a site and scores every page against the query as pages arrive.
+
+    The query is embedded once. Each crawled page is chunked, preprocessed and
+    embedded in a worker thread while the crawler keeps fetching, and its
+    sections are scored as in `analyze_webpage`. Chunk embeddings are also
+    stored in the model's vector index, so later queries can search the site
+    without re-crawling or re-embedding it.
+
+    Unless a `queue_name` is given, the crawl's request queue is named after the
+    query, model and seeds, so only an interrupted run of the same crawl resumes
+    from it.
+
+    Args:
+        query (str): The query to optimize for.
+        model_name (str): The name of the embedding model to use.
+        seeds (list): Seed URLs to start the crawl from.
+        sitemap (str): URL of a sitemap listing the pages to crawl.
+        index_pages (bool): Whether to add crawled pages to the vector index.
+        embed_fn (callable): Optional embedding function, see `embed_texts`.
+        **crawl_options: Further keyword arguments passed to `crawler.crawl`.
+
+    Yields:
+        tuple: The page URL, page title, sections and similarity scores.
+    """
+    logger.info(f"Analyzing site with query: {query}")
+    query_embedding = embed_texts(model_name, [preprocess_text(query)], embed_fn)
+    if query_embedding is None:
+        return
+
+    def embed_page(page):
+        chunks, spans = chunk_for_embedding(page["sections"], page.get("regions"))
+        return chunks, spans, embed_texts(model_name, preprocess_texts(chunks), embed_fn)
+
+    crawl_options.setdefault("queue_name", "site-" + content_key(
+        json.dumps([query, model_name, sorted(seeds or []), sitemap]))[:16])
+    index = get_vector_index(model_name) if index_pages else None
+    try:
+        async for page in crawl(seeds, sitemap, **crawl_options):
+            sections = page["sections"]
+            if not sections:
+                continue
+            chunks, spans, chunk_embeddings = await asyncio.to_thread(embed_page, page)
+            if chunk_embeddings is None:
+                continue
+            if index is not None:
+                index.add_page(page["url"], chunks, chunk_embeddings, spans and [start for start, _ in spans])
+            scores, _ = score_sections(query_embedding, chunk_embeddings, spans, len(sections))
+            yield page["url"], page["title"], sections, scores
+    finally:
+        if index is not None:
+            index.maybe_train()
+            index.save()
+
+def search_site(query: str, model_name: str, k: int = 10, embed_fn=None) -> list:
+    """
+    Finds the best-matching sections for a query across all indexed pages.
+
+    Only the query is embedded; page sections come from the vector index filled
+    by earlier site crawls.
+
+    Args:
+        query (str): The query to search for.
+        model_name (str): The name of the embedding model the pages were indexed with.
+        k (int): The number of sections to return.
+        embed_fn (callable): Optional embedding function, see `embed_texts`.
+
+    Returns:
+        list: Dicts with url, section_index, section and score, best first, or
+              None if the query could not be embedded.
+    """
+    query_embedding = embed_texts(model_name, [preprocess_text(query)], embed_fn)
+    if query_embedding is None:
+        return None
+    return get_vector_index(model_name).search(query_embedding, k)
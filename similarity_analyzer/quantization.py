@@ -0,0 +1,191 @@
+import logging
+import os
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DTYPES = ("float32", "float16", "int8")
+
+# Rows converted to float32 at a time while scoring; the conversion buffer stays in cache
+BLOCK_ROWS = 4096
+
+def row_norms(matrix: np.ndarray) -> np.ndarray:
+    """Returns the L2 norm of each row without materializing a squared copy of the matrix."""
+    matrix = np.asarray(matrix)
+    if matrix.dtype not in (np.float32, np.float64):
+        matrix = matrix.astype(np.float32)
+    return np.sqrt(np.einsum("ij,ij->i", matrix, matrix))
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Returns float32 rows scaled to unit L2 norm, leaving all-zero rows untouched."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = row_norms(matrix)
+    norms[norms == 0] = 1.0
+    return matrix / norms[:, None]
+
+def quantize_rows(embeddings: np.ndarray, dtype: str) -> tuple:
+    """
+    Normalizes embeddings to unit length and converts them to a storage type.
+
+    int8 rows get a float32 scale each (row ~= values * scale, with scale
+    chosen so the largest component maps to 127), which keeps the full int8
+    range for every vector. Cosine similarity of a row does not depend on its
+    scale, so the values alone can be compared as vectors.
+
+    Args:
+        embeddings (numpy.ndarray): A (vectors x dim) array in any float type.
+        dtype (str): "float32", "float16" or "int8".
+
+    Returns:
+        tuple: The converted values, and the scale of each row for int8 (otherwise None).
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported embedding type {dtype!r}; choose one of {', '.join(DTYPES)}")
+    block = normalize_rows(embeddings)
+    if dtype != "int8":
+        return block.astype(dtype, copy=False), None
+    scales = np.abs(block).max(axis=1) / 127
+    scales[scales == 0] = 1.0
+    return np.rint(block / scales[:, None]).astype(np.int8), scales
+
+def _scales_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".scales.npy"
+
+class QuantizedEmbeddings:
+    """
+    L2-normalized embeddings stored as float32, float16 or int8.
+
+    Rows are normalized once, before quantization, so scoring against a
+    normalized query is a plain dot product with no norms to recompute. int8
+    rows keep a float32 scale each, see `quantize_rows`. The values (and
+    scales) may be memory-mapped arrays, e.g. from `load`.
+    """
+
+    def __init__(self, values: np.ndarray, scales: np.ndarray = None):
+        self.values = values
+        self.scales = scales
+
+    @classmethod
+    def quantize(cls, embeddings: np.ndarray, dtype: str = "int8", block_rows: int = BLOCK_ROWS):
+        """
+        Normalizes and quantizes embeddings.
+
+        Args:
+            embeddings (numpy.ndarray): A (vectors x dim) array in any float type.
+            dtype (str): "float32", "float16" or "int8".
+            block_rows (int): Rows converted at a time, bounding temporary memory.
+
+        Returns:
+            QuantizedEmbeddings: The quantized embeddings.
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported embedding type {dtype!r}; choose one of {', '.join(DTYPES)}")
+        embeddings = np.asarray(embeddings)
+        values = np.empty(embeddings.shape, dtype=dtype)
+        scales = np.empty(len(embeddings), dtype=np.float32) if dtype == "int8" else None
+        for start in range(0, len(embeddings), block_rows):
+            block, block_scales = quantize_rows(embeddings[start:start + block_rows], dtype)
+            values[start:start + len(block)] = block
+            if scales is not None:
+                scales[start:start + len(block)] = block_scales
+        return cls(values, scales)
+
+    def save(self, path: str):
+        """
+        Writes the values to `path` as .npy, and int8 scales next to it.
+        """
+        np.save(path, self.values)
+        if self.scales is not None:
+            np.save(_scales_path(path), self.scales)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: str = "r"):
+        """
+        Reads embeddings written by `save`, memory-mapped by default.
+        """
+        scales_path = _scales_path(path)
+        scales = np.load(scales_path, mmap_mode=mmap_mode) if os.path.exists(scales_path) else None
+        return cls(np.load(path, mmap_mode=mmap_mode), scales)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def dtype(self) -> str:
+        return self.values.dtype.name
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the values and scales."""
+        return self.values.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def dequantize(self, start: int = 0, stop: int = None) -> np.ndarray:
+        """
+        Returns rows as float32 unit vectors (approximately, after quantization).
+        """
+        block = self.values[start:stop].astype(np.float32)
+        if self.scales is not None:
+            block *= self.scales[start:stop, None]
+        return block
+
+    def dot(self, queries: np.ndarray, block_rows: int = BLOCK_ROWS) -> np.ndarray:
+        """
+        Computes cosine similarity between queries and every stored vector.
+
+        Args:
+            queries (numpy.ndarray): A (queries x dim) array; normalized here.
+            block_rows (int): Stored rows converted to float32 at a time.
+
+        Returns:
+            numpy.ndarray: A (queries x vectors) float32 array of cosine similarities.
+        """
+        queries = normalize_rows(np.atleast_2d(queries))
+        scores = np.empty((len(queries), len(self)), dtype=np.float32)
+        buffer = None
+        for start in range(0, len(self), block_rows):
+            stop = min(start + block_rows, len(self))
+            block = self.values[start:stop]
+            if block.dtype != np.float32:
+                # Reusing one small buffer is several times faster than a fresh astype() per block
+                if buffer is None:
+                    buffer = np.empty((min(block_rows, len(self)), block.shape[1]), dtype=np.float32)
+                np.copyto(buffer[:len(block)], block)
+                block = buffer[:len(block)]
+            np.matmul(queries, block.T, out=scores[:, start:stop])
+            if self.scales is not None:
+                scores[:, start:stop] *= self.scales[start:stop]
+        return scores
+
+def quantization_report(embeddings: np.ndarray, queries: np.ndarray, dtype: str, k: int = 10) -> dict:
+    """
+    Measures how much quantization changes similarity scores and rankings.
+
+    Scores are compared on the 0-10 scale used throughout the app, against
+    float32 scores of the same vectors.
+
+    Args:
+        embeddings (numpy.ndarray): Section embeddings.
+        queries (numpy.ndarray): Query embeddings.
+        dtype (str): The quantized type to evaluate.
+        k (int): Ranking depth for the top-k recall.
+
+    Returns:
+        dict: dtype, bytes_per_vector, max_abs_error, mean_abs_error and
+              top_k_recall (share of the float32 top-k also in the quantized top-k).
+    """
+    reference = QuantizedEmbeddings.quantize(embeddings, "float32").dot(queries) * 10
+    quantized = QuantizedEmbeddings.quantize(embeddings, dtype)
+    scores = quantized.dot(queries) * 10
+    errors = np.abs(scores - reference)
+
+    k = min(k, reference.shape[1])
+    reference_top = np.argpartition(-reference, k - 1, axis=1)[:, :k]
+    quantized_top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(reference_top.tolist(), quantized_top.tolist())])
+    return {
+        "dtype": dtype,
+        "bytes_per_vector": quantized.nbytes / max(len(quantized), 1),
+        "max_abs_error": float(errors.max()) if errors.size else 0.0,
+        "mean_abs_error": float(errors.mean()) if errors.size else 0.0,
+        "top_k_recall": float(recall),
+    }
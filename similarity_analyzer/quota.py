@@ -0,0 +1,237 @@
+import contextlib
+import contextvars
+import hashlib
+import heapq
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from similarity_analyzer.config import CONFIG
+from similarity_analyzer.instrumentation import telemetry
+
+logger = logging.getLogger(__name__)
+
+# Request priorities; lower values are served first
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+_priority = contextvars.ContextVar("quota_priority", default=INTERACTIVE)
+
+def current_priority() -> int:
+    """Returns the priority of remote calls made in the current context."""
+    return _priority.get()
+
+@contextlib.contextmanager
+def request_priority(priority):
+    """
+    Runs the enclosed block, and the coroutines and to_thread calls it starts, at a priority.
+
+    Args:
+        priority: INTERACTIVE, BATCH, or one of their names.
+    """
+    if isinstance(priority, str):
+        priority = {name: value for value, name in PRIORITY_NAMES.items()}[priority]
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def key_id(api_key: str = None) -> str:
+    """Returns a short, non-reversible identifier of an API key, so keys are never written to disk."""
+    if not api_key:
+        return "default"
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+class QuotaStore:
+    """
+    Token buckets per (api, key), kept in SQLite so every thread and process on a machine draws from the same quota.
+
+    Each bucket refills at its rate times an adaptive factor. A 429 halves the
+    factor, and it recovers linearly to 1 over QUOTA_RECOVERY_SECONDS. Buckets
+    are updated in IMMEDIATE transactions, so concurrent processes never take
+    the same token.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(CONFIG["QUOTA_DIR"], "quota.sqlite")
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " api TEXT NOT NULL, key TEXT NOT NULL, tokens REAL NOT NULL, factor REAL NOT NULL,"
+            " updated REAL NOT NULL, penalized REAL NOT NULL, PRIMARY KEY (api, key))"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections may not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _update(self, api: str, key: str, burst: float, change) -> float:
+        """Recovers a bucket's rate factor, applies `change(tokens, factor, now, elapsed, penalized)` and stores the state it returns."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, factor, updated, penalized FROM buckets WHERE api = ? AND key = ?",
+                               (api, key)).fetchone()
+            now = time.time()
+            tokens, factor, updated, penalized = row or (burst, 1.0, now, 0.0)
+            # Clocks of other processes may lag slightly behind ours
+            elapsed = max(0.0, now - updated)
+            factor = min(1.0, factor + elapsed / CONFIG["QUOTA_RECOVERY_SECONDS"])
+            tokens, factor, penalized, result = change(tokens, factor, now, elapsed, penalized)
+            conn.execute("INSERT OR REPLACE INTO buckets (api, key, tokens, factor, updated, penalized)"
+                         " VALUES (?, ?, ?, ?, ?, ?)", (api, key, tokens, factor, now, penalized))
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def take(self, api: str, key: str, rate: float, burst: float, reserve: float = 0) -> float:
+        """
+        Takes one token if more than `reserve` tokens would be left.
+
+        Args:
+            api (str): The remote API, e.g. "gemini" or "cloud_nlp".
+            key (str): The API key identifier, see `key_id`.
+            rate (float): Tokens added per second at full speed.
+            burst (float): Bucket capacity.
+            reserve (float): Tokens that must stay in the bucket, kept for higher priorities.
+
+        Returns:
+            float: 0 if a token was taken, otherwise the seconds until one may be.
+        """
+        def change(tokens, factor, now, elapsed, penalized):
+            tokens = min(burst, tokens + elapsed * rate * factor)
+            if tokens >= 1 + reserve:
+                return tokens - 1, factor, penalized, 0.0
+            return tokens, factor, penalized, (1 + reserve - tokens) / (rate * factor)
+
+        try:
+            return self._update(api, key, burst, change)
+        except sqlite3.Error as e:
+            logger.warning(f"Quota store {self.path} unavailable, pacing {api} locally: {e}")
+            time.sleep(1 / rate)
+            return 0.0
+
+    def penalize(self, api: str, key: str, burst: float):
+        """
+        Halves a bucket's rate after a 429 and empties it.
+
+        Several requests in flight usually fail together, so a bucket is only
+        slowed down once per second.
+        """
+        def change(tokens, factor, now, elapsed, penalized):
+            if now - penalized < 1:
+                return min(tokens, 0.0), factor, penalized, factor
+            factor = max(CONFIG["QUOTA_MIN_RATE_FACTOR"], factor / 2)
+            return min(tokens, 0.0), factor, now, factor
+
+        try:
+            factor = self._update(api, key, burst, change)
+            logger.warning(f"{api} quota exhausted, slowing to {factor:.0%} of its rate")
+        except sqlite3.Error as e:
+            logger.warning(f"Could not record {api} quota backoff in {self.path}: {e}")
+
+class QuotaScheduler:
+    """
+    Admits remote API calls by priority, within the quota shared through a QuotaStore.
+
+    Callers of one (api, key) queue in a priority heap; only the head of the
+    queue draws tokens, so a newly queued interactive request preempts batch
+    requests that are still waiting. Batch requests also leave
+    QUOTA_INTERACTIVE_RESERVE tokens in the bucket for interactive requests
+    from other processes. Time spent queued is recorded as "quota_wait" spans
+    labelled with the api and priority.
+    """
+
+    def __init__(self, store: QuotaStore = None, limits: dict = None):
+        self.store = store or QuotaStore()
+        self.limits = limits or {"gemini": CONFIG["GEMINI_MAX_QPS"], "cloud_nlp": CONFIG["NLP_MAX_QPS"]}
+        self.total_wait = 0.0
+        self._lanes = {}
+        self._lock = threading.Lock()
+        self._tickets = itertools.count()
+
+    def _lane(self, api: str, key: str) -> tuple:
+        with self._lock:
+            if (api, key) not in self._lanes:
+                self._lanes[(api, key)] = (threading.Condition(), [])
+            return self._lanes[(api, key)]
+
+    def _burst(self, api: str) -> float:
+        return max(1 + CONFIG["QUOTA_INTERACTIVE_RESERVE"], self.limits[api] * CONFIG["QUOTA_BURST_SECONDS"])
+
+    def acquire(self, api: str, api_key: str = None, priority: int = None) -> float:
+        """
+        Blocks the calling thread until a request to `api` may be sent.
+
+        Args:
+            api (str): The remote API, a key of `limits`.
+            api_key (str): The API key the request is billed to.
+            priority (int): INTERACTIVE or BATCH. Defaults to the context's priority.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        priority = current_priority() if priority is None else priority
+        key = key_id(api_key)
+        reserve = CONFIG["QUOTA_INTERACTIVE_RESERVE"] if priority > INTERACTIVE else 0
+        condition, queue = self._lane(api, key)
+        ticket = (priority, next(self._tickets))
+        start = time.perf_counter()
+        with telemetry.span("quota_wait", api=api, priority=PRIORITY_NAMES.get(priority, str(priority))):
+            with condition:
+                heapq.heappush(queue, ticket)
+                # Wake the current head, which may have to give way to this ticket
+                condition.notify_all()
+                try:
+                    while True:
+                        if queue[0] == ticket:
+                            wait = self.store.take(api, key, self.limits[api], self._burst(api), reserve)
+                            if wait <= 0:
+                                break
+                            condition.wait(wait)
+                        else:
+                            condition.wait()
+                finally:
+                    queue.remove(ticket)
+                    heapq.heapify(queue)
+                    condition.notify_all()
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.total_wait += waited
+        return waited
+
+    def penalize(self, api: str, api_key: str = None):
+        """
+        Slows down every caller of an (api, key) after the API answered 429.
+        """
+        telemetry.count("quota_exhausted_total", api=api)
+        self.store.penalize(api, key_id(api_key), self._burst(api))
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_quota_scheduler() -> QuotaScheduler:
+    """
+    Returns the process-wide quota scheduler.
+
+    Returns:
+        QuotaScheduler: The shared scheduler instance.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = QuotaScheduler()
+        return _scheduler
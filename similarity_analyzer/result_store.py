@@ -0,0 +1,329 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import typer
+from similarity_analyzer.config import CONFIG
+from similarity_analyzer.embedding_cache import content_key
+from similarity_analyzer.quantization import QuantizedEmbeddings
+
+logger = logging.getLogger(__name__)
+
+app = typer.Typer(help="Queries the history of stored analysis results without re-running any analysis.")
+
+def section_rows(url: str, query: str, sections: list, scores, sentiments: list, entities: list,
+                 offset: int = 0) -> list:
+    """
+    Flattens the analysis of one page, or of a batch of its sections starting at `offset`, into one record per section.
+
+    Returns:
+        list: Dictionaries with the section text, similarity score, sentiment and entities.
+    """
+    rows = []
+    for i, section in enumerate(sections):
+        sentiment = sentiments[i] if sentiments else None
+        rows.append({
+            "url": url,
+            "query": query,
+            "section_index": offset + i,
+            "section": section,
+            "score": float(scores[i]),
+            "sentiment_score": sentiment.score if sentiment is not None else None,
+            "sentiment_magnitude": sentiment.magnitude if sentiment is not None else None,
+            "entities": [
+                {"name": entity.name, "type": getattr(entity.type_, "name", entity.type_), "salience": entity.salience}
+                for entity in (entities[i] if entities else [])
+            ],
+        })
+    return rows
+
+class ResultStore:
+    """
+    History of analysis runs, keyed by (url, query, model, timestamp).
+
+    Each run stores its score aggregates, and each of its sections the text,
+    content hash, score, sentiment and entities. Section embeddings, when
+    given, are written next to the database as one .npy file per run, in
+    CONFIG["EMBEDDING_STORAGE_DTYPE"] (see `QuantizedEmbeddings.save`), and
+    referenced from the run. The database is SQLite in WAL mode, so the
+    Streamlit app, batch runs and queries on one machine share it, and it is
+    indexed for per-page trends and per-query rankings across a site.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(CONFIG["RESULTS_DIR"], "results.sqlite")
+        self.embeddings_dir = os.path.join(os.path.dirname(os.path.abspath(self.path)), "embeddings")
+        self._local = threading.local()
+        os.makedirs(self.embeddings_dir, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                " id INTEGER PRIMARY KEY, url TEXT NOT NULL, query TEXT NOT NULL, model TEXT NOT NULL,"
+                " analyzed REAL NOT NULL, title TEXT, section_count INTEGER NOT NULL, average REAL,"
+                " min_score REAL, max_score REAL, embeddings TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS runs_by_page ON runs (url, query, model, analyzed)")
+            conn.execute("CREATE INDEX IF NOT EXISTS runs_by_query ON runs (query, model, url, analyzed)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sections ("
+                " run_id INTEGER NOT NULL, position INTEGER NOT NULL, hash TEXT NOT NULL, section TEXT NOT NULL,"
+                " score REAL NOT NULL, sentiment_score REAL, sentiment_magnitude REAL, entities TEXT,"
+                " PRIMARY KEY (run_id, position)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sections_by_score ON sections (run_id, score)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections may not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def record(self, url: str, query: str, model: str, rows, title: str = None, embeddings=None,
+               analyzed: float = None) -> int:
+        """
+        Stores one analysis run of a page.
+
+        Args:
+            url (str): The page URL.
+            query (str): The query the page was scored against.
+            model (str): The embedding model name.
+            rows: The page's section records in page order, see `section_rows`.
+                Any iterable works; rows are inserted as they are read.
+            title (str): The page title.
+            embeddings (numpy.ndarray): Optional embedding of each section.
+            analyzed (float): The time of the analysis. Defaults to now.
+
+        Returns:
+            int: The id of the new run, or None if it could not be stored.
+        """
+        analyzed = time.time() if analyzed is None else analyzed
+        stats = {"count": 0, "total": 0.0, "min": None, "max": None}
+
+        def section_values(run_id):
+            for position, row in enumerate(rows):
+                score = float(row["score"])
+                stats["count"] += 1
+                stats["total"] += score
+                stats["min"] = score if stats["min"] is None else min(stats["min"], score)
+                stats["max"] = score if stats["max"] is None else max(stats["max"], score)
+                yield (run_id, position, content_key(row["section"]), row["section"], score,
+                       row.get("sentiment_score"), row.get("sentiment_magnitude"), json.dumps(row.get("entities") or []))
+
+        try:
+            with self._connection() as conn:
+                run_id = conn.execute("INSERT INTO runs (url, query, model, analyzed, title, section_count)"
+                                      " VALUES (?, ?, ?, ?, ?, 0)", (url, query, model, analyzed, title)).lastrowid
+                conn.executemany("INSERT INTO sections (run_id, position, hash, section, score, sentiment_score,"
+                                 " sentiment_magnitude, entities) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", section_values(run_id))
+                embeddings_path = None
+                if embeddings is not None:
+                    embeddings_path = os.path.join(self.embeddings_dir, f"{run_id}.npy")
+                    QuantizedEmbeddings.quantize(embeddings, CONFIG["EMBEDDING_STORAGE_DTYPE"]).save(embeddings_path)
+                conn.execute("UPDATE runs SET section_count = ?, average = ?, min_score = ?, max_score = ?,"
+                             " embeddings = ? WHERE id = ?",
+                             (stats["count"], stats["total"] / stats["count"] if stats["count"] else None,
+                              stats["min"], stats["max"], embeddings_path, run_id))
+            return run_id
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Could not store the results for {url}: {e}")
+            return None
+
+    def runs(self, url: str = None, query: str = None, model: str = None, limit: int = 100) -> list:
+        """
+        Lists stored runs, newest first.
+
+        Args:
+            url (str): Only runs of this page.
+            query (str): Only runs for this query.
+            model (str): Only runs with this embedding model.
+            limit (int): The maximum number of runs to return.
+
+        Returns:
+            list: Dicts with id, url, query, model, analyzed, title,
+                  section_count, average, min_score, max_score and the
+                  embeddings path (or None).
+        """
+        conditions = [(column, value) for column, value in (("url", url), ("query", query), ("model", model))
+                      if value is not None]
+        where = " AND ".join(f"{column} = ?" for column, _ in conditions) or "1"
+        try:
+            rows = self._connection().execute(f"SELECT * FROM runs WHERE {where} ORDER BY analyzed DESC LIMIT ?",
+                                              [value for _, value in conditions] + [limit]).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Run lookup failed: {e}")
+            return []
+        return [dict(row) for row in rows]
+
+    def sections(self, run_id: int) -> list:
+        """
+        Returns the section records of a run in page order, in the format of `section_rows` plus the content hash.
+        """
+        try:
+            rows = self._connection().execute(
+                "SELECT r.url, r.query, s.position, s.section, s.hash, s.score, s.sentiment_score,"
+                " s.sentiment_magnitude, s.entities FROM sections s JOIN runs r ON r.id = s.run_id"
+                " WHERE s.run_id = ? ORDER BY s.position", (run_id,)).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Section lookup for run {run_id} failed: {e}")
+            return []
+        return [_section_record(row) for row in rows]
+
+    def embeddings(self, run_id: int) -> QuantizedEmbeddings:
+        """
+        Returns the stored (unit-length) section embeddings of a run, memory-mapped, or None if none were stored.
+        """
+        run = self.runs_by_id([run_id]).get(run_id)
+        if run is None or not run["embeddings"] or not os.path.exists(run["embeddings"]):
+            return None
+        return QuantizedEmbeddings.load(run["embeddings"])
+
+    def runs_by_id(self, run_ids: list) -> dict:
+        """Returns the runs with the given ids, keyed by id."""
+        try:
+            rows = self._connection().execute(f"SELECT * FROM runs WHERE id IN ({', '.join('?' * len(run_ids))})",
+                                              list(run_ids)).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Run lookup failed: {e}")
+            return {}
+        return {row["id"]: dict(row) for row in rows}
+
+    def score_trend(self, url: str, query: str = None, model: str = None) -> list:
+        """
+        Returns the average score of every run of a page, oldest first.
+
+        Runs that found no sections have no score and are left out.
+
+        Args:
+            url (str): The page URL.
+            query (str): Only runs for this query.
+            model (str): Only runs with this embedding model.
+
+        Returns:
+            list: Dicts with analyzed, query, model, average, min_score,
+                  max_score and section_count.
+        """
+        conditions = [("query", query), ("model", model)]
+        where = "".join(f" AND {column} = ?" for column, value in conditions if value is not None)
+        try:
+            rows = self._connection().execute(
+                "SELECT analyzed, query, model, average, min_score, max_score, section_count FROM runs"
+                f" WHERE url = ? AND section_count > 0{where} ORDER BY analyzed",
+                [url] + [value for _, value in conditions if value is not None]).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Score trend lookup for {url} failed: {e}")
+            return []
+        return [dict(row) for row in rows]
+
+    def worst_sections(self, query: str, model: str = None, url_prefix: str = None, limit: int = 20) -> list:
+        """
+        Finds the lowest-scoring sections for a query across all stored pages.
+
+        Only the latest run of each page (and model) counts, so sections that
+        have since been fixed are not reported.
+
+        Args:
+            query (str): The query the pages were scored against.
+            model (str): Only runs with this embedding model.
+            url_prefix (str): Only pages whose URL starts with this, e.g. a site or a directory.
+            limit (int): The number of sections to return.
+
+        Returns:
+            list: Section records (see `sections`) with the run's model and
+                  analyzed time, worst first.
+        """
+        conditions, values = "", [query]
+        if model is not None:
+            conditions += " AND model = ?"
+            values.append(model)
+        if url_prefix:
+            # Range on the index instead of LIKE, which would need escaping and could not use it
+            conditions += " AND url >= ? AND url < ?"
+            values += [url_prefix, url_prefix + "\U0010ffff"]
+        try:
+            # The `limit` worst sections score no higher than the limit-th lowest run minimum, so only sections up to
+            # that cutoff are read from the (run_id, score) index instead of every section of every page
+            rows = self._connection().execute(
+                "WITH latest AS (SELECT id, min_score FROM runs r WHERE query = ?" + conditions +
+                " AND analyzed = (SELECT MAX(analyzed) FROM runs WHERE url = r.url AND query = r.query AND model = r.model)),"
+                " cutoff AS (SELECT min_score FROM latest ORDER BY min_score LIMIT 1 OFFSET ?)"
+                " SELECT r.url, r.query, r.model, r.analyzed, s.position, s.section, s.hash, s.score, s.sentiment_score,"
+                " s.sentiment_magnitude, s.entities FROM latest JOIN runs r ON r.id = latest.id"
+                " JOIN sections s ON s.run_id = r.id AND s.score <= COALESCE((SELECT min_score FROM cutoff), 1e308)"
+                " ORDER BY s.score LIMIT ?", values + [limit - 1, limit]).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Worst section lookup for {query!r} failed: {e}")
+            return []
+        return [dict(_section_record(row), model=row["model"], analyzed=row["analyzed"]) for row in rows]
+
+def _section_record(row) -> dict:
+    return {
+        "url": row["url"],
+        "query": row["query"],
+        "section_index": row["position"],
+        "section": row["section"],
+        "hash": row["hash"],
+        "score": row["score"],
+        "sentiment_score": row["sentiment_score"],
+        "sentiment_magnitude": row["sentiment_magnitude"],
+        "entities": json.loads(row["entities"]) if row["entities"] else [],
+    }
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_result_store() -> ResultStore:
+    """
+    Returns the process-wide result store, or None if CONFIG["RESULT_STORE_ENABLED"] is off.
+
+    Returns:
+        ResultStore: The shared store instance.
+    """
+    global _store
+    if not CONFIG["RESULT_STORE_ENABLED"]:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = ResultStore()
+        return _store
+
+def _format_time(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp))
+
+@app.command()
+def trend(
+    url: str = typer.Argument(..., help="The page URL."),
+    query: str = typer.Option(None, help="Only runs for this query."),
+    model: str = typer.Option(None, help="Only runs with this embedding model."),
+):
+    """
+    Prints the average score of every stored run of a page, oldest first.
+    """
+    store = ResultStore()
+    for run in store.score_trend(url, query, model):
+        typer.echo(f"{_format_time(run['analyzed'])}  {run['average']:.2f} (min {run['min_score']:.2f}, "
+                   f"max {run['max_score']:.2f}, {run['section_count']} sections)  {run['query']} [{run['model']}]")
+
+@app.command()
+def worst(
+    query: str = typer.Argument(..., help="The query the pages were scored against."),
+    model: str = typer.Option(None, help="Only runs with this embedding model."),
+    site: str = typer.Option(None, help="Only pages whose URL starts with this prefix."),
+    limit: int = typer.Option(20, min=1, help="The number of sections to print."),
+):
+    """
+    Prints the lowest-scoring sections for a query across the latest runs of all stored pages.
+    """
+    store = ResultStore()
+    for row in store.worst_sections(query, model, site, limit):
+        text = row["section"] if len(row["section"]) <= 80 else row["section"][:77] + "..."
+        typer.echo(f"{row['score']:.2f}  {row['url']} #{row['section_index'] + 1}  {text}")
+
+if __name__ == "__main__":
+    app()
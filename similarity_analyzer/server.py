@@ -0,0 +1,472 @@
+import asyncio
+import base64
+import json
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+import numpy as np
+import typer
+from similarity_analyzer.config import CONFIG
+from similarity_analyzer.embedding_generator import EMBEDDING_MODELS, load_model, generate_embeddings
+from similarity_analyzer.pipeline import analyze_webpage, analyze_webpage_queries, analyze_site, search_site
+from similarity_analyzer.result_store import get_result_store, section_rows
+from similarity_analyzer.instrumentation import telemetry, start_from_config
+from similarity_analyzer.quota import PRIORITY_NAMES, current_priority, request_priority
+
+logger = logging.getLogger(__name__)
+
+app = typer.Typer(help="Local HTTP/JSON scoring service with a warm pool of embedding workers.")
+
+def _init_worker(model_names: list):
+    """Loads the served models once, when a worker process starts."""
+    logging.basicConfig(level=logging.INFO)
+    for model_name in model_names:
+        load_model(model_name)
+
+def _worker_ping() -> bool:
+    return True
+
+def _worker_embed(model_name: str, texts: list, priority: int):
+    """Embeds a merged batch in a worker process with its already loaded model, at the batch's highest priority."""
+    model = load_model(model_name)
+    if model is None:
+        return None
+    with request_priority(priority):
+        embeddings = generate_embeddings(model, texts)
+    return None if embeddings is None else np.asarray(embeddings, dtype=np.float32)
+
+class ServerMetrics:
+    """
+    Thread-safe counters and latency sums, rendered in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {
+            "requests_total": 0,
+            "request_errors_total": 0,
+            "requests_in_flight": 0,
+            "request_seconds_sum": 0.0,
+            "embedding_batches_total": 0,
+            "embedding_batch_requests_total": 0,
+            "embedding_texts_total": 0,
+            "embedding_seconds_sum": 0.0,
+        }
+
+    def add(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def render(self) -> str:
+        with self._lock:
+            counters = dict(self.counters)
+        lines = []
+        for name, value in counters.items():
+            kind = "gauge" if name.endswith("in_flight") else "counter"
+            lines.append(f"# TYPE similarity_analyzer_{name} {kind}")
+            lines.append(f"similarity_analyzer_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+class EmbeddingBatcher:
+    """
+    Merges embedding requests from concurrent callers into shared batches.
+
+    Callers block in `embed` while a dispatcher thread collects requests for up
+    to `max_wait` seconds or `max_texts` texts, sends each model's merged batch
+    to the worker pool, and hands every caller its own slice of the result.
+    """
+
+    def __init__(self, executor, max_texts: int, max_wait: float, metrics: ServerMetrics):
+        self.executor = executor
+        self.max_texts = max_texts
+        self.max_wait = max_wait
+        self.metrics = metrics
+        self._pending = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def embed(self, model_name: str, texts: list):
+        """
+        Embeds texts as part of the next shared batch.
+
+        Args:
+            model_name (str): The name of the embedding model to use.
+            texts (list): The texts to embed.
+
+        Returns:
+            numpy.ndarray: The embeddings, or None if embedding failed.
+        """
+        future = Future()
+        self._pending.put((model_name, list(texts), future, current_priority()))
+        return future.result()
+
+    def close(self):
+        self._pending.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            groups = {}
+            total = 0
+            deadline = time.monotonic() + self.max_wait
+            while item is not None:
+                groups.setdefault(item[0], []).append(item)
+                total += len(item[1])
+                remaining = deadline - time.monotonic()
+                if total >= self.max_texts or remaining <= 0:
+                    break
+                try:
+                    item = self._pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._pending.put(None)
+            for model_name, items in groups.items():
+                self._submit(model_name, items)
+
+    def _submit(self, model_name: str, items: list):
+        texts = [text for _, item_texts, _, _ in items for text in item_texts]
+        priority = min(item[3] for item in items)
+        start = time.perf_counter()
+        self.metrics.add("embedding_batches_total")
+        self.metrics.add("embedding_batch_requests_total", len(items))
+        self.metrics.add("embedding_texts_total", len(texts))
+
+        def deliver(batch_future):
+            self.metrics.add("embedding_seconds_sum", time.perf_counter() - start)
+            try:
+                embeddings = batch_future.result()
+            except Exception as e:
+                logger.error(f"Embedding batch of {len(texts)} texts failed: {type(e).__name__} - {e}")
+                embeddings = None
+            offset = 0
+            for _, item_texts, future, _ in items:
+                future.set_result(None if embeddings is None else embeddings[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+        self.executor.submit(_worker_embed, model_name, texts, priority).add_done_callback(deliver)
+
+def _matrix_to_json(matrix) -> list:
+    return None if matrix is None else np.asarray(matrix, dtype=np.float32).tolist()
+
+def encode_array(array) -> dict:
+    """
+    Encodes an embedding array as base64 float16 bytes plus its shape.
+
+    This is about a fifth of the size of a JSON list of floats, and float16 is
+    precise enough for scoring and suggestions.
+    """
+    if array is None:
+        return None
+    array = np.ascontiguousarray(array, dtype="<f2")
+    return {"dtype": "float16", "shape": list(array.shape), "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+def analysis_to_json(sections: list, scores, sentiments: list, entities: list, timings: dict, page: dict = None,
+                     include_embeddings: bool = False) -> dict:
+    """
+    Converts the result of analyze_webpage, and the `page` dict it filled, to a JSON-serializable dict.
+
+    The section, query and term embeddings are only included with
+    `include_embeddings`, encoded by `encode_array`.
+    """
+    page = page or {}
+    result = {
+        "sections": sections,
+        "scores": [float(score) for score in scores],
+        "sentiments": [
+            None if sentiment is None else {"score": sentiment.score, "magnitude": sentiment.magnitude}
+            for sentiment in sentiments
+        ],
+        "entities": [
+            [{"name": entity.name, "type": entity.type_.name, "salience": entity.salience} for entity in section_entities]
+            for section_entities in entities
+        ],
+        "timings": timings,
+        "title": page.get("title"),
+        "regions": page.get("regions"),
+        "terms": page.get("terms"),
+    }
+    if include_embeddings:
+        result.update({name: encode_array(page.get(name)) for name in ("embeddings", "query_embedding", "term_embeddings")})
+    return result
+
+class ScoringServer:
+    """
+    HTTP/JSON front end around the analysis pipeline with a warm pool of embedding workers.
+
+    Scraping, preprocessing, NLP calls and scoring run in the server process,
+    one thread per request, and share its embedding and NLP caches, vector
+    index and result store. Embedding runs in `workers` spawned processes that
+    each load the served models once at startup; concurrent requests are merged
+    into shared embedding batches. Every analysis is recorded in the server's
+    result store, which /history reads.
+
+    Endpoints:
+        POST /analyze          {"url", "query", "model", "priority", "include_embeddings"}
+        POST /analyze_queries  {"url", "queries", "model", "top_k", "priority"}
+        POST /analyze_site     {"query", "model", "seeds", "sitemap", "max_pages", "max_depth", "priority"};
+                               streams one JSON line per page as pages are analyzed
+        POST /search           {"query", "model", "k", "priority"}
+        POST /history          {"url", "query", "model", "limit"}
+        GET  /healthz          Worker pool readiness.
+        GET  /metrics          Prometheus text-format counters.
+    """
+
+    def __init__(self, host: str = None, port: int = None, workers: int = None, models: list = None,
+                 batch_max_texts: int = None, batch_wait: float = None, executor=None):
+        self.models = models or CONFIG["SERVER_MODELS"]
+        self.workers = workers or CONFIG["SERVER_WORKERS"]
+        self.metrics = ServerMetrics()
+        self.ready = threading.Event()
+        # TensorFlow and gRPC are not fork-safe, so workers start from a fresh interpreter
+        self.executor = executor or ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker, initargs=(self.models,))
+        self.batcher = EmbeddingBatcher(
+            self.executor,
+            batch_max_texts or CONFIG["SERVER_BATCH_MAX_TEXTS"],
+            CONFIG["SERVER_BATCH_WAIT_MS"] / 1000 if batch_wait is None else batch_wait,
+            self.metrics,
+        )
+        self.httpd = ThreadingHTTPServer((host or CONFIG["SERVER_HOST"], CONFIG["SERVER_PORT"] if port is None else port),
+                                         self._handler_class())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def warm_up(self):
+        """Starts every worker process and waits until each has loaded its models."""
+        start = time.perf_counter()
+        for future in [self.executor.submit(_worker_ping) for _ in range(self.workers)]:
+            future.result()
+        self.ready.set()
+        logger.info(f"{self.workers} embedding workers ready in {time.perf_counter() - start:.1f}s")
+
+    def _check(self, payload: dict, *required) -> tuple:
+        """Validates a request and returns its model name and priority."""
+        missing = [field for field in required if not payload.get(field)]
+        if missing:
+            raise ValueError(f"{', '.join(repr(field) for field in missing)} required")
+        model_name = payload.get("model") or self.models[0]
+        if model_name not in self.models:
+            raise ValueError(f"Model '{model_name}' is not served; choose one of {', '.join(self.models)}")
+        priority = payload.get("priority") or "interactive"
+        if priority not in PRIORITY_NAMES.values():
+            raise ValueError(f"Priority '{priority}' is unknown; choose one of {', '.join(PRIORITY_NAMES.values())}")
+        return model_name, priority
+
+    @staticmethod
+    def _record(url: str, query: str, model_name: str, sections: list, scores, sentiments: list = None,
+                entities: list = None, title: str = None, embeddings=None):
+        store = get_result_store()
+        if store is not None:
+            store.record(url, query, model_name, section_rows(url, query, sections, scores, sentiments, entities),
+                         title=title, embeddings=embeddings)
+
+    def analyze(self, payload: dict) -> dict:
+        """Runs analyze_webpage; the result includes the page data `suggestions.suggest_improvements` uses."""
+        model_name, priority = self._check(payload, "url", "query")
+        timings = {}
+        page = {}
+        with request_priority(priority):
+            sections, scores, sentiments, entities = asyncio.run(
+                analyze_webpage(payload["url"], payload["query"], model_name, timings, embed_fn=self.batcher.embed,
+                                page=page))
+        if sections is None:
+            return None
+        self._record(payload["url"], payload["query"], model_name, sections, scores, sentiments, entities,
+                     page.get("title"), page.get("embeddings"))
+        return analysis_to_json(sections, scores, sentiments, entities, timings, page,
+                                bool(payload.get("include_embeddings")))
+
+    def analyze_queries(self, payload: dict) -> dict:
+        """Runs analyze_webpage_queries."""
+        model_name, priority = self._check(payload, "url", "queries")
+        with request_priority(priority):
+            sections, score_matrix, summaries = asyncio.run(analyze_webpage_queries(
+                payload["url"], payload["queries"], model_name, int(payload.get("top_k") or 5),
+                embed_fn=self.batcher.embed))
+        if sections is None:
+            return None
+        for query, scores in zip(payload["queries"], score_matrix):
+            self._record(payload["url"], query, model_name, sections, scores)
+        return {
+            "sections": sections,
+            "scores": _matrix_to_json(score_matrix),
+            "summaries": [dict(summary, top_sections=[[int(index), float(score)] for index, score in summary["top_sections"]])
+                          for summary in summaries],
+        }
+
+    def analyze_site(self, payload: dict, send_page):
+        """Runs analyze_site and passes each page's result to `send_page` as it arrives."""
+        model_name, priority = self._check(payload, "query")
+        if not payload.get("seeds") and not payload.get("sitemap"):
+            raise ValueError("'seeds' or 'sitemap' required")
+        crawl_options = {option: int(payload[option]) for option in ("max_pages", "max_depth")
+                         if payload.get(option) is not None}
+
+        async def collect():
+            async for url, title, sections, scores in analyze_site(payload["query"], model_name, payload.get("seeds"),
+                                                                   payload.get("sitemap"), embed_fn=self.batcher.embed,
+                                                                   **crawl_options):
+                self._record(url, payload["query"], model_name, sections, scores, title=title)
+                send_page({"url": url, "title": title, "sections": sections,
+                           "scores": [float(score) for score in scores]})
+
+        with request_priority(priority):
+            asyncio.run(collect())
+
+    def search(self, payload: dict) -> dict:
+        """Runs search_site against the server's vector index."""
+        model_name, priority = self._check(payload, "query")
+        with request_priority(priority):
+            results = search_site(payload["query"], model_name, int(payload.get("k") or 10), embed_fn=self.batcher.embed)
+        return None if results is None else {"results": results}
+
+    def history(self, payload: dict) -> dict:
+        """Reads the score trend of a page and the worst sections for a query from the result store."""
+        model_name, _ = self._check(payload)
+        if not payload.get("url") and not payload.get("query"):
+            raise ValueError("'url' or 'query' required")
+        store = get_result_store()
+        if store is None:
+            raise ValueError("The result store is disabled on the server (RESULT_STORE_ENABLED=0)")
+        url, query = payload.get("url"), payload.get("query")
+        return {
+            "trend": store.score_trend(url, query, model_name) if url else [],
+            "worst": store.worst_sections(query, model_name, url_prefix=url, limit=int(payload.get("limit") or 20))
+                     if query else [],
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, status: int, body, content_type: str = "application/json"):
+                data = body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/healthz":
+                    status = "ok" if server.ready.is_set() else "starting"
+                    self._send(200 if status == "ok" else 503,
+                               {"status": status, "workers": server.workers, "models": server.models})
+                elif self.path == "/metrics":
+                    self._send(200, server.metrics.render() + telemetry.render_prometheus(), "text/plain; version=0.0.4")
+                else:
+                    self._send(404, {"error": "Not found"})
+
+            def _stream_site(self, payload: dict):
+                started = False
+
+                def send_page(result):
+                    nonlocal started
+                    if not started:
+                        # No Content-Length: the body is one JSON line per page and ends when the connection closes
+                        self.send_response(200)
+                        self.send_header("Content-Type", "application/x-ndjson")
+                        self.end_headers()
+                        started = True
+                    self.wfile.write(json.dumps(result).encode("utf-8") + b"\n")
+                    self.wfile.flush()
+
+                try:
+                    server.analyze_site(payload, send_page)
+                except Exception as e:
+                    if not started:
+                        raise
+                    # The status line is already sent; end the stream with an error line instead
+                    logger.error(f"Site analysis failed: {type(e).__name__} - {e}")
+                    server.metrics.add("request_errors_total")
+                    self.wfile.write(json.dumps({"error": f"{type(e).__name__}: {e}"}).encode("utf-8") + b"\n")
+                    return
+                if not started:
+                    self._send(502, {"error": "No pages could be analyzed"})
+
+            def do_POST(self):
+                routes = {"/analyze": server.analyze, "/analyze_queries": server.analyze_queries,
+                          "/search": server.search, "/history": server.history}
+                if self.path not in routes and self.path != "/analyze_site":
+                    self._send(404, {"error": "Not found"})
+                    return
+                start = time.perf_counter()
+                server.metrics.add("requests_total")
+                server.metrics.add("requests_in_flight")
+                try:
+                    payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                    if self.path == "/analyze_site":
+                        self._stream_site(payload)
+                        return
+                    result = routes[self.path](payload)
+                    if result is None:
+                        server.metrics.add("request_errors_total")
+                        self._send(502, {"error": "Failed to process the webpage"})
+                    else:
+                        self._send(200, result)
+                except (ValueError, AttributeError) as e:
+                    server.metrics.add("request_errors_total")
+                    self._send(400, {"error": str(e)})
+                except Exception as e:
+                    logger.error(f"Request failed: {type(e).__name__} - {e}")
+                    server.metrics.add("request_errors_total")
+                    self._send(500, {"error": f"{type(e).__name__}: {e}"})
+                finally:
+                    server.metrics.add("requests_in_flight", -1)
+                    server.metrics.add("request_seconds_sum", time.perf_counter() - start)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+    def serve_forever(self):
+        threading.Thread(target=self.warm_up, name="warm-up", daemon=True).start()
+        logger.info(f"Serving on {self.url}")
+        self.httpd.serve_forever()
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.batcher.close()
+        self.executor.shutdown(cancel_futures=True)
+
+@app.command()
+def serve(
+    host: str = typer.Option(None, help="Interface to bind. Defaults to SERVER_HOST."),
+    port: int = typer.Option(None, help="Port to listen on. Defaults to SERVER_PORT."),
+    workers: int = typer.Option(None, min=1, help="Embedding worker processes. Defaults to SERVER_WORKERS."),
+    model: List[str] = typer.Option(None, help="Model to preload and serve; repeat for several. Defaults to SERVER_MODELS."),
+):
+    """
+    Runs the scoring server until interrupted.
+    """
+    for model_name in model or []:
+        if model_name not in EMBEDDING_MODELS:
+            raise typer.BadParameter(f"Unknown model {model_name!r}; choose one of {', '.join(EMBEDDING_MODELS)}")
+    logging.basicConfig(level=logging.INFO)
+    start_from_config()
+    server = ScoringServer(host, port, workers, model or None)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    app()
@@ -1,20 +1,75 @@
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 import logging
+from similarity_analyzer.instrumentation import telemetry
+from similarity_analyzer.quantization import QuantizedEmbeddings, normalize_rows, row_norms
 
 logger = logging.getLogger(__name__)
 
-def calculate_similarity(query_embedding: np.ndarray, section_embeddings: np.ndarray) -> list:
+def calculate_similarity(query_embedding: np.ndarray, section_embeddings) -> list:
     """
     Calculates cosine similarity between query and section embeddings.
 
     Args:
         query_embedding (numpy.ndarray): The embedding of the query.
-        section_embeddings (numpy.ndarray): A 2D array of embeddings for each section.
+        section_embeddings (numpy.ndarray | QuantizedEmbeddings): A 2D array of
+            embeddings for each section, or the same embeddings quantized.
 
     Returns:
         list: A list of similarity scores (0-10 scale) for each section.
     """
-    logger.info("Calculating similarity scores")
-    similarities = cosine_similarity(query_embedding, section_embeddings)
-    return [score * 10 for score in similarities[0]]
+    logger.debug("Calculating similarity scores")
+    return calculate_similarity_matrix(np.atleast_2d(query_embedding)[:1], section_embeddings)[0].tolist()
+
+def calculate_similarity_matrix(query_embeddings: np.ndarray, section_embeddings) -> np.ndarray:
+    """
+    Calculates cosine similarity between every query and every section in one pass.
+
+    Queries are L2-normalized and multiplied with the sections, then each
+    column is divided by its section's norm, so the (much larger) section
+    matrix is never copied. Quantized sections are already normalized and are
+    scored block by block.
+
+    Args:
+        query_embeddings (numpy.ndarray): A 2D array of embeddings, one row per query.
+        section_embeddings (numpy.ndarray | QuantizedEmbeddings): A 2D array of
+            embeddings, one row per section, or the same embeddings quantized.
+
+    Returns:
+        numpy.ndarray: A (queries x sections) array of similarity scores (0-10 scale).
+    """
+    logger.debug("Calculating similarity score matrix")
+    with telemetry.span("score"):
+        if isinstance(section_embeddings, QuantizedEmbeddings):
+            return section_embeddings.dot(query_embeddings) * 10
+
+        sections = np.asarray(section_embeddings)
+        if sections.dtype not in (np.float32, np.float64):
+            sections = sections.astype(np.float32)
+        queries = normalize_rows(query_embeddings)
+        norms = row_norms(sections)
+        norms[norms == 0] = 1.0
+        scores = queries @ sections.T
+        scores *= 10 / norms
+        return scores
+
+def top_k_sections(score_matrix: np.ndarray, k: int) -> list:
+    """
+    Finds the highest-scoring sections for each query.
+
+    Args:
+        score_matrix (numpy.ndarray): A (queries x sections) array of scores.
+        k (int): The number of sections to return per query.
+
+    Returns:
+        list: For each query, a list of (section index, score) tuples sorted by
+              descending score.
+    """
+    k = min(k, score_matrix.shape[1])
+    if k <= 0:
+        return [[] for _ in range(score_matrix.shape[0])]
+    candidates = np.argpartition(-score_matrix, k - 1, axis=1)[:, :k]
+    top = []
+    for row, indices in zip(score_matrix, candidates):
+        indices = indices[np.argsort(-row[indices], kind="stable")]
+        top.append([(int(i), float(row[i])) for i in indices])
+    return top
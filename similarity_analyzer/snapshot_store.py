@@ -0,0 +1,174 @@
+import difflib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from similarity_analyzer.config import CONFIG
+from similarity_analyzer.embedding_cache import content_key
+
+logger = logging.getLogger(__name__)
+
+class SnapshotStore:
+    """
+    Last analysis of each (url, query, model), kept for incremental re-analysis.
+
+    A snapshot holds the page's HTTP validators (ETag and Last-Modified) and,
+    per section, its content hash, text, similarity score and serialized NLP
+    annotation. It is stored in an SQLite database in WAL mode, so Streamlit
+    sessions, batch runs and server threads on one machine share snapshots.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or os.path.join(CONFIG["SNAPSHOT_DIR"], "snapshots.sqlite")
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                " url TEXT NOT NULL, query TEXT NOT NULL, model TEXT NOT NULL,"
+                " etag TEXT, last_modified TEXT, analyzed REAL NOT NULL, PRIMARY KEY (url, query, model))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sections ("
+                " url TEXT NOT NULL, query TEXT NOT NULL, model TEXT NOT NULL, position INTEGER NOT NULL,"
+                " hash TEXT NOT NULL, section TEXT NOT NULL, score REAL NOT NULL, annotation BLOB,"
+                " PRIMARY KEY (url, query, model, position))"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections may not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, url: str, query: str, model: str) -> dict:
+        """
+        Returns the last snapshot of a page.
+
+        Args:
+            url (str): The page URL.
+            query (str): The query the page was scored against.
+            model (str): The embedding model name.
+
+        Returns:
+            dict: etag, last_modified, analyzed (a timestamp) and the parallel
+                  lists sections, hashes, scores and annotations, or None if
+                  the page has no snapshot.
+        """
+        try:
+            conn = self._connection()
+            page = conn.execute("SELECT etag, last_modified, analyzed FROM pages WHERE url = ? AND query = ? AND model = ?",
+                                (url, query, model)).fetchone()
+            if page is None:
+                return None
+            rows = conn.execute("SELECT hash, section, score, annotation FROM sections"
+                                " WHERE url = ? AND query = ? AND model = ? ORDER BY position",
+                                (url, query, model)).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Snapshot lookup for {url} failed: {e}")
+            return None
+        return {
+            "etag": page[0],
+            "last_modified": page[1],
+            "analyzed": page[2],
+            "hashes": [row[0] for row in rows],
+            "sections": [row[1] for row in rows],
+            "scores": [row[2] for row in rows],
+            "annotations": [row[3] for row in rows],
+        }
+
+    def save(self, url: str, query: str, model: str, sections: list, scores, annotations: list,
+             etag: str = None, last_modified: str = None):
+        """
+        Replaces the snapshot of a page.
+
+        Args:
+            url (str): The page URL.
+            query (str): The query the page was scored against.
+            model (str): The embedding model name.
+            sections (list): The page's sections, in page order.
+            scores: The similarity score of each section.
+            annotations (list): Serialized NLP annotation of each section, or None.
+            etag (str): The page's ETag, if the server sent one.
+            last_modified (str): The page's Last-Modified value, if the server sent one.
+        """
+        key = (url, query, model)
+        try:
+            with self._connection() as conn:
+                conn.execute("INSERT OR REPLACE INTO pages (url, query, model, etag, last_modified, analyzed)"
+                             " VALUES (?, ?, ?, ?, ?, ?)", (*key, etag, last_modified, time.time()))
+                conn.execute("DELETE FROM sections WHERE url = ? AND query = ? AND model = ?", key)
+                conn.executemany(
+                    "INSERT INTO sections (url, query, model, position, hash, section, score, annotation)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(*key, position, content_key(section), section, float(score), annotation)
+                     for position, (section, score, annotation) in enumerate(zip(sections, scores, annotations))],
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Snapshot write for {url} failed: {e}")
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_snapshot_store() -> SnapshotStore:
+    """
+    Returns the process-wide snapshot store.
+
+    Returns:
+        SnapshotStore: The shared store instance.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SnapshotStore()
+        return _store
+
+def diff_scores(old_sections: list, old_scores, new_sections: list, new_scores) -> list:
+    """
+    Compares two analyses of a page section by section.
+
+    Sections are aligned by content hash. Runs of sections replaced at the same
+    place in the page are paired up as modified; the rest are added or removed.
+
+    Args:
+        old_sections (list): Sections of the earlier analysis.
+        old_scores: Their similarity scores.
+        new_sections (list): Sections of the current analysis.
+        new_scores: Their similarity scores.
+
+    Returns:
+        list: One dict per section with status ("unchanged", "modified",
+              "added" or "removed"), old_index, new_index, section, old_score,
+              new_score and delta; indices and scores are None where a section
+              does not exist on that side.
+    """
+    def entry(status, old_index, new_index):
+        old_score = float(old_scores[old_index]) if old_index is not None else None
+        new_score = float(new_scores[new_index]) if new_index is not None else None
+        return {
+            "status": status,
+            "old_index": old_index,
+            "new_index": new_index,
+            "section": new_sections[new_index] if new_index is not None else old_sections[old_index],
+            "old_score": old_score,
+            "new_score": new_score,
+            "delta": new_score - old_score if old_score is not None and new_score is not None else None,
+        }
+
+    matcher = difflib.SequenceMatcher(None, [content_key(s) for s in old_sections],
+                                      [content_key(s) for s in new_sections], autojunk=False)
+    changes = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            changes.extend(entry("unchanged", i, j) for i, j in zip(range(i1, i2), range(j1, j2)))
+            continue
+        paired = min(i2 - i1, j2 - j1) if tag == "replace" else 0
+        changes.extend(entry("modified", i1 + k, j1 + k) for k in range(paired))
+        changes.extend(entry("removed", i, None) for i in range(i1 + paired, i2))
+        changes.extend(entry("added", None, j) for j in range(j1 + paired, j2))
+    return changes
@@ -0,0 +1,159 @@
+import collections
+import logging
+import re
+import numpy as np
+from similarity_analyzer.config import CONFIG
+from similarity_analyzer.quantization import normalize_rows
+from similarity_analyzer.text_preprocessor import load_bundled_stopwords
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Low-scoring sections compared against all high-scoring sections at once, bounding the similarity block
+BLOCK_ROWS = 1024
+
+def query_terms(query: str) -> list:
+    """
+    Returns the distinct lowercase keywords of a query, in query order.
+
+    Stopwords are left out unless the query consists of nothing else.
+
+    Args:
+        query (str): The query.
+
+    Returns:
+        list: The query terms.
+    """
+    tokens = list(dict.fromkeys(WORD_PATTERN.findall(query.lower())))
+    stop_words = load_bundled_stopwords()
+    return [token for token in tokens if token not in stop_words] or tokens
+
+class SectionTokenIndex:
+    """
+    Lowercase token sets of a page's sections, stored as an inverted index.
+
+    Every section is lowercased and tokenized once when the index is built.
+    Looking up which sections contain a set of terms then costs one scatter per
+    term, however many sections the page has.
+    """
+
+    def __init__(self, sections: list):
+        self.count = len(sections)
+        self.postings = collections.defaultdict(list)
+        for index, section in enumerate(sections):
+            for token in set(WORD_PATTERN.findall(section.lower())):
+                self.postings[token].append(index)
+
+    def presence(self, terms: list) -> np.ndarray:
+        """
+        Returns a (sections x terms) boolean matrix of which sections contain which terms.
+        """
+        matrix = np.zeros((self.count, len(terms)), dtype=bool)
+        for column, term in enumerate(terms):
+            rows = self.postings.get(term)
+            if rows:
+                matrix[rows, column] = True
+        return matrix
+
+def suggest_improvements(sections: list, scores, query: str, index: SectionTokenIndex = None,
+                         section_embeddings=None, query_embedding=None, terms: list = None, term_embeddings=None,
+                         threshold: float = None, max_terms: int = 5) -> list:
+    """
+    Suggests improvements for every section scoring below the threshold.
+
+    All low-scoring sections are handled at once with matrix operations:
+
+    - Missing query terms are looked up in the section token index, and
+      ranked by how much each term contributes to the query embedding and how
+      little the section's embedding already covers it.
+    - Each section is paired with its nearest high-scoring section by
+      embedding similarity, as a model to follow.
+
+    Without embeddings, for example when the analysis ran on a scoring server,
+    missing terms are listed in query order and no nearest section is given.
+
+    Args:
+        sections (list): The page's sections.
+        scores: The similarity score of each section.
+        query (str): The query the sections were scored against.
+        index (SectionTokenIndex): Token index of the sections; built if not given.
+        section_embeddings (numpy.ndarray): Optional embedding of each section.
+        query_embedding (numpy.ndarray): Optional query embedding.
+        terms (list): The query terms; defaults to `query_terms(query)`.
+        term_embeddings (numpy.ndarray): Optional embedding of each term.
+        threshold (float): Sections below this score get suggestions.
+            Defaults to CONFIG["SUGGESTION_SCORE_THRESHOLD"].
+        max_terms (int): Missing terms reported per section.
+
+    Returns:
+        list: One dict per low-scoring section, in page order, with the section
+              index, score, missing_terms (most important first), and the
+              nearest high-scoring section index and its score (or None).
+    """
+    threshold = CONFIG["SUGGESTION_SCORE_THRESHOLD"] if threshold is None else threshold
+    scores = np.asarray(scores, dtype=float)
+    low = np.flatnonzero(scores < threshold)
+    if not low.size:
+        return []
+    terms = query_terms(query) if terms is None else terms
+    index = index or SectionTokenIndex(sections)
+    missing = ~index.presence(terms)[low]
+
+    use_embeddings = section_embeddings is not None and query_embedding is not None
+    if use_embeddings and term_embeddings is not None and len(terms):
+        term_vectors = normalize_rows(term_embeddings)
+        section_vectors = normalize_rows(np.asarray(section_embeddings)[low])
+        contribution = np.clip(term_vectors @ normalize_rows(np.atleast_2d(query_embedding))[0], 0, None)
+        coverage = np.clip(section_vectors @ term_vectors.T, 0, None)
+        priority = contribution[np.newaxis, :] * (1 - coverage)
+    else:
+        priority = np.broadcast_to(-np.arange(len(terms), dtype=float), missing.shape)
+    priority = np.where(missing, priority, -np.inf)
+    order = np.argsort(-priority, axis=1, kind="stable")[:, :max_terms]
+
+    nearest = np.full(len(low), -1)
+    high = np.flatnonzero(scores >= threshold)
+    if use_embeddings and high.size:
+        vectors = normalize_rows(section_embeddings)
+        high_vectors = vectors[high]
+        for start in range(0, len(low), BLOCK_ROWS):
+            block = vectors[low[start:start + BLOCK_ROWS]]
+            nearest[start:start + BLOCK_ROWS] = high[np.argmax(block @ high_vectors.T, axis=1)]
+
+    suggestions = []
+    for row, section_index in enumerate(low):
+        suggestions.append({
+            "section": int(section_index),
+            "score": float(scores[section_index]),
+            "missing_terms": [terms[column] for column in order[row] if missing[row, column]],
+            "nearest": int(nearest[row]) if nearest[row] >= 0 else None,
+            "nearest_score": float(scores[nearest[row]]) if nearest[row] >= 0 else None,
+        })
+    logger.debug(f"Generated suggestions for {len(suggestions)} of {len(scores)} sections")
+    return suggestions
+
+def format_suggestions(suggestions: list, query: str) -> list:
+    """
+    Renders suggestions from `suggest_improvements` as three text lines per section.
+
+    Args:
+        suggestions (list): The suggestions.
+        query (str): The query the sections were scored against.
+
+    Returns:
+        list: The suggestion lines.
+    """
+    lines = []
+    for suggestion in suggestions:
+        lines.append(f"Section {suggestion['section']+1} (Score: {suggestion['score']:.2f}):")
+        if suggestion["missing_terms"]:
+            lines.append(f"  - Consider adding these keywords: {', '.join(suggestion['missing_terms'])}")
+        else:
+            lines.append("  - All query keywords are present; make them more central to the section")
+        if suggestion["nearest"] is not None:
+            lines.append(f"  - Expand on topics covered by Section {suggestion['nearest']+1} "
+                         f"(Score: {suggestion['nearest_score']:.2f})")
+        else:
+            lines.append(f"  - Expand on topics related to: {query}")
+    return lines
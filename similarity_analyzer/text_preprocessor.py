@@ -1,13 +1,75 @@
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import PorterStemmer
+import functools
 import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from similarity_analyzer.config import CONFIG
+from similarity_analyzer.instrumentation import telemetry
 
 logger = logging.getLogger(__name__)
 
-nltk.download('punkt', quiet=True)
-nltk.download('stopwords', quiet=True)
+BUNDLED_STOPWORDS_PATH = os.path.join(os.path.dirname(__file__), 'data', 'english_stopwords.txt')
+
+# Below this many texts a process pool costs more to start than it saves
+PROCESS_POOL_MIN_TEXTS = 500
+
+_resources_lock = threading.Lock()
+
+def _load_nltk_resource(resource: str, package: str, loader, offline: bool):
+    """Loads an NLTK resource, downloading it first when allowed and missing."""
+    import nltk
+
+    try:
+        nltk.data.find(resource)
+    except LookupError:
+        if offline or not nltk.download(package, quiet=True):
+            return None
+    try:
+        return loader()
+    except LookupError:
+        return None
+
+@functools.lru_cache(maxsize=None)
+def load_bundled_stopwords() -> frozenset:
+    """Returns the English stopword list bundled with the package, without importing NLTK."""
+    with open(BUNDLED_STOPWORDS_PATH) as f:
+        return frozenset(line.strip() for line in f if line.strip())
+
+@functools.lru_cache(maxsize=None)
+def _load_resources(offline: bool):
+    """
+    Loads the stopword set, tokenizers and stemmer once per process.
+
+    NLTK itself is only imported here, on first use, because importing it takes
+    seconds. NLTK data is used when installed and downloaded on first use
+    otherwise. In offline mode, or when the download fails, the stopword list
+    bundled with the package and an untrained Punkt sentence tokenizer are used
+    instead.
+    """
+    from nltk.corpus import stopwords
+    from nltk.stem import PorterStemmer
+    from nltk.tokenize import NLTKWordTokenizer, PunktTokenizer
+    from nltk.tokenize.punkt import PunktSentenceTokenizer
+
+    stop_words = _load_nltk_resource('corpora/stopwords', 'stopwords',
+                                     lambda: frozenset(stopwords.words('english')), offline)
+    if stop_words is None:
+        logger.warning("NLTK stopwords unavailable, using the bundled English stopword list")
+        stop_words = load_bundled_stopwords()
+
+    sentence_tokenizer = _load_nltk_resource('tokenizers/punkt_tab/english/', 'punkt_tab',
+                                             lambda: PunktTokenizer('english'), offline)
+    if sentence_tokenizer is None:
+        logger.warning("NLTK punkt_tab model unavailable, using an untrained Punkt sentence tokenizer")
+        sentence_tokenizer = PunktSentenceTokenizer()
+
+    # Stems are memoized because section vocabularies overlap heavily
+    stem = functools.lru_cache(maxsize=CONFIG["STEM_CACHE_SIZE"])(PorterStemmer().stem)
+    return stop_words, sentence_tokenizer, NLTKWordTokenizer(), stem
+
+def _get_resources():
+    with _resources_lock:
+        return _load_resources(CONFIG["NLTK_OFFLINE"])
 
 def preprocess_text(text: str) -> str:
     """
@@ -25,16 +87,62 @@ def preprocess_text(text: str) -> str:
     Returns:
         str: The preprocessed text as a string of stemmed tokens.
     """
-    logger.info("Preprocessing text")
-    # Tokenization
-    tokens = word_tokenize(text.lower())
+    logger.debug("Preprocessing text")
+    stop_words, sentence_tokenizer, word_tokenizer, stem = _get_resources()
+
+    # Tokenization (sentence split first, as nltk.word_tokenize does)
+    tokens = [token for sentence in sentence_tokenizer.tokenize(text.lower())
+              for token in word_tokenizer.tokenize(sentence)]
+
+    # Remove stopwords and punctuation, then apply stemming
+    return ' '.join(stem(token) for token in tokens if token.isalnum() and token not in stop_words)
+
+def split_sentences(text: str) -> list:
+    """
+    Splits text into sentences with the sentence tokenizer used for preprocessing.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        list: The sentences, with their original case and punctuation.
+    """
+    _, sentence_tokenizer, _, _ = _get_resources()
+    return sentence_tokenizer.tokenize(text)
+
+def uses_process_pool(count: int, processes: int = None) -> bool:
+    """
+    Returns whether `preprocess_texts` spreads `count` texts over a process pool.
 
-    # Remove stopwords and punctuation
-    stop_words = set(stopwords.words('english'))
-    tokens = [token for token in tokens if token.isalnum() and token not in stop_words]
+    Args:
+        count (int): The number of texts.
+        processes (int): Number of worker processes. Defaults to CONFIG["PREPROCESS_PROCESSES"].
+    """
+    processes = CONFIG["PREPROCESS_PROCESSES"] if processes is None else processes
+    return processes > 1 and count >= PROCESS_POOL_MIN_TEXTS
+
+def preprocess_texts(texts: list, processes: int = None) -> list:
+    """
+    Preprocesses a batch of texts.
 
-    # Stemming
-    stemmer = PorterStemmer()
-    stemmed_tokens = [stemmer.stem(token) for token in tokens]
+    Resources are loaded once and token stems are memoized across texts.
+    Batches of at least PROCESS_POOL_MIN_TEXTS texts are spread over a process
+    pool when `processes` is greater than one (see `uses_process_pool`).
 
-    return ' '.join(stemmed_tokens)
+    Args:
+        texts (list): The texts to preprocess.
+        processes (int): Number of worker processes. Defaults to CONFIG["PREPROCESS_PROCESSES"];
+                         0 or 1 preprocesses in the current process.
+
+    Returns:
+        list: The preprocessed texts, in the same order as `texts`.
+    """
+    processes = CONFIG["PREPROCESS_PROCESSES"] if processes is None else processes
+    logger.debug(f"Preprocessing {len(texts)} texts")
+    telemetry.count("preprocessed_texts_total", len(texts))
+    with telemetry.span("preprocess_batch"):
+        if uses_process_pool(len(texts), processes):
+            chunksize = max(1, len(texts) // (processes * 4))
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                return list(executor.map(preprocess_text, texts, chunksize=chunksize))
+        return [preprocess_text(text) for text in texts]
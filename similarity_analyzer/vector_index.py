@@ -0,0 +1,433 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import numpy as np
+from similarity_analyzer.config import CONFIG
+from similarity_analyzer.quantization import DTYPES, QuantizedEmbeddings, quantize_rows
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per matrix multiply during exact search
+BLOCK_ROWS = 65536
+# Rows are allocated in chunks so the backing file does not grow on every page
+_GROWTH_CHUNK = 4096
+# K-means training uses at most this many sampled vectors per inverted list
+_TRAIN_SAMPLES_PER_LIST = 256
+# Vector file suffix per storage type
+_SUFFIXES = {"float32": "f32", "float16": "f16", "int8": "i8"}
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    """Returns a float32 copy of `matrix` with unit-length rows."""
+    matrix = np.array(matrix, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def _top_k(scores: np.ndarray, rows: np.ndarray, k: int):
+    """Returns the k best (scores, rows) pairs, sorted by descending score."""
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        scores, rows = scores[keep], rows[keep]
+    order = np.argsort(-scores, kind="stable")
+    return scores[order], rows[order]
+
+def _kmeans(vectors: np.ndarray, n_clusters: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit vectors; returns unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        empty = ~sums.any(axis=1)
+        # Re-seed empty clusters with random vectors so every list stays in use
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+class VectorIndex:
+    """
+    Persistent section-embedding index for searching across crawled pages.
+
+    Embeddings are stored pre-normalized in a memory-mapped matrix, so cosine
+    similarity is a plain dot product. The matrix holds float32, float16 or
+    int8 rows (with a float32 scale per int8 row), quantized with
+    `quantization.quantize_rows`; the type is fixed when the index is created.
+    Exact search scores the matrix in blocks of BLOCK_ROWS rows. Once `train` has built an inverted-file (IVF)
+    partition, searches only score the `nprobe` lists whose centroids are closest
+    to the query. Section metadata lives in SQLite, and re-adding a page replaces
+    its previous sections. Pages are indexed as the chunks their sections were
+    embedded as, each labelled with the section it starts at.
+    """
+
+    def __init__(self, directory: str, nprobe: int = None, dtype: str = None):
+        self.directory = directory
+        self.nprobe = nprobe or CONFIG["VECTOR_INDEX_NPROBE"]
+        self.dtype = dtype or CONFIG["EMBEDDING_STORAGE_DTYPE"]
+        if self.dtype not in DTYPES:
+            raise ValueError(f"Unsupported embedding type {self.dtype!r}; choose one of {', '.join(DTYPES)}")
+        self.state_path = os.path.join(directory, "index.json")
+        self.dim = None
+        self.count = 0
+        self.capacity = 0
+        self.vectors = None
+        self.scales = None
+        self.alive = np.zeros(0, dtype=bool)
+        self.lists = np.zeros(0, dtype=np.int32)
+        self.centroids = None
+        self.trained_size = 0
+        self._inverted = None
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, "sections.sqlite"), check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS sections "
+                        "(row INTEGER PRIMARY KEY, url TEXT NOT NULL, section_index INTEGER, text TEXT)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS sections_url ON sections (url)")
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.state_path):
+            return
+        with open(self.state_path) as f:
+            state = json.load(f)
+        self.dim, self.count, self.capacity = state["dim"], state["count"], state["capacity"]
+        self.trained_size = state.get("trained_size", 0)
+        self.dtype = state["dtype"]
+        self._map_vectors(self.capacity)
+        padding = self.capacity - self.count
+        self.alive = np.concatenate((np.load(os.path.join(self.directory, "alive.npy")), np.zeros(padding, dtype=bool)))
+        self.lists = np.concatenate((np.load(os.path.join(self.directory, "lists.npy")),
+                                     np.full(padding, -1, dtype=np.int32)))
+        centroids_path = os.path.join(self.directory, "centroids.npy")
+        if os.path.exists(centroids_path):
+            self.centroids = np.load(centroids_path)
+
+    def save(self):
+        """
+        Flushes vectors, state and metadata to disk.
+
+        The index is compacted first when more than half of its rows belong to
+        deleted or replaced pages.
+        """
+        with self._lock:
+            if self.vectors is None:
+                return
+            if self.count > _GROWTH_CHUNK and len(self) * 2 < self.count:
+                self.compact()
+            self.vectors.flush()
+            if self.scales is not None:
+                self.scales.flush()
+            np.save(os.path.join(self.directory, "alive.npy"), self.alive[:self.count])
+            np.save(os.path.join(self.directory, "lists.npy"), self.lists[:self.count])
+            if self.centroids is not None:
+                np.save(os.path.join(self.directory, "centroids.npy"), self.centroids)
+            tmp_path = self.state_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"dim": self.dim, "count": self.count, "capacity": self.capacity,
+                           "trained_size": self.trained_size, "dtype": self.dtype}, f)
+            os.replace(tmp_path, self.state_path)
+            self.db.commit()
+
+    @property
+    def vectors_path(self) -> str:
+        return os.path.join(self.directory, f"vectors.{_SUFFIXES[self.dtype]}")
+
+    @property
+    def scales_path(self) -> str:
+        return os.path.join(self.directory, "scales.f32")
+
+    def _map_vectors(self, capacity: int):
+        self.vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode="r+", shape=(capacity, self.dim))
+        if self.dtype == "int8":
+            self.scales = np.memmap(self.scales_path, dtype=np.float32, mode="r+", shape=(capacity,))
+
+    def _stored(self, rows) -> QuantizedEmbeddings:
+        """Returns the rows selected by a slice (a view) or an index array (a copy) as QuantizedEmbeddings."""
+        return QuantizedEmbeddings(self.vectors[rows], self.scales[rows] if self.scales is not None else None)
+
+    def _reserve(self, rows: int):
+        if self.count + rows <= self.capacity:
+            return
+        new_capacity = max(self.capacity * 2, self.count + rows, _GROWTH_CHUNK)
+        if self.vectors is not None:
+            self.vectors.flush()
+            del self.vectors
+        if self.scales is not None:
+            self.scales.flush()
+            self.scales = None
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dim * np.dtype(self.dtype).itemsize)
+        if self.dtype == "int8":
+            with open(self.scales_path, "ab") as f:
+                f.truncate(new_capacity * 4)
+        self._map_vectors(new_capacity)
+        self.alive = np.concatenate((self.alive[:self.count], np.zeros(new_capacity - self.count, dtype=bool)))
+        self.lists = np.concatenate((self.lists[:self.count], np.full(new_capacity - self.count, -1, dtype=np.int32)))
+        self.capacity = new_capacity
+
+    def add_page(self, url: str, sections: list, embeddings: np.ndarray, section_indices: list = None):
+        """
+        Adds a page's section embeddings, replacing any earlier version of the page.
+
+        Args:
+            url (str): The page URL.
+            sections (list): The page's text sections, or the chunks they were embedded as.
+            embeddings (numpy.ndarray): One embedding per section or chunk.
+            section_indices (list): The index of the (first) section of each
+                chunk. Chunks of one split section share it, and search returns
+                only their best match. Defaults to the position of each text.
+        """
+        embeddings = _normalize(embeddings)
+        with self._lock:
+            self.delete_page(url)
+            if not len(sections):
+                return
+            if self.dim is None:
+                self.dim = embeddings.shape[1]
+            elif embeddings.shape[1] != self.dim:
+                raise ValueError(f"Embedding dimension {embeddings.shape[1]} does not match index dimension {self.dim}")
+            self._reserve(len(sections))
+            rows = np.arange(self.count, self.count + len(sections))
+            values, scales = quantize_rows(embeddings, self.dtype)
+            self.vectors[rows] = values
+            if scales is not None:
+                self.scales[rows] = scales
+            self.alive[rows] = True
+            if self.centroids is not None:
+                self.lists[rows] = np.argmax(embeddings @ self.centroids.T, axis=1)
+                self._inverted = None
+            self.db.executemany("INSERT INTO sections (row, url, section_index, text) VALUES (?, ?, ?, ?)",
+                                [(int(row), url, int(i), text) for i, row, text in
+                                 zip(section_indices or range(len(sections)), rows, sections)])
+            self.count += len(sections)
+
+    def delete_page(self, url: str) -> int:
+        """
+        Removes all sections of a page from search results.
+
+        Args:
+            url (str): The page URL.
+
+        Returns:
+            int: The number of sections removed.
+        """
+        with self._lock:
+            rows = [row for (row,) in self.db.execute("SELECT row FROM sections WHERE url = ?", (url,))]
+            if rows:
+                self.alive[rows] = False
+                self.db.execute("DELETE FROM sections WHERE url = ?", (url,))
+                self._inverted = None
+            return len(rows)
+
+    def compact(self):
+        """
+        Drops the rows of deleted sections and renumbers the remaining ones.
+        """
+        with self._lock:
+            live_rows = np.flatnonzero(self.alive[:self.count])
+            for start in range(0, len(live_rows), BLOCK_ROWS):
+                block_rows = live_rows[start:start + BLOCK_ROWS]
+                # Rows only move towards the front, so earlier blocks are never overwritten before they are read
+                self.vectors[start:start + len(block_rows)] = self.vectors[block_rows]
+                if self.scales is not None:
+                    self.scales[start:start + len(block_rows)] = self.scales[block_rows]
+            self.lists[:len(live_rows)] = self.lists[live_rows]
+            self.alive[:] = False
+            self.alive[:len(live_rows)] = True
+            self.lists[len(live_rows):] = -1
+            self.db.execute("UPDATE sections SET row = -row - 1")
+            self.db.executemany("UPDATE sections SET row = ? WHERE row = ?",
+                                [(new, -int(old) - 1) for new, old in enumerate(live_rows)])
+            logger.info(f"Compacted vector index from {self.count} to {len(live_rows)} rows")
+            self.count = len(live_rows)
+            self._inverted = None
+
+    def __len__(self) -> int:
+        return int(self.alive[:self.count].sum())
+
+    def train(self, n_lists: int = None, iterations: int = 10):
+        """
+        Builds the IVF partition by clustering the indexed embeddings.
+
+        Args:
+            n_lists (int): Number of inverted lists. Defaults to about sqrt(n) lists.
+            iterations (int): K-means iterations.
+        """
+        with self._lock:
+            live_rows = np.flatnonzero(self.alive[:self.count])
+            n_lists = n_lists or max(1, int(np.sqrt(len(live_rows))))
+            if len(live_rows) < n_lists:
+                raise ValueError(f"Cannot train {n_lists} lists on {len(live_rows)} vectors")
+            rng = np.random.default_rng(0)
+            sample_size = min(len(live_rows), n_lists * _TRAIN_SAMPLES_PER_LIST)
+            sample = np.sort(rng.choice(live_rows, sample_size, replace=False))
+            self.centroids = _kmeans(self._stored(sample).dequantize(), n_lists, iterations)
+            for start in range(0, self.count, BLOCK_ROWS):
+                block = self._stored(slice(start, min(start + BLOCK_ROWS, self.count))).dequantize()
+                self.lists[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+            self._inverted = None
+            self.trained_size = len(live_rows)
+            logger.info(f"Trained IVF index with {n_lists} lists on {sample_size} vectors")
+
+    def maybe_train(self) -> bool:
+        """
+        Trains the IVF partition once the index reaches CONFIG["VECTOR_INDEX_IVF_MIN_SIZE"]
+        sections, and retrains it whenever the index has grown fourfold since.
+
+        Returns:
+            bool: True if the partition was (re)trained.
+        """
+        with self._lock:
+            size = len(self)
+            if size < CONFIG["VECTOR_INDEX_IVF_MIN_SIZE"] or (self.centroids is not None and size < 4 * self.trained_size):
+                return False
+            self.train()
+            return True
+
+    def _inverted_lists(self) -> list:
+        if self._inverted is None:
+            live_rows = np.flatnonzero(self.alive[:self.count])
+            order = np.argsort(self.lists[live_rows], kind="stable")
+            sorted_rows = live_rows[order]
+            bounds = np.searchsorted(self.lists[sorted_rows], np.arange(len(self.centroids) + 1))
+            self._inverted = [sorted_rows[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+        return self._inverted
+
+    def search(self, query_embedding: np.ndarray, k: int = 10, exact: bool = False, nprobe: int = None) -> list:
+        """
+        Finds the sections most similar to a query across all indexed pages.
+
+        A section indexed as several chunks scores as its best chunk, as in
+        `chunker.rollup_scores`, and is returned once with that chunk's text.
+
+        Args:
+            query_embedding (numpy.ndarray): The query embedding (1D or a single-row 2D array).
+            k (int): Number of results.
+            exact (bool): Score every section even if an IVF partition exists.
+            nprobe (int): IVF lists to search. Defaults to the index's `nprobe`.
+
+        Returns:
+            list: Up to k dicts with url, section_index, section and score (0-10
+                  scale), sorted by descending score.
+        """
+        query = _normalize(query_embedding)[0]
+        results = {}
+        wanted = k
+        while k > 0:
+            scores, rows, metadata = self._search_rows(query, wanted, exact, nprobe)
+            results = {}
+            for score, row in zip(scores, rows.tolist()):
+                if row in metadata:
+                    results.setdefault(metadata[row][:2], (score, metadata[row][2]))
+            # Chunks of one section took several of the places; look further
+            if len(results) >= k or len(rows) < wanted:
+                break
+            wanted *= 2
+        return [
+            {"url": url, "section_index": section_index, "section": text, "score": float(score) * 10}
+            for (url, section_index), (score, text) in list(results.items())[:k]
+        ]
+
+    def _search_rows(self, query: np.ndarray, k: int, exact: bool, nprobe: int) -> tuple:
+        """Returns the k best-scoring rows for a unit-length query, their scores and their metadata."""
+        with self._lock:
+            if self.vectors is None:
+                return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64), {}
+            best_scores = np.empty(0, dtype=np.float32)
+            best_rows = np.empty(0, dtype=np.int64)
+            if self.centroids is not None and not exact:
+                probes = np.argsort(-(self.centroids @ query))[:nprobe or self.nprobe]
+                inverted = self._inverted_lists()
+                rows = np.concatenate([inverted[i] for i in probes])
+                for start in range(0, len(rows), BLOCK_ROWS):
+                    block_rows = rows[start:start + BLOCK_ROWS]
+                    scores = self._stored(block_rows).dot(query)[0]
+                    best_scores, best_rows = _top_k(np.concatenate((best_scores, scores)),
+                                                    np.concatenate((best_rows, block_rows)), k)
+            else:
+                for start in range(0, self.count, BLOCK_ROWS):
+                    end = min(start + BLOCK_ROWS, self.count)
+                    alive = self.alive[start:end]
+                    scores = self._stored(slice(start, end)).dot(query)[0]
+                    block_rows = np.arange(start, end)[alive]
+                    best_scores, best_rows = _top_k(np.concatenate((best_scores, scores[alive])),
+                                                    np.concatenate((best_rows, block_rows)), k)
+
+            return best_scores, best_rows, self.metadata(best_rows)
+
+    def metadata(self, rows) -> dict:
+        """
+        Looks up the page URL, section index and text of index rows.
+
+        Args:
+            rows: Row numbers, e.g. from a search.
+
+        Returns:
+            dict: Maps each live row to a (url, section_index, text) tuple.
+        """
+        rows = [int(row) for row in rows]
+        metadata = {}
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(rows), 900):
+                batch = rows[start:start + 900]
+                placeholders = ",".join("?" * len(batch))
+                metadata.update((row, (url, index, text)) for row, url, index, text in self.db.execute(
+                    f"SELECT row, url, section_index, text FROM sections WHERE row IN ({placeholders})", batch))
+        return metadata
+
+    def live_vectors(self) -> QuantizedEmbeddings:
+        """
+        Returns the memory-mapped embedding matrix, without rows of deleted pages.
+
+        The index is compacted first if it has deleted rows, so row numbers of
+        the returned matrix are index rows and it can be read in contiguous
+        slices without copying.
+
+        Returns:
+            QuantizedEmbeddings: The (rows x dim) matrix of unit-length embeddings.
+        """
+        with self._lock:
+            if self.vectors is None:
+                return QuantizedEmbeddings(np.zeros((0, 0), dtype=np.float32))
+            if len(self) < self.count:
+                self.compact()
+                self.save()
+            return self._stored(slice(0, self.count))
+
+    def row_pages(self) -> tuple:
+        """
+        Maps every row of the index to its page.
+
+        Returns:
+            tuple: The page URLs, and an array with the position in that list of
+                   each row's page, or -1 for rows of deleted pages.
+        """
+        with self._lock:
+            pages = np.full(self.count, -1, dtype=np.int64)
+            urls = {}
+            for row, url in self.db.execute("SELECT row, url FROM sections"):
+                pages[row] = urls.setdefault(url, len(urls))
+        return list(urls), pages
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_vector_index(model_name: str) -> VectorIndex:
+    """
+    Returns the shared on-disk index for a model's embeddings.
+
+    Args:
+        model_name (str): The name of the embedding model.
+
+    Returns:
+        VectorIndex: The index stored under CONFIG["VECTOR_INDEX_DIR"].
+    """
+    with _indexes_lock:
+        if model_name not in _indexes:
+            slug = re.sub(r"[^A-Za-z0-9]+", "_", model_name).strip("_")
+            _indexes[model_name] = VectorIndex(os.path.join(CONFIG["VECTOR_INDEX_DIR"], slug))
+        return _indexes[model_name]
@@ -1,18 +1,473 @@
+import hashlib
 import logging
+import re
+from collections import deque
+from urllib.parse import urljoin, urldefrag
+import numpy as np
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, NavigableString, CData
+from similarity_analyzer.config import CONFIG
+from similarity_analyzer.instrumentation import telemetry
+
+try:
+    from lxml import etree
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
 
 logger = logging.getLogger(__name__)
 
-def scrape_webpage(url: str) -> dict:
+# Elements whose text is extracted as sections
+BLOCK_TAGS = frozenset(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'div', 'section', 'article', 'li'])
+# Elements whose content is never page text
+SKIP_TAGS = frozenset(['script', 'style', 'noscript', 'template'])
+# Page landmarks; each section is labelled with its innermost enclosing landmark
+LANDMARK_TAGS = frozenset(['header', 'nav', 'main', 'article', 'section', 'aside', 'footer', 'form'])
+
+# Sections with fewer words than this are only collapsed when they are exact duplicates
+NEAR_DUPLICATE_MIN_WORDS = 8
+# Estimated Jaccard similarity of word trigrams above which two sections are near-duplicates
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+# Characters of a document fed to lxml at a time
+_LXML_FEED_CHARS = 1 << 16
+
+def _lxml_events(html: str):
+    """Yields (event, tag or text, href) tuples from lxml's C parser, without building a tree."""
+    collector = _EventCollector()
+    parser = etree.HTMLParser(target=collector)
+    # Fed in pieces so the events of each piece are yielded before the next is parsed
+    for start in range(0, len(html), _LXML_FEED_CHARS):
+        parser.feed(html[start:start + _LXML_FEED_CHARS])
+        yield from collector.drain()
+    parser.close()
+    yield from collector.drain()
+
+def _soup_events(html: str):
+    """Yields (event, tag or text, href) tuples from BeautifulSoup's html.parser tree."""
+    soup = BeautifulSoup(html, 'html.parser')
+    stack = [(None, iter(soup.contents))]
+    while stack:
+        tag, children = stack[-1]
+        node = next(children, None)
+        if node is None:
+            stack.pop()
+            if tag is not None:
+                yield 'end', tag.name, None
+        elif type(node) in (NavigableString, CData):
+            yield 'text', str(node), None
+        elif node.name is not None and hasattr(node, 'contents'):
+            yield 'start', node.name, node.get('href') if node.name == 'a' else None
+            stack.append((node, iter(node.contents)))
+
+def _html_events(html: str):
+    """Yields parse events from the fastest available parser backend."""
+    if HAS_LXML and html.strip():
+        events = _lxml_events(html)
+        try:
+            # lxml rejects a document up front, before any event is produced
+            first = next(events, None)
+        except (ValueError, etree.LxmlError) as e:
+            logger.debug(f"lxml could not parse the document, falling back to html.parser: {e}")
+        else:
+            if first is not None:
+                yield first
+            yield from events
+            return
+    yield from _soup_events(html)
+
+class _EventCollector:
+    """
+    lxml parser target that turns parser callbacks into the events of `_html_events`.
+
+    No tree is built. A text node may arrive in several callbacks when it
+    spans two fed chunks, so text is held back until the next tag.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.text = []
+
+    def _flush_text(self):
+        if self.text:
+            self.events.append(('text', ''.join(self.text), None))
+            self.text = []
+
+    def start(self, tag, attrib):
+        self._flush_text()
+        self.events.append(('start', tag, attrib.get('href') if tag == 'a' else None))
+
+    def end(self, tag):
+        self._flush_text()
+        self.events.append(('end', tag, None))
+
+    def data(self, data):
+        self.text.append(data)
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        self._flush_text()
+
+    def drain(self) -> list:
+        events, self.events = self.events, []
+        return events
+
+def stream_html_events(chunks, encoding: str = None):
+    """
+    Yields parse events while an HTML document is still arriving.
+
+    With lxml, each chunk is fed to an incremental parser and the events it
+    completes are yielded at once, so memory is bounded by the chunk size
+    rather than the document size. Without lxml, the chunks are joined and
+    parsed with html.parser.
+
+    Args:
+        chunks: An iterable of bytes, e.g. `response.iter_content()`.
+        encoding (str): The document encoding, if the server declared one.
+
+    Yields:
+        tuple: (event, tag or text, href) tuples, as from `_html_events`.
+    """
+    if not HAS_LXML:
+        logger.debug("lxml is not installed; parsing the whole document with html.parser")
+        yield from _soup_events(b''.join(chunks).decode(encoding or 'utf-8', errors='replace'))
+        return
+    collector = _EventCollector()
+    parser = etree.HTMLParser(target=collector, encoding=encoding)
+    fed = False
+    for chunk in chunks:
+        if chunk:
+            parser.feed(chunk)
+            fed = True
+            yield from collector.drain()
+    if fed:
+        parser.close()
+    yield from collector.drain()
+
+# MinHash signatures use 32 hash functions, split into 8 LSH bands of 4 rows
+_MINHASH_BANDS = 8
+_MINHASH_ROWS = 4
+_rng = np.random.default_rng(20240829)
+_MINHASH_A = _rng.integers(1, 2**63, size=_MINHASH_BANDS * _MINHASH_ROWS, dtype=np.uint64) | np.uint64(1)
+_MINHASH_B = _rng.integers(0, 2**63, size=_MINHASH_BANDS * _MINHASH_ROWS, dtype=np.uint64)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+# Words hashed per vectorized MinHash chunk, bounding the temporary (words x 32) matrix
+_MINHASH_CHUNK_WORDS = 1 << 14
+
+def _minhash_signatures(word_lists: list) -> np.ndarray:
+    """
+    Computes MinHash signatures over word trigrams for many sections at once.
+
+    Every section must have at least three words. Word hashes are computed once
+    per distinct word, and the minimum of each hash function over a section's
+    trigrams is taken with a single reduceat per chunk of sections.
+
+    Returns:
+        numpy.ndarray: A (sections x 32) array of uint64 signatures.
+    """
+    word_hashes = {}
+    signatures = []
+    start = 0
+    while start < len(word_lists):
+        end, total = start, 0
+        while end < len(word_lists) and (end == start or total + len(word_lists[end]) <= _MINHASH_CHUNK_WORDS):
+            total += len(word_lists[end])
+            end += 1
+        chunk = word_lists[start:end]
+        start = end
+
+        for words in chunk:
+            for word in words:
+                if word not in word_hashes:
+                    word_hashes[word] = int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'big')
+        hashes = np.array([word_hashes[word] for words in chunk for word in words], dtype=np.uint64)
+
+        # Order-sensitive combination of each word with its two successors
+        shingles = (hashes[:-2] * _MIX) ^ (hashes[1:-1] >> np.uint64(7)) ^ (hashes[2:] * _MINHASH_A[0])
+        permuted = shingles[:, None] * _MINHASH_A + _MINHASH_B
+        permuted ^= permuted >> np.uint64(29)
+        # A maximal row past the end keeps the last boundary index in range
+        permuted = np.vstack((permuted, np.full((1, permuted.shape[1]), np.iinfo(np.uint64).max, dtype=np.uint64)))
+
+        # Reduce each section's own trigrams; the odd segments span section boundaries
+        lengths = np.array([len(words) for words in chunk])
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        boundaries = np.column_stack((offsets, offsets + lengths - 2)).ravel()
+        signatures.append(np.minimum.reduceat(permuted, boundaries, axis=0)[::2])
+    if not signatures:
+        return np.empty((0, _MINHASH_BANDS * _MINHASH_ROWS), dtype=np.uint64)
+    return np.concatenate(signatures)
+
+class SectionDeduplicator:
+    """
+    Finds exact and near-duplicate sections across successive batches of one page.
+
+    Sections are compared after lowercasing and stripping punctuation and
+    whitespace. Longer sections are also compared by the Jaccard similarity of
+    their word trigrams, estimated with MinHash; locality-sensitive hashing on
+    signature bands limits the comparisons to likely matches. Only a digest
+    and a signature of each kept section are retained, never its text, so a
+    streamed page can be deduplicated batch by batch.
+
+    With `max_sections`, only the most recently kept sections are remembered,
+    which bounds memory at about 1KB per remembered section; a section that
+    only repeats one further back than that is kept again.
+
+    Args:
+        threshold (float): Minimum estimated similarity for a near-duplicate.
+        max_sections (int): Number of kept sections to remember, or None for all of them.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUPLICATE_THRESHOLD, max_sections: int = None):
+        self.threshold = threshold
+        self.max_sections = max_sections
+        self.seen = set()
+        # Exact digests in the order they were kept, for forgetting the oldest
+        self.seen_order = deque()
+        # Signatures and band hashes of kept sections, in arrays grown by doubling; with
+        # `max_sections` they are ring buffers and `kept_count` counts every section ever kept
+        self.kept = np.empty((0, _MINHASH_BANDS * _MINHASH_ROWS), dtype=np.uint64)
+        self.kept_keys = np.empty((0, _MINHASH_BANDS), dtype=np.uint64)
+        self.kept_count = 0
+        self.buckets = [{} for _ in range(_MINHASH_BANDS)]
+
+    def _remember_digest(self, digest: int):
+        self.seen.add(digest)
+        if self.max_sections is not None:
+            self.seen_order.append(digest)
+            if len(self.seen_order) > self.max_sections:
+                self.seen.discard(self.seen_order.popleft())
+
+    def _forget_slot(self, slot: int):
+        """Removes the band hashes of the signature about to be overwritten in `slot`."""
+        for bucket, key in zip(self.buckets, self.kept_keys[slot].tolist()):
+            rows = bucket.get(key)
+            if rows == slot:
+                del bucket[key]
+            elif type(rows) is list:
+                rows.remove(slot)
+                if len(rows) == 1:
+                    bucket[key] = rows[0]
+
+    def _keep_signature(self, signature: np.ndarray, keys: list):
+        slot = self.kept_count
+        if self.max_sections is not None and self.kept_count >= self.max_sections:
+            slot = self.kept_count % self.max_sections
+            self._forget_slot(slot)
+        elif slot == len(self.kept):
+            size = max(64, 2 * len(self.kept))
+            if self.max_sections is not None:
+                size = min(size, self.max_sections)
+            self.kept = np.resize(self.kept, (size, self.kept.shape[1]))
+            self.kept_keys = np.resize(self.kept_keys, (size, _MINHASH_BANDS))
+        for bucket, key in zip(self.buckets, keys):
+            # Most band hashes belong to one section, which is stored without a list
+            rows = bucket.setdefault(key, slot)
+            if type(rows) is int and rows != slot:
+                bucket[key] = [rows, slot]
+            elif type(rows) is list:
+                rows.append(slot)
+        self.kept[slot] = signature
+        self.kept_keys[slot] = keys
+        self.kept_count += 1
+
+    def filter(self, sections: list) -> list:
+        """
+        Returns the indices of the sections in this batch that duplicate neither an earlier batch nor each other.
+
+        Args:
+            sections (list): The next sections of the page.
+
+        Returns:
+            list: Indices into `sections` of the sections to keep, in ascending order.
+        """
+        candidates = []
+        for index, section in enumerate(sections):
+            words = re.findall(r'\w+', section.lower())
+            digest = int.from_bytes(hashlib.blake2b(' '.join(words).encode('utf-8'), digest_size=8).digest(), 'big')
+            if digest not in self.seen:
+                self._remember_digest(digest)
+                candidates.append((index, words))
+
+        signatures = _minhash_signatures([words for _, words in candidates if len(words) >= NEAR_DUPLICATE_MIN_WORDS])
+        # One hash per band; sections sharing any band hash become comparison candidates
+        band_rows = signatures.reshape(len(signatures), _MINHASH_BANDS, _MINHASH_ROWS)
+        band_keys = (band_rows * _MINHASH_A[:_MINHASH_ROWS]).sum(axis=2, dtype=np.uint64).tolist()
+        unique = []
+        row = 0
+        for index, words in candidates:
+            if len(words) >= NEAR_DUPLICATE_MIN_WORDS:
+                signature, keys = signatures[row], band_keys[row]
+                row += 1
+                matches = set()
+                for bucket, key in zip(self.buckets, keys):
+                    rows = bucket.get(key, ())
+                    matches.update((rows,) if type(rows) is int else rows)
+                if any(np.mean(signature == self.kept[other]) >= self.threshold for other in matches):
+                    continue
+                self._keep_signature(signature, keys)
+            unique.append(index)
+        return unique
+
+def deduplicate_sections(sections: list, threshold: float = NEAR_DUPLICATE_THRESHOLD) -> list:
+    """
+    Collapses exact and near-duplicate sections, keeping the first occurrence.
+
+    Args:
+        sections (list): A list of text sections.
+        threshold (float): Minimum estimated similarity for a near-duplicate.
+
+    Returns:
+        list: The sections with duplicates removed, in their original order.
+    """
+    return [sections[i] for i in unique_section_indices(sections, threshold)]
+
+def unique_section_indices(sections: list, threshold: float = NEAR_DUPLICATE_THRESHOLD) -> list:
+    """
+    Finds the sections that are not exact or near duplicates of an earlier one.
+
+    See `SectionDeduplicator` for how sections are compared.
+
+    Args:
+        sections (list): A list of text sections.
+        threshold (float): Minimum estimated similarity for a near-duplicate.
+
+    Returns:
+        list: Indices of the sections to keep, in ascending order.
+    """
+    return SectionDeduplicator(threshold).filter(sections)
+
+def _extract_sections(events, base_url: str = None, page: dict = None):
+    """
+    Turns parse events into text sections, one at a time.
+
+    Each string belongs to its nearest enclosing block element (p, headings,
+    div, section, article, li), so the text of nested containers is emitted
+    once instead of once per ancestor. Text a container holds directly between
+    its child blocks becomes its own section.
+
+    Args:
+        events: Parse events, see `_html_events`.
+        base_url (str): The URL the document was fetched from, used to resolve relative links.
+        page (dict): Optional dict that receives the page "title" and its "links" as they are found.
+
+    Yields:
+        tuple: Each section's text and region (its innermost landmark element,
+               such as "main 1" or "footer 1", or "body").
+    """
+    page = {} if page is None else page
+    page.setdefault('title', 'No Title')
+    links = page.setdefault('links', [])
+    title_parts = None
+    in_title = False
+    skip_depth = 0
+    block_runs = []
+    landmarks = []
+    landmark_counts = {}
+
+    def section(run):
+        return ''.join(run), landmarks[-1] if landmarks else 'body'
+
+    for event, value, href in events:
+        if event == 'start':
+            if skip_depth or value in SKIP_TAGS:
+                skip_depth += 1
+                continue
+            if value == 'title' and title_parts is None:
+                title_parts, in_title = [], True
+            elif value in BLOCK_TAGS:
+                # A child block ends the parent's current run of text
+                if block_runs and block_runs[-1]:
+                    yield section(block_runs[-1])
+                    block_runs[-1] = []
+                block_runs.append([])
+            elif value == 'a' and href:
+                link = urldefrag(urljoin(base_url or '', href)).url
+                if link.startswith(('http://', 'https://')):
+                    links.append(link)
+            if value in LANDMARK_TAGS:
+                landmark_counts[value] = landmark_counts.get(value, 0) + 1
+                landmarks.append(f"{value} {landmark_counts[value]}")
+        elif event == 'end':
+            if skip_depth:
+                skip_depth -= 1
+                continue
+            if value == 'title':
+                in_title = False
+                if title_parts:
+                    page['title'] = ''.join(title_parts)
+            elif value in BLOCK_TAGS and block_runs:
+                run = block_runs.pop()
+                if run:
+                    yield section(run)
+            if value in LANDMARK_TAGS and landmarks:
+                landmarks.pop()
+        elif not skip_depth:
+            if in_title:
+                title_parts.append(value)
+            elif block_runs:
+                text = value.strip()
+                if text:
+                    block_runs[-1].append(text)
+
+def parse_html(html: str, base_url: str = None, deduplicate: bool = True) -> dict:
+    """
+    Parses an HTML document and extracts its title, text sections and links.
+
+    The document is walked once; see `_extract_sections` for how text is
+    assigned to sections.
+
+    Args:
+        html (str): The HTML content to parse.
+        base_url (str): The URL the document was fetched from, used to resolve
+                        relative links.
+        deduplicate (bool): Whether to collapse exact and near-duplicate sections.
+
+    Returns:
+        dict: A dictionary containing the page title, a list of text sections,
+              the region of each section (its innermost landmark element, such
+              as "main 1" or "footer 1", or "body") and a list of absolute
+              link URLs found on the page.
+    """
+    page = {}
+    extracted = list(_extract_sections(_html_events(html), base_url, page))
+    sections = [text for text, _ in extracted]
+    regions = [region for _, region in extracted]
+
+    if deduplicate:
+        kept = unique_section_indices(sections)
+        sections = [sections[i] for i in kept]
+        regions = [regions[i] for i in kept]
+
+    return {
+        'title': page['title'],
+        'sections': sections,
+        'regions': regions,
+        'links': page['links']
+    }
+
+def scrape_webpage(url: str, session: requests.Session = None, timeout: float = None,
+                   etag: str = None, last_modified: str = None) -> dict:
     """
     Scrapes a webpage using requests and BeautifulSoup and extracts all text content.
 
+    When the ETag or Last-Modified value of an earlier fetch is given, the
+    request is conditional, and a page the server reports as unchanged (304)
+    is neither downloaded nor parsed.
+
     Args:
         url (str): The URL of the webpage to scrape.
+        session (requests.Session): Optional session to reuse pooled keep-alive connections.
+        timeout (float): Request timeout in seconds. Defaults to CONFIG["REQUEST_TIMEOUT"].
+        etag (str): ETag of the previously fetched version, sent as If-None-Match.
+        last_modified (str): Last-Modified of the previously fetched version, sent as If-Modified-Since.
 
     Returns:
-        dict: A dictionary containing the page title and a list of text sections,
+        dict: A dictionary containing the page title, a list of text sections,
+              links and the response's etag and last_modified validators, or
+              {'not_modified': True, ...validators} if the page is unchanged,
               or None if an error occurs.
 
     This function uses the requests library to load a webpage and BeautifulSoup to parse its content.
@@ -20,32 +475,33 @@ def scrape_webpage(url: str) -> dict:
     """
     try:
         logger.info(f"Scraping webpage: {url}")
-        
+
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
         # Send a GET request to the specified URL
-        response = requests.get(url)
+        get = session.get if session is not None else requests.get
+        with telemetry.span("http_fetch"):
+            response = get(url, timeout=timeout or CONFIG["REQUEST_TIMEOUT"], headers=headers)
+        validators = {
+            'etag': response.headers.get('ETag') or etag,
+            'last_modified': response.headers.get('Last-Modified') or last_modified,
+        }
+        if headers and response.status_code == 304:
+            logger.info(f"{url} is unchanged since the last fetch")
+            telemetry.count("pages_not_modified_total")
+            return {'not_modified': True, **validators}
         response.raise_for_status()  # Raise an HTTPError for bad responses (4xx, 5xx)
 
         # Parse the webpage content
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Extract the title
-        title = soup.title.string if soup.title else 'No Title'
-
-        # Extract text from paragraphs, headings, and list items
-        sections = []
-        elements = soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'div', 'section', 'article', 'li'])
-        for element in elements:
-            text = element.get_text(strip=True)
-            if text:
-                sections.append(text)
-
-        # Return the extracted data
-        result = {
-            'title': title,
-            'sections': sections
-        }
+        with telemetry.span("parse_html"):
+            result = parse_html(response.text, url)
 
-        if sections:
+        if result['sections']:
+            result.update(validators)
             return result
         else:
             logger.warning(f"No content found on {url}.")
@@ -56,4 +512,49 @@ def scrape_webpage(url: str) -> dict:
         return None
     except Exception as e:
         logger.error(f"An unexpected error occurred while scraping {url}: {type(e).__name__} - {e}")
-        return None
\ No newline at end of file
+        return None
+
+def stream_webpage(url: str, session: requests.Session = None, timeout: float = None, page: dict = None,
+                   chunk_size: int = None, dedup_window: int = None):
+    """
+    Downloads and parses a webpage incrementally, yielding its sections as they are parsed.
+
+    The response body is read in chunks of `chunk_size` bytes and fed to an
+    incremental parser, and sections are deduplicated in windows of
+    `dedup_window`, so neither the document nor its full list of sections is
+    ever held in memory. Deduplication remembers the last
+    CONFIG["STREAM_DEDUP_MAX_SECTIONS"] distinct sections.
+
+    Args:
+        url (str): The URL of the webpage to scrape.
+        session (requests.Session): Optional session to reuse pooled keep-alive connections.
+        timeout (float): Request timeout in seconds. Defaults to CONFIG["REQUEST_TIMEOUT"].
+        page (dict): Optional dict that receives the page "title" and "links" as they are parsed.
+        chunk_size (int): Bytes read per chunk. Defaults to CONFIG["STREAM_CHUNK_BYTES"].
+        dedup_window (int): Sections buffered per deduplication batch. Defaults to CONFIG["STREAM_BATCH_SECTIONS"].
+
+    Yields:
+        tuple: Each distinct section's text and region.
+
+    Raises:
+        requests.exceptions.RequestException: If the page cannot be fetched.
+    """
+    chunk_size = chunk_size or CONFIG["STREAM_CHUNK_BYTES"]
+    dedup_window = dedup_window or CONFIG["STREAM_BATCH_SECTIONS"]
+    logger.info(f"Streaming webpage: {url}")
+    get = session.get if session is not None else requests.get
+    with telemetry.span("http_fetch"):
+        response = get(url, timeout=timeout or CONFIG["REQUEST_TIMEOUT"], stream=True)
+    with response:
+        response.raise_for_status()
+        # Only a charset the server declared; otherwise the parser reads the document's own meta tag
+        encoding = response.encoding if 'charset' in response.headers.get('Content-Type', '').lower() else None
+        events = stream_html_events(response.iter_content(chunk_size), encoding)
+        deduplicator = SectionDeduplicator(max_sections=CONFIG["STREAM_DEDUP_MAX_SECTIONS"])
+        window = []
+        for section in _extract_sections(events, url, page):
+            window.append(section)
+            if len(window) >= dedup_window:
+                yield from (window[i] for i in deduplicator.filter([text for text, _ in window]))
+                window = []
+        yield from (window[i] for i in deduplicator.filter([text for text, _ in window]))
@@ -0,0 +1,63 @@
+import unittest
+import numpy as np
+from similarity_analyzer.chunker import best_chunks, chunk_sections, count_tokens, rollup_scores, split_section
+
+class TestChunker(unittest.TestCase):
+    """
+    Unit tests for the chunker module.
+    """
+
+    def test_small_sections_are_merged_within_a_region(self):
+        """
+        Test that adjacent short sections are merged, but not across regions or into long sections.
+        """
+        sections = ["Home", "Products", "About us", "Contact", "A paragraph about blue widgets that is long enough."]
+        regions = ["nav 1", "nav 1", "nav 1", "footer 1", "footer 1"]
+        chunks, spans = chunk_sections(sections, max_tokens=50, min_tokens=5, overlap_tokens=0, regions=regions)
+
+        self.assertEqual(chunks[0], "Home\nProducts\nAbout us")
+        self.assertEqual(spans, [(0, 3), (3, 4), (4, 5)])
+
+    def test_long_sections_are_split_at_sentences_with_overlap(self):
+        """
+        Test that an oversized section becomes overlapping windows of bounded size.
+        """
+        sentences = [f"Sentence {i} talks about widget number {i} today." for i in range(40)]
+        text = " ".join(sentences)
+        windows = split_section(text, max_tokens=40, overlap_tokens=10)
+
+        self.assertGreater(len(windows), 1)
+        for window in windows:
+            self.assertLessEqual(count_tokens(window), 40)
+            self.assertTrue(window.endswith("today."))
+        # Each window starts with the last sentence of the previous one
+        for previous, window in zip(windows, windows[1:]):
+            self.assertTrue(window.startswith("Sentence " + previous.rsplit(" Sentence ", 1)[-1]))
+        self.assertIn(sentences[-1], windows[-1])
+
+    def test_sentence_longer_than_a_window_is_cut_at_words(self):
+        """
+        Test that a single sentence without boundaries is still split into bounded windows.
+        """
+        text = " ".join(f"word{i}" for i in range(500))
+        chunks, spans = chunk_sections([text], max_tokens=100, min_tokens=0, overlap_tokens=20)
+
+        self.assertGreater(len(chunks), 5)
+        self.assertEqual(set(spans), {(0, 1)})
+        self.assertTrue(all(count_tokens(chunk) <= 100 for chunk in chunks))
+
+    def test_rollup_scores(self):
+        """
+        Test that sections take the best score of their chunks, for score lists and matrices.
+        """
+        spans = [(0, 2), (2, 3), (2, 3), (3, 4)]
+        scores = rollup_scores([1.0, 4.0, 6.0, 2.0], spans, 4)
+        np.testing.assert_array_equal(scores, [1.0, 1.0, 6.0, 2.0])
+
+        matrix = rollup_scores(np.array([[1.0, 4.0, 6.0, 2.0], [3.0, 9.0, 5.0, 0.0]]), spans, 4)
+        np.testing.assert_array_equal(matrix, [[1.0, 1.0, 6.0, 2.0], [3.0, 3.0, 9.0, 0.0]])
+        self.assertEqual(rollup_scores([], [], 0).shape, (0,))
+        np.testing.assert_array_equal(best_chunks([1.0, 4.0, 6.0, 2.0], spans, 4), [0, 0, 2, 3])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,225 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from google.cloud import language_v1
+from typer.testing import CliRunner
+from similarity_analyzer import cli
+from similarity_analyzer.cli import app, read_pairs, run_batch
+from similarity_analyzer.result_store import ResultStore
+
+async def fake_analyze_webpage(url, query, model_name):
+    if "broken" in url:
+        return None, None, None, None
+    sentiment = language_v1.Sentiment(score=0.5, magnitude=1.0)
+    entity = language_v1.Entity(name="Widget", type_=language_v1.Entity.Type.CONSUMER_GOOD, salience=0.7)
+    sections = [f"{url} first", f"{url} second"]
+    return sections, [8.0, 2.0], [sentiment, sentiment], [[entity], []]
+
+class TestCLI(unittest.TestCase):
+    """
+    Unit tests for the cli module.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.tmpdir.name, "pairs.csv")
+        with open(self.input_path, "w") as f:
+            f.write("url,query\n")
+            for i in range(5):
+                f.write(f"https://example.com/{i},widgets\n")
+            f.write("https://example.com/broken,widgets\n")
+            f.write("https://example.com/0,widgets\n")
+        patcher = patch.object(cli, "analyze_webpage", side_effect=fake_analyze_webpage)
+        self.analyze = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = ResultStore(os.path.join(self.tmpdir.name, "results", "results.sqlite"))
+        store_patcher = patch.object(cli, "get_result_store", return_value=self.store)
+        store_patcher.start()
+        self.addCleanup(store_patcher.stop)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def read_jsonl(self, path):
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_read_pairs_skips_header_and_duplicates(self):
+        """
+        Test that the header row and repeated pairs are skipped.
+        """
+        pairs = list(read_pairs(self.input_path))
+        self.assertEqual(len(pairs), 6)
+        self.assertEqual(pairs[0], ("https://example.com/0", "widgets"))
+
+    def test_run_batch_streams_section_rows(self):
+        """
+        Test that every section of every page is written with its score, sentiment and entities.
+        """
+        output = os.path.join(self.tmpdir.name, "out.jsonl")
+        stats = run_batch(self.input_path, output, "Universal Sentence Encoder", concurrency=3)
+
+        rows = self.read_jsonl(output)
+        self.assertEqual(len(rows), 10)
+        self.assertEqual((stats["pages"], stats["failed"], stats["sections"]), (5, 1, 10))
+        first = next(row for row in rows if row["section_index"] == 0)
+        self.assertEqual(first["score"], 8.0)
+        self.assertEqual(first["sentiment_score"], 0.5)
+        self.assertEqual(first["entities"][0]["name"], "Widget")
+        self.assertEqual(first["entities"][0]["type"], "CONSUMER_GOOD")
+        runs = self.store.runs(query="widgets")
+        self.assertEqual(len(runs), 5)
+        self.assertEqual(runs[0]["average"], 5.0)
+
+    def test_resume_skips_finished_pages_and_discards_partial_output(self):
+        """
+        Test that a resumed run only analyzes unfinished pages and leaves no duplicate rows.
+        """
+        output = os.path.join(self.tmpdir.name, "out.jsonl")
+        run_batch(self.input_path, output, "Universal Sentence Encoder", concurrency=1)
+
+        # Simulate a crash: the last two pages were never recorded and a page was half written
+        progress_path = output + ".progress"
+        with open(progress_path) as f:
+            entries = f.readlines()
+        with open(progress_path, "w") as f:
+            f.writelines(entries[:4])
+            f.write('{"url": "https://exa')
+        with open(output, "a") as f:
+            f.write('{"url": "partial row"')
+
+        self.analyze.reset_mock()
+        stats = run_batch(self.input_path, output, "Universal Sentence Encoder", concurrency=2, resume=True)
+
+        self.assertEqual(stats["skipped"], 4)
+        self.assertEqual(self.analyze.call_count, 2)
+        rows = self.read_jsonl(output)
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(len({(row["url"], row["section_index"]) for row in rows}), 10)
+
+    def test_parquet_output(self):
+        """
+        Test that Parquet output is written as readable part files.
+        """
+        import pyarrow.parquet as pq
+
+        output = os.path.join(self.tmpdir.name, "out.parquet")
+        with patch.object(cli, "PARQUET_PAGES_PER_PART", 2):
+            run_batch(self.input_path, output, "Universal Sentence Encoder", concurrency=2)
+        self.assertEqual(len([name for name in os.listdir(output) if name.endswith(".parquet")]), 3)
+        table = pq.read_table(output)
+        self.assertEqual(table.num_rows, 10)
+        self.assertEqual(sorted(set(table.column("score").to_pylist())), [2.0, 8.0])
+
+    def test_parquet_rows_are_written_in_row_groups(self):
+        """
+        Test that a page's rows are written out in bounded row groups rather than buffered whole.
+        """
+        import pyarrow.parquet as pq
+
+        output = os.path.join(self.tmpdir.name, "out.parquet")
+        with patch.object(cli, "PARQUET_ROWS_PER_GROUP", 3):
+            run_batch(self.input_path, output, "Universal Sentence Encoder", concurrency=1)
+        parts = [os.path.join(output, name) for name in os.listdir(output) if name.endswith(".parquet")]
+        self.assertEqual(len(parts), 1)
+        metadata = pq.ParquetFile(parts[0]).metadata
+        self.assertEqual(metadata.num_rows, 10)
+        self.assertEqual(max(metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)), 3)
+
+    def test_incremental_run_writes_score_changes(self):
+        """
+        Test that an incremental run re-analyzes pages against snapshots and records their changes.
+        """
+        async def fake_reanalyze_webpage(url, query, model_name, timings):
+            sections, scores, sentiments, entities = await fake_analyze_webpage(url, query, model_name)
+            if sections is None:
+                return None, None, None, None, None
+            timings.update(recomputed=1, reused=1)
+            diff = [{"status": "unchanged", "section": sections[0]},
+                    {"status": "modified", "section": sections[1], "delta": -1.0}]
+            return sections, scores, sentiments, entities, diff
+
+        output = os.path.join(self.tmpdir.name, "out.jsonl")
+        with patch.object(cli, "reanalyze_webpage", side_effect=fake_reanalyze_webpage):
+            stats = run_batch(self.input_path, output, "Universal Sentence Encoder", incremental=True)
+
+        self.analyze.assert_not_called()
+        self.assertEqual(len(self.read_jsonl(output)), 10)
+        changes = self.read_jsonl(output + ".changes.jsonl")
+        self.assertEqual(len(changes), 5)
+        self.assertEqual({change["status"] for change in changes}, {"modified"})
+        self.assertEqual(changes[0]["query"], "widgets")
+        self.assertEqual((stats["recomputed_sections"], stats["reused_sections"], stats["changed_sections"]), (5, 5, 5))
+
+    def test_resumed_incremental_run_does_not_repeat_changes(self):
+        """
+        Test that changes of pages missing from the progress log are replaced, not duplicated, on resume.
+        """
+        async def fake_reanalyze_webpage(url, query, model_name, timings):
+            sections, scores, sentiments, entities = await fake_analyze_webpage(url, query, model_name)
+            if sections is None:
+                return None, None, None, None, None
+            return sections, scores, sentiments, entities, [{"status": "modified", "section": sections[0]}]
+
+        output = os.path.join(self.tmpdir.name, "out.jsonl")
+        with patch.object(cli, "reanalyze_webpage", side_effect=fake_reanalyze_webpage):
+            run_batch(self.input_path, output, "Universal Sentence Encoder", concurrency=1, incremental=True)
+
+            # Simulate a crash after the changes of the last pages were written but before they were recorded
+            progress_path = output + ".progress"
+            with open(progress_path) as f:
+                entries = f.readlines()
+            with open(progress_path, "w") as f:
+                f.writelines(entries[:3])
+
+            stats = run_batch(self.input_path, output, "Universal Sentence Encoder", concurrency=1,
+                              resume=True, incremental=True)
+
+        self.assertEqual(stats["skipped"], 3)
+        changes = self.read_jsonl(output + ".changes.jsonl")
+        self.assertEqual(sorted(change["url"] for change in changes),
+                         [f"https://example.com/{i}" for i in range(5)])
+
+    def test_stream_run_writes_rows_and_summaries_batch_by_batch(self):
+        """
+        Test that a streaming run writes every batch's rows with page-wide section indices and a summary per page.
+        """
+        async def fake_analyze_webpage_stream(url, query, model_name, on_batch, timings):
+            sections, scores, sentiments, entities = await fake_analyze_webpage(url, query, model_name)
+            if sections is None:
+                return None
+            for offset in range(2):
+                on_batch(offset, sections[offset:offset + 1], scores[offset:offset + 1],
+                         sentiments[offset:offset + 1], entities[offset:offset + 1])
+            return {"title": "Page", "sections": 2, "average": 5.0}
+
+        output = os.path.join(self.tmpdir.name, "out.jsonl")
+        with patch.object(cli, "analyze_webpage_stream", side_effect=fake_analyze_webpage_stream):
+            stats = run_batch(self.input_path, output, "Universal Sentence Encoder", stream=True)
+
+        self.analyze.assert_not_called()
+        rows = self.read_jsonl(output)
+        self.assertEqual((stats["pages"], stats["failed"], stats["sections"]), (5, 1, 10))
+        self.assertEqual(sorted(row["section_index"] for row in rows if row["url"].endswith("/3")), [0, 1])
+        self.assertEqual(next(row for row in rows if row["section_index"] == 1)["score"], 2.0)
+        summaries = self.read_jsonl(output + ".summary.jsonl")
+        self.assertEqual(len(summaries), 5)
+        self.assertEqual(summaries[0]["average"], 5.0)
+        run = self.store.runs(url="https://example.com/3")[0]
+        self.assertEqual((run["title"], run["section_count"]), ("Page", 2))
+        self.assertEqual([row["score"] for row in self.store.sections(run["id"])], [8.0, 2.0])
+
+    def test_command_prints_throughput(self):
+        """
+        Test that the command reports throughput statistics when it finishes.
+        """
+        output = os.path.join(self.tmpdir.name, "out.jsonl")
+        result = CliRunner().invoke(app, [self.input_path, "--output", output, "--concurrency", "2"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Analyzed 5 pages (1 failed, 0 skipped", result.output)
+        self.assertIn("pages/s", result.output)
+
+if __name__ == '__main__':
+    unittest.main()
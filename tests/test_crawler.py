@@ -0,0 +1,166 @@
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from similarity_analyzer.crawler import crawl, RequestQueue, fetch_sitemap_urls, unique_key
+
+PAGES = {
+    '/': '<html><head><title>Home</title></head><body><p>Welcome home</p>'
+         '<a href="/a">A</a><a href="/b#top">B</a><a href="http://elsewhere.invalid/x">X</a></body></html>',
+    '/a': '<html><head><title>A</title></head><body><p>Page A</p><a href="/c">C</a></body></html>',
+    '/b': '<html><head><title>B</title></head><body><p>Page B</p></body></html>',
+    '/c': '<html><head><title>C</title></head><body><p>Page C</p></body></html>',
+}
+
+class SiteHandler(BaseHTTPRequestHandler):
+    """
+    Serves a tiny static site and a sitemap, recording concurrency.
+    """
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.paths.append(self.path)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(0.02)
+            if self.path == '/sitemap.xml':
+                port = server.server_port
+                body = ('<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                        f'<url><loc>http://127.0.0.1:{port}/a</loc></url>'
+                        f'<url><loc>http://127.0.0.1:{port}/b</loc></url></urlset>')
+                self._send(200, body, 'application/xml')
+            elif self.path in PAGES:
+                self._send(200, PAGES[self.path], 'text/html')
+            else:
+                self._send(404, 'Not found', 'text/plain')
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send(self, status, body, content_type):
+        data = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+async def collect(**kwargs):
+    return [page async for page in crawl(**kwargs)]
+
+class TestCrawler(unittest.TestCase):
+    """
+    Unit tests for the crawler module against a local HTTP server.
+    """
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), SiteHandler)
+        self.server.lock = threading.Lock()
+        self.server.paths = []
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f'http://127.0.0.1:{self.server.server_port}'
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmpdir.cleanup()
+
+    def test_crawl_follows_links_on_same_host(self):
+        """
+        Test that the crawler follows same-host links and respects the per-host limit.
+        """
+        pages = asyncio.run(collect(seeds=[self.base + '/'], max_depth=2, max_per_host=2, host_delay=0,
+                                    storage_dir=self.tmpdir.name))
+        self.assertEqual(sorted(page['title'] for page in pages), ['A', 'B', 'C', 'Home'])
+        self.assertEqual(sorted(self.server.paths), ['/', '/a', '/b', '/c'])
+        self.assertLessEqual(self.server.max_in_flight, 2)
+
+    def test_interrupted_crawl_resumes_from_disk_queue(self):
+        """
+        Test that an interrupted crawl resumes without refetching handled pages, counting them against max_pages.
+        """
+        async def stop_at_second_page():
+            pages = crawl(seeds=[self.base + '/'], max_depth=1, max_concurrency=1, host_delay=0,
+                          storage_dir=self.tmpdir.name)
+            first = await pages.__anext__()
+            await pages.__anext__()
+            await pages.aclose()
+            return first
+
+        self.assertEqual(asyncio.run(stop_at_second_page())['title'], 'Home')
+        second = asyncio.run(collect(seeds=[self.base + '/'], max_depth=1, max_pages=2, host_delay=0,
+                                     storage_dir=self.tmpdir.name))
+        self.assertEqual(len(second), 1)
+        self.assertIn(second[0]['title'], ['A', 'B'])
+        self.assertEqual(self.server.paths.count('/'), 1)
+
+    def test_crawl_stopped_at_max_pages_starts_over(self):
+        """
+        Test that a crawl that ended at its page limit is not resumed by the next run.
+        """
+        first = asyncio.run(collect(seeds=[self.base + '/'], max_depth=1, max_pages=1, host_delay=0,
+                                    storage_dir=self.tmpdir.name))
+        second = asyncio.run(collect(seeds=[self.base + '/'], max_depth=1, max_pages=1, host_delay=0,
+                                     storage_dir=self.tmpdir.name))
+        self.assertEqual([page['title'] for page in first], ['Home'])
+        self.assertEqual([page['title'] for page in second], ['Home'])
+
+    def test_finished_crawl_starts_over(self):
+        """
+        Test that crawling a site again after a completed crawl fetches its pages again.
+        """
+        first = asyncio.run(collect(seeds=[self.base + '/'], host_delay=0, storage_dir=self.tmpdir.name))
+        second = asyncio.run(collect(seeds=[self.base + '/'], host_delay=0, storage_dir=self.tmpdir.name))
+        self.assertEqual([page['title'] for page in first], ['Home'])
+        self.assertEqual([page['title'] for page in second], ['Home'])
+        self.assertEqual(RequestQueue('default', self.tmpdir.name).handled_count, 1)
+
+    def test_page_is_handled_after_processing(self):
+        """
+        Test that a page the consumer did not finish processing is fetched again on resume.
+        """
+        async def stop_at_first_page():
+            pages = crawl(seeds=[self.base + '/'], max_depth=1, host_delay=0, storage_dir=self.tmpdir.name)
+            await pages.__anext__()
+            await pages.aclose()
+
+        asyncio.run(stop_at_first_page())
+        pages = asyncio.run(collect(seeds=[self.base + '/'], max_depth=1, host_delay=0, storage_dir=self.tmpdir.name))
+        self.assertIn('Home', [page['title'] for page in pages])
+
+    def test_crawl_from_sitemap(self):
+        """
+        Test that sitemap entries are used as seeds.
+        """
+        self.assertEqual(fetch_sitemap_urls(self.base + '/sitemap.xml'), [self.base + '/a', self.base + '/b'])
+        pages = asyncio.run(collect(sitemap=self.base + '/sitemap.xml', host_delay=0, storage_dir=self.tmpdir.name))
+        self.assertEqual(sorted(page['title'] for page in pages), ['A', 'B'])
+
+    def test_missing_page_is_not_retried(self):
+        """
+        Test that a 404 is recorded as handled without retries.
+        """
+        pages = asyncio.run(collect(seeds=[self.base + '/missing'], host_delay=0, storage_dir=self.tmpdir.name))
+        self.assertEqual(pages, [])
+        self.assertEqual(self.server.paths, ['/missing'])
+        queue = RequestQueue('default', self.tmpdir.name)
+        self.assertTrue(queue.is_finished())
+
+    def test_unique_key(self):
+        """
+        Test URL normalization used to de-duplicate requests.
+        """
+        self.assertEqual(unique_key('HTTP://Example.com/path/?b=2&a=1#frag'), 'http://example.com/path?a=1&b=2')
+
+if __name__ == '__main__':
+    unittest.main()
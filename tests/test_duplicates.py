@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+import numpy as np
+from similarity_analyzer.duplicates import DisjointSet, find_duplicates, similar_pairs
+from similarity_analyzer.vector_index import VectorIndex
+
+class TestDuplicates(unittest.TestCase):
+    """
+    Unit tests for the duplicates module.
+    """
+
+    def test_similar_pairs_matches_brute_force(self):
+        """
+        Test that tiled all-pairs search finds exactly the pairs of the full similarity matrix.
+        """
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((50, 8)).astype(np.float32)
+        vectors[25:] = vectors[:25] + rng.normal(scale=0.1, size=(25, 8))
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        firsts, seconds, similarities = similar_pairs(vectors, 0.8, block_rows=7, workers=3)
+
+        full = vectors @ vectors.T
+        expected = {(i, j) for i, j in zip(*np.nonzero(full >= 0.8)) if i < j}
+        self.assertEqual(set(zip(firsts.tolist(), seconds.tolist())), expected)
+        self.assertGreaterEqual(len(expected), 25)
+        np.testing.assert_allclose(similarities, full[firsts, seconds], rtol=1e-5)
+
+    def test_disjoint_set(self):
+        """
+        Test that unions merge clusters transitively.
+        """
+        groups = DisjointSet(5)
+        groups.union(0, 1)
+        groups.union(3, 1)
+        labels = groups.labels()
+        self.assertEqual(len({labels[0], labels[1], labels[3]}), 1)
+        self.assertNotEqual(labels[2], labels[0])
+        self.assertNotEqual(labels[4], labels[2])
+
+    def test_find_duplicates_clusters_sections_and_pages(self):
+        """
+        Test that duplicated pages are clustered and boilerplate repeated on every page is ignored.
+        """
+        rng = np.random.default_rng(1)
+        topics = rng.standard_normal((12, 16))
+        footer = rng.standard_normal(16)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            index = VectorIndex(tmp)
+            # Pages a and b share three of their four topics; every page carries the same footer
+            pages = {"http://a": [0, 1, 2, 3], "http://b": [0, 1, 2, 4], "http://c": [5, 6],
+                     "http://d": [7, 8], "http://e": [9, 10, 11]}
+            for url, page_topics in pages.items():
+                embeddings = np.vstack([topics[page_topics] + rng.normal(scale=0.01, size=(len(page_topics), 16)), footer])
+                index.add_page(url, [f"{url} topic {t}" for t in page_topics] + ["Footer"], embeddings)
+            # A replaced page leaves deleted rows behind, which must not be reported
+            index.add_page("http://e", ["http://e topic 9", "Footer"], np.vstack([topics[9], footer]))
+
+            report = find_duplicates(index, threshold=9.5, block_rows=4, workers=2)
+
+        self.assertEqual([cluster["urls"] for cluster in report["pages"]], [["http://a", "http://b"]])
+        self.assertAlmostEqual(report["pages"][0]["overlap"], 0.6)
+        content = [cluster for cluster in report["sections"] if not cluster["boilerplate"]]
+        self.assertEqual(len(content), 3)
+        self.assertTrue(all({m["url"] for m in cluster["members"]} == {"http://a", "http://b"} for cluster in content))
+        boilerplate = [cluster for cluster in report["sections"] if cluster["boilerplate"]]
+        self.assertEqual(len(boilerplate), 1)
+        self.assertEqual(boilerplate[0]["pages"], 5)
+        self.assertEqual(report["stats"]["sections"], 18)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import tempfile
+import unittest
+import numpy as np
+from similarity_analyzer.embedding_cache import EmbeddingCache
+
+def fake_embed(texts):
+    return np.array([[float(len(text)), 1.0, 0.0] for text in texts])
+
+class TestEmbeddingCache(unittest.TestCase):
+    """
+    Unit tests for the embedding_cache module.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.calls = []
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def embed(self, texts):
+        self.calls.append(list(texts))
+        return fake_embed(texts)
+
+    def test_only_misses_are_embedded(self):
+        """
+        Test that cached texts are served from the cache and counted as hits.
+        """
+        cache = EmbeddingCache(self.tmpdir.name, max_entries=100)
+        first = cache.embed("model", ["a", "bb", "a"], self.embed)
+        second = cache.embed("model", ["bb", "ccc"], self.embed)
+        self.assertEqual(self.calls, [["a", "bb"], ["ccc"]])
+        np.testing.assert_array_equal(first[:, 0], [1.0, 2.0, 1.0])
+        np.testing.assert_array_equal(second[:, 0], [2.0, 3.0])
+        self.assertEqual(second.dtype, np.float32)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 4))
+
+    def test_persists_across_instances(self):
+        """
+        Test that embeddings written by one cache instance are read by another.
+        """
+        EmbeddingCache(self.tmpdir.name, max_entries=100).embed("model", ["a", "bb"], self.embed)
+        cache = EmbeddingCache(self.tmpdir.name, max_entries=100)
+        result = cache.embed("model", ["bb", "a"], self.embed)
+        np.testing.assert_array_equal(result[:, 0], [2.0, 1.0])
+        self.assertEqual(len(self.calls), 1)
+        # A different model name never shares entries
+        cache.embed("other-model", ["a"], self.embed)
+        self.assertEqual(self.calls[-1], ["a"])
+
+    def test_lru_eviction(self):
+        """
+        Test that the least recently used entry is evicted once the cache is full.
+        """
+        cache = EmbeddingCache(self.tmpdir.name, max_entries=2)
+        cache.embed("model", ["a", "bb"], self.embed)
+        cache.embed("model", ["a"], self.embed)  # "a" becomes most recently used
+        cache.embed("model", ["ccc"], self.embed)  # evicts "bb"
+        self.calls.clear()
+        result = cache.embed("model", ["a", "ccc", "bb"], self.embed)
+        self.assertEqual(self.calls, [["bb"]])
+        np.testing.assert_array_equal(result[:, 0], [1.0, 3.0, 2.0])
+
+    def test_caches_sharing_a_directory(self):
+        """
+        Test that caches of separate processes on one directory never overwrite each other's entries.
+        """
+        first = EmbeddingCache(self.tmpdir.name, max_entries=100)
+        second = EmbeddingCache(self.tmpdir.name, max_entries=100)
+        first.embed("model", ["warm"], self.embed)
+        second.embed("model", ["warm"], self.embed)
+        first.embed("model", ["x"], lambda texts: np.array([[1.0, 0.0, 0.0]]))
+        second.embed("model", ["y"], lambda texts: np.array([[0.0, 1.0, 0.0]]))
+        self.calls.clear()
+        result = EmbeddingCache(self.tmpdir.name, max_entries=100).embed("model", ["x", "y"], self.embed)
+        self.assertEqual(self.calls, [])
+        np.testing.assert_array_equal(result, [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+
+    def test_embed_failure_returns_none(self):
+        """
+        Test that a failing embedding function is propagated as None and nothing is cached.
+        """
+        cache = EmbeddingCache(self.tmpdir.name, max_entries=10)
+        self.assertIsNone(cache.embed("model", ["a"], lambda texts: None))
+        self.assertEqual(cache.stats()["misses"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from unittest.mock import patch
+from google.api_core import retry
+from similarity_analyzer import embedding_generator
+from similarity_analyzer.embedding_generator import configure_gemini, generate_gemini_embeddings
+from similarity_analyzer.instrumentation import Telemetry
+from similarity_analyzer.quota import QuotaScheduler, QuotaStore
+
+class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+    """
+    Minimal stand-in for the Gemini batchEmbedContents REST endpoint.
+
+    Each text is embedded as [len(text), 1.0]. The server answers 429 to the
+    requests whose 1-based position is listed in `fail_requests`.
+    """
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            request_number = server.request_count
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            texts = [request['content']['parts'][0]['text'] for request in body['requests']]
+            server.batches.append(texts)
+            if request_number in server.fail_requests:
+                self._send(429, {"error": {"code": 429, "message": "Quota exceeded", "status": "RESOURCE_EXHAUSTED"}})
+            else:
+                self._send(200, {"embeddings": [{"values": [float(len(text)), 1.0]} for text in texts]})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+class TestEmbeddingGenerator(unittest.TestCase):
+    """
+    Unit tests for the embedding_generator module against a local fake embedding server.
+    """
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeEmbeddingHandler)
+        self.server.lock = threading.Lock()
+        self.server.request_count = 0
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.server.batches = []
+        self.server.fail_requests = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        configure_gemini(api_key="test-key", api_endpoint=f"http://127.0.0.1:{self.server.server_port}")
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.scheduler = QuotaScheduler(QuotaStore(os.path.join(tmpdir.name, "quota.sqlite")), {"gemini": 1000})
+        quota_patch = patch.object(embedding_generator, 'get_quota_scheduler', return_value=self.scheduler)
+        quota_patch.start()
+        self.addCleanup(quota_patch.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_generate_gemini_embeddings_batches(self):
+        """
+        Test that texts are split into batches and embeddings keep the input order.
+        """
+        texts = ["a" * (i + 1) for i in range(25)]
+        embeddings = generate_gemini_embeddings(texts, batch_size=10, max_concurrency=2)
+        self.assertEqual(embeddings.shape, (25, 2))
+        self.assertEqual(list(embeddings[:, 0]), [float(i + 1) for i in range(25)])
+        self.assertEqual(sorted(len(batch) for batch in self.server.batches), [5, 10, 10])
+        self.assertLessEqual(self.server.max_in_flight, 2)
+
+    def test_generate_gemini_embeddings_retries_failed_batch_only(self):
+        """
+        Test that a 429 only re-sends the batch that failed.
+        """
+        self.server.fail_requests = {1}
+        fast_retry = retry.Retry(predicate=embedding_generator.GEMINI_RETRY._predicate, initial=0.01, maximum=0.01)
+        telemetry = Telemetry()
+        with patch.object(embedding_generator, 'GEMINI_RETRY', fast_retry), \
+             patch.object(embedding_generator, 'telemetry', telemetry):
+            embeddings = generate_gemini_embeddings(["one", "two", "three"], batch_size=1, max_concurrency=1)
+        self.assertEqual(list(embeddings[:, 0]), [3.0, 3.0, 5.0])
+        self.assertEqual(self.server.request_count, 4)
+        self.assertEqual(self.server.batches, [["one"], ["one"], ["two"], ["three"]])
+        counters = telemetry.snapshot()["counters"]
+        self.assertEqual(counters[("retries_total", (("api", "gemini"),))], 1)
+        self.assertGreater(counters[("retry_backoff_seconds_total", (("api", "gemini"),))], 0)
+
+if __name__ == '__main__':
+    unittest.main()
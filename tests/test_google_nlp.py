@@ -1,13 +1,70 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
 import unittest
 from unittest.mock import patch
 from google.cloud import language_v1
-from similarity_analyzer.google_nlp import analyze_sentiment, analyze_entities
+from similarity_analyzer import google_nlp
+from similarity_analyzer.google_nlp import analyze_sentiment, analyze_entities, analyze_all_sections
+from similarity_analyzer.nlp_cache import NLPResultCache
+from similarity_analyzer.quota import QuotaScheduler, QuotaStore
+
+class FakeLanguageClient:
+    """
+    Stands in for LanguageServiceClient, recording annotateText requests.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def annotate_text(self, request):
+        with self._lock:
+            self.requests.append(request)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+
+        text = request['document'].content
+        response = language_v1.AnnotateTextResponse()
+        response.document_sentiment.score = len(text) / 100
+        entity = language_v1.Entity()
+        entity.name = text.split()[0]
+        response.entities.append(entity)
+        return response
 
 class TestGoogleNLP(unittest.TestCase):
     """
     Unit tests for the google_nlp module.
     """
 
+    def setUp(self):
+        google_nlp.reset_client()
+        self.addCleanup(google_nlp.reset_client)
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.cache = NLPResultCache(os.path.join(tmpdir.name, "nlp.sqlite"))
+        cache_patch = patch.object(google_nlp, 'get_nlp_cache', return_value=self.cache)
+        cache_patch.start()
+        self.addCleanup(cache_patch.stop)
+        self.quota_store = QuotaStore(os.path.join(tmpdir.name, "quota.sqlite"))
+        self.use_quota(1000)
+
+    def use_quota(self, rate):
+        """Routes Cloud NLP calls through a fresh scheduler admitting `rate` requests per second."""
+        scheduler = QuotaScheduler(self.quota_store, {"cloud_nlp": rate})
+        quota_patch = patch.object(google_nlp, 'get_quota_scheduler', return_value=scheduler)
+        quota_patch.start()
+        self.addCleanup(quota_patch.stop)
+        return scheduler
+
     @patch('google.cloud.language_v1.LanguageServiceClient')
     def test_analyze_sentiment(self, mock_client):
         """
@@ -39,5 +96,75 @@ class TestGoogleNLP(unittest.TestCase):
         self.assertEqual(result[0].name, "Google")
         self.assertEqual(result[0].type_, language_v1.Entity.Type.ORGANIZATION)
 
+    @patch('google.cloud.language_v1.LanguageServiceClient')
+    def test_client_is_shared(self, mock_client):
+        """
+        Test that repeated calls reuse a single LanguageServiceClient.
+        """
+        mock_client.return_value.analyze_sentiment.return_value = language_v1.AnalyzeSentimentResponse()
+
+        analyze_sentiment("First call.")
+        analyze_sentiment("Second call.")
+        self.assertEqual(mock_client.call_count, 1)
+
+    def test_analyze_all_sections_single_request_per_distinct_section(self):
+        """
+        Test that each distinct section is annotated once and results map back to every section.
+        """
+        client = FakeLanguageClient()
+        sections = ["Alpha section text", "Beta section", "Alpha section text", "Gamma"]
+
+        sentiments, entities = asyncio.run(analyze_all_sections(sections, client=client))
+
+        self.assertEqual(len(client.requests), 3)
+        features = client.requests[0]['features']
+        self.assertTrue(features['extract_entities'] and features['extract_document_sentiment'])
+        self.assertEqual([e[0].name for e in entities], ["Alpha", "Beta", "Alpha", "Gamma"])
+        self.assertAlmostEqual(sentiments[0].score, sentiments[2].score)
+        self.assertAlmostEqual(sentiments[3].score, 0.05, places=5)
+
+    def test_analyze_all_sections_bounds_concurrency(self):
+        """
+        Test that no more than max_concurrency requests are in flight at once.
+        """
+        client = FakeLanguageClient(delay=0.02)
+        sections = [f"Section {i}" for i in range(12)]
+
+        asyncio.run(analyze_all_sections(sections, client=client, max_concurrency=3))
+
+        self.assertEqual(len(client.requests), 12)
+        self.assertLessEqual(client.max_in_flight, 3)
+
+    def test_cached_sections_skip_client_and_quota(self):
+        """
+        Test that a second analysis of the same sections is served from the cache without waiting.
+        """
+        sections = ["Cached section one", "Cached section two"]
+        first_sentiments, _ = asyncio.run(analyze_all_sections(sections, client=FakeLanguageClient()))
+
+        client = FakeLanguageClient()
+        # A quota this slow would stall any request that reached it
+        slow_scheduler = self.use_quota(0.001)
+        sentiments, entities = asyncio.run(analyze_all_sections(sections, client=client))
+
+        self.assertEqual(client.requests, [])
+        self.assertEqual(slow_scheduler.total_wait, 0)
+        self.assertEqual([e[0].name for e in entities], ["Cached", "Cached"])
+        self.assertAlmostEqual(sentiments[1].score, first_sentiments[1].score)
+
+    @patch('google.cloud.language_v1.LanguageServiceClient')
+    def test_analyze_sentiment_cache_hit(self, mock_client):
+        """
+        Test that analyze_sentiment only calls the API for uncached text.
+        """
+        mock_response = language_v1.AnalyzeSentimentResponse()
+        mock_response.document_sentiment.score = 0.5
+        mock_client.return_value.analyze_sentiment.return_value = mock_response
+
+        analyze_sentiment("Repeated text.")
+        result = analyze_sentiment("Repeated text.")
+        self.assertAlmostEqual(result.score, 0.5, places=7)
+        self.assertEqual(mock_client.return_value.analyze_sentiment.call_count, 1)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import numpy as np
+from similarity_analyzer.heatmap_generator import bin_sections, generate_heatmap
+
+class TestHeatmapGenerator(unittest.TestCase):
+    """
+    Unit tests for the heatmap_generator module.
+    """
+
+    def test_bin_sections_respects_regions_and_bin_limit(self):
+        """
+        Test that bins never span two regions, cover every section once and stay within the limit.
+        """
+        regions = ["nav 1"] * 10 + ["main 1"] * 1985 + ["footer 1"] * 5
+        bins = bin_sections(len(regions), regions, max_bins=50)
+        self.assertLessEqual(len(bins), 50)
+        self.assertEqual([b["start"] for b in bins[1:]], [b["stop"] for b in bins[:-1]])
+        self.assertEqual((bins[0]["start"], bins[-1]["stop"]), (0, 2000))
+        for b in bins:
+            self.assertEqual(len(set(regions[b["start"]:b["stop"]])), 1)
+        self.assertEqual(bins[0]["label"], "nav 1: Sections 1-10")
+        self.assertEqual(bins[-1]["label"], "footer 1: Sections 1996-2000")
+
+    def test_bin_sections_without_regions(self):
+        """
+        Test that sections are split into equal runs when regions are missing or too many.
+        """
+        self.assertEqual(len(bin_sections(10, max_bins=20)), 10)
+        bins = bin_sections(1000, [f"article {i}" for i in range(1000)], max_bins=100)
+        self.assertLessEqual(len(bins), 100)
+        self.assertEqual(bins[0]["label"], "Sections 1-11")
+
+    def test_binned_heatmap_payload_is_bounded(self):
+        """
+        Test that a binned heatmap has one column per bin holding the bin's mean score.
+        """
+        scores = np.arange(5000, dtype=float) % 10
+        bins = bin_sections(len(scores), max_bins=100)
+        fig = generate_heatmap(scores, None, bins=bins)
+        z = np.asarray(fig.data[0].z)
+        self.assertEqual(z.shape, (1, len(bins)))
+        self.assertAlmostEqual(z[0, 0], scores[bins[0]["start"]:bins[0]["stop"]].mean(), places=3)
+
+        matrix = np.vstack([scores, 10 - scores])
+        fig = generate_heatmap(matrix, None, ["a", "b"], bins=bins)
+        self.assertEqual(np.asarray(fig.data[0].z).shape, (2, len(bins)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+import requests
+from similarity_analyzer.instrumentation import SamplingProfiler, Telemetry, serve_metrics
+
+class TestInstrumentation(unittest.TestCase):
+    """
+    Unit tests for the instrumentation module.
+    """
+
+    def test_spans_and_counters_render_as_prometheus(self):
+        """
+        Test that spans are aggregated per name and labels and rendered with counters.
+        """
+        telemetry = Telemetry()
+        for _ in range(3):
+            with telemetry.span("embed_batch", backend="onnx"):
+                pass
+        telemetry.count("retries_total", 2, api="gemini")
+
+        spans = telemetry.snapshot()["spans"]
+        self.assertEqual(spans[("embed_batch", (("backend", "onnx"),))]["count"], 3)
+        text = telemetry.render_prometheus()
+        self.assertIn('similarity_analyzer_span_seconds_count{backend="onnx",span="embed_batch"} 3', text)
+        self.assertIn('similarity_analyzer_retries_total{api="gemini"} 2', text)
+
+    def test_trace_file(self):
+        """
+        Test that traced spans are written as Chrome trace events, up to the event limit.
+        """
+        telemetry = Telemetry(trace=True, max_trace_events=2)
+        for name in ("scrape", "score", "dropped"):
+            with telemetry.span(name):
+                pass
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            telemetry.write_trace(path)
+            with open(path) as f:
+                events = json.load(f)["traceEvents"]
+        self.assertEqual([event["name"] for event in events], ["scrape", "score"])
+        self.assertEqual(events[0]["ph"], "X")
+
+    def test_metrics_endpoint(self):
+        """
+        Test that the metrics endpoint serves the rendered telemetry.
+        """
+        telemetry = Telemetry()
+        telemetry.count("pages_total")
+        httpd = serve_metrics(0, render=telemetry.render_prometheus)
+        try:
+            response = requests.get(f"http://127.0.0.1:{httpd.server_address[1]}/metrics", timeout=5)
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+        self.assertIn("similarity_analyzer_pages_total 1", response.text)
+
+    def test_sampling_profiler_writes_collapsed_stacks(self):
+        """
+        Test that the profiler samples other threads' stacks into the collapsed format.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "profile.txt")
+            profiler = SamplingProfiler(path, interval=0.001).start()
+            deadline = time.perf_counter() + 0.1
+            while time.perf_counter() < deadline:
+                pass
+            profiler.stop()
+            with open(path) as f:
+                lines = f.read().splitlines()
+        self.assertTrue(any("test_sampling_profiler_writes_collapsed_stacks" in line for line in lines))
+        self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in lines))
+
+if __name__ == '__main__':
+    unittest.main()
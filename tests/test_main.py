@@ -0,0 +1,58 @@
+import sys
+import unittest
+from unittest.mock import patch
+from streamlit.testing.v1 import AppTest
+from similarity_analyzer import main
+
+SECTIONS = [f"Section about widgets number {i}" for i in range(120)]
+
+async def fake_analyze_webpage(url, query, model_name, timings=None, embed_fn=None, page=None):
+    timings.update(scrape=0.1, total=0.2)
+    page.update(title="Widgets", regions=["body"] * len(SECTIONS))
+    return SECTIONS, [float(i % 10) for i in range(len(SECTIONS))], [None] * len(SECTIONS), [[] for _ in SECTIONS]
+
+def run_app():
+    from similarity_analyzer import main
+    main.main()
+
+class TestMain(unittest.TestCase):
+    """
+    Unit tests for the main module.
+    """
+
+    def setUp(self):
+        patches = [
+            patch.object(main, "analyze_webpage", side_effect=fake_analyze_webpage),
+            patch.object(main, "get_result_store", return_value=None),
+            patch.object(main, "get_embedding_cache", return_value=None),
+            patch.object(main, "get_nlp_cache", return_value=None),
+            patch.object(main, "start_from_config"),
+            patch.dict(main.CONFIG, {"SERVER_URL": None, "TABLE_PAGE_SIZE": 50}),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        # AppTest installs its script as __main__, which spawned worker processes in later tests would re-run
+        self.addCleanup(sys.modules.__setitem__, "__main__", sys.modules["__main__"])
+
+    def test_results_survive_paging(self):
+        """
+        Test that paging through the section table reruns the app without losing the analysis.
+        """
+        app = AppTest.from_function(run_app, default_timeout=30)
+        app.run()
+        app.text_input[0].input("https://example.com/widgets")
+        app.text_input[1].input("widgets")
+        app.button[0].click().run()
+        self.assertFalse(app.exception)
+        self.assertEqual(len(app.dataframe), 1)
+        self.assertEqual(app.dataframe[0].value["Section"].tolist()[0], 1)
+
+        pager = next(widget for widget in app.number_input if widget.key == "single_sections")
+        pager.set_value(3).run()
+        self.assertFalse(app.exception)
+        self.assertEqual(len(app.dataframe), 1)
+        self.assertEqual(app.dataframe[0].value["Section"].tolist(), list(range(101, 121)))
+
+if __name__ == '__main__':
+    unittest.main()
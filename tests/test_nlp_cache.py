@@ -0,0 +1,61 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from similarity_analyzer.nlp_cache import NLPResultCache
+
+class TestNLPCache(unittest.TestCase):
+    """
+    Unit tests for the nlp_cache module.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "nlp.sqlite")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_persists_across_instances(self):
+        """
+        Test that responses written by one cache instance are read by another.
+        """
+        NLPResultCache(self.path).put("annotate", "some text", b"payload")
+        cache = NLPResultCache(self.path)
+        self.assertEqual(cache.get("annotate", "some text"), b"payload")
+        self.assertIsNone(cache.get("sentiment", "some text"))
+        self.assertEqual(cache.get_many("annotate", ["some text", "other"]), {"some text": b"payload"})
+        self.assertEqual((cache.stats()["hits"], cache.stats()["misses"]), (2, 2))
+
+    def test_expired_entries_are_ignored(self):
+        """
+        Test that entries older than the TTL are treated as misses and pruned.
+        """
+        cache = NLPResultCache(self.path, ttl=60)
+        with patch("similarity_analyzer.nlp_cache.time.time", return_value=time.time() - 120):
+            cache.put("annotate", "old", b"stale")
+        cache.put("annotate", "new", b"fresh")
+        self.assertIsNone(cache.get("annotate", "old"))
+        cache.prune()
+        (count,) = cache._connection().execute("SELECT COUNT(*) FROM results").fetchone()
+        self.assertEqual(count, 1)
+
+    def test_evicts_least_recently_used(self):
+        """
+        Test that pruning keeps only the most recently used entries.
+        """
+        cache = NLPResultCache(self.path, max_entries=2)
+        now = time.time()
+        for offset, text in enumerate(["a", "b", "c"]):
+            with patch("similarity_analyzer.nlp_cache.time.time", return_value=now + offset):
+                cache.put("annotate", text, text.encode())
+        with patch("similarity_analyzer.nlp_cache.time.time", return_value=now + 10):
+            cache.get("annotate", "a")
+        cache.prune()
+        self.assertEqual(cache.get("annotate", "a"), b"a")
+        self.assertIsNone(cache.get("annotate", "b"))
+        self.assertEqual(cache.get("annotate", "c"), b"c")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+from similarity_analyzer.onnx_embedding import length_batches
+
+try:
+    import onnx
+    from onnx import helper, TensorProto
+    import onnxruntime  # noqa: F401
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    HAS_ONNX = True
+except ImportError:
+    HAS_ONNX = False
+
+VOCAB = ["[UNK]", "search", "engine", "page", "query", "relevance", "pricing", "guide"]
+
+def write_model(model_dir: str, dim: int = 4):
+    """Writes a tiny token-embedding model and a word-level tokenizer, standing in for an exported encoder."""
+    rng = np.random.default_rng(0)
+    table = rng.normal(size=(len(VOCAB), dim)).astype(np.float32)
+    graph = helper.make_graph(
+        [helper.make_node("Gather", ["embeddings", "input_ids"], ["last_hidden_state"])],
+        "tiny_encoder",
+        [helper.make_tensor_value_info("input_ids", TensorProto.INT64, ["batch", "sequence"]),
+         helper.make_tensor_value_info("attention_mask", TensorProto.INT64, ["batch", "sequence"])],
+        [helper.make_tensor_value_info("last_hidden_state", TensorProto.FLOAT, ["batch", "sequence", dim])],
+        [helper.make_tensor("embeddings", TensorProto.FLOAT, table.shape, table.flatten())],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8)
+    onnx.save(model, os.path.join(model_dir, "model.onnx"))
+
+    tokenizer = Tokenizer(models.WordLevel({word: i for i, word in enumerate(VOCAB)}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.save(os.path.join(model_dir, "tokenizer.json"))
+    return table
+
+class TestOnnxEmbedding(unittest.TestCase):
+    """
+    Unit tests for the onnx_embedding module.
+    """
+
+    def test_length_batches(self):
+        """
+        Test that sequences are grouped by length within the padded token budget.
+        """
+        lengths = [50, 2, 3, 48, 1, 2]
+        batches = length_batches(lengths, batch_tokens=100)
+        self.assertEqual(sorted(index for batch in batches for index in batch), list(range(6)))
+        for batch in batches:
+            self.assertLessEqual(len(batch) * max(lengths[i] for i in batch), 100)
+        self.assertEqual(batches[0], [4, 1, 5, 2])
+
+    @unittest.skipUnless(HAS_ONNX, "onnx, onnxruntime and tokenizers are required")
+    def test_onnx_model_embeds_offline(self):
+        """
+        Test that the ONNX backend mean-pools, normalizes and keeps input order across batches.
+        """
+        from similarity_analyzer import embedding_generator
+        from similarity_analyzer.onnx_embedding import OnnxEmbeddingModel
+
+        with tempfile.TemporaryDirectory() as model_dir:
+            table = write_model(model_dir)
+            texts = ["search engine page query relevance", "pricing", "guide pricing", "unknown words here"]
+            model = OnnxEmbeddingModel(model_dir, threads=1, batch_tokens=4)
+            embeddings = model.embed(texts)
+
+            ids = [[VOCAB.index(word) if word in VOCAB else 0 for word in text.split()] for text in texts]
+            expected = np.stack([table[row].mean(axis=0) for row in ids])
+            expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+            np.testing.assert_allclose(embeddings, expected, rtol=1e-5, atol=1e-6)
+
+            int8_model = OnnxEmbeddingModel(model_dir, output_dtype="int8")
+            self.assertEqual(int8_model.embed(texts).dtype, np.int8)
+
+            with patch.dict(embedding_generator.EMBEDDING_MODELS), patch.dict(embedding_generator.MODEL_BACKENDS), \
+                 patch.dict(embedding_generator._models, clear=True):
+                embedding_generator.register_model("Tiny ONNX", "onnx", model_dir)
+                loaded = embedding_generator.load_model("Tiny ONNX")
+                np.testing.assert_allclose(embedding_generator.generate_embeddings(loaded, texts), expected,
+                                           rtol=1e-5, atol=1e-6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,235 @@
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+import numpy as np
+from similarity_analyzer import pipeline, text_preprocessor
+from similarity_analyzer.pipeline import analyze_webpage, analyze_webpage_stream, reanalyze_webpage
+from similarity_analyzer.snapshot_store import SnapshotStore
+
+def fake_embed_texts(model_name, texts, embed_fn=None):
+    time.sleep(0.05)
+    return np.array([[1.0, float(len(text))] for text in texts], dtype=np.float32)
+
+class TestPipeline(unittest.TestCase):
+    """
+    Unit tests for the pipeline module.
+    """
+
+    def setUp(self):
+        self.sections = [f"Section number {i} about widgets" for i in range(10)]
+        patches = [
+            patch.object(pipeline, "scrape_webpage", return_value={"title": "T", "sections": self.sections, "links": []}),
+            patch.object(pipeline, "embed_texts", side_effect=fake_embed_texts),
+            patch.object(pipeline, "analyze_all_sections", side_effect=self.fake_analyze_all_sections),
+            patch.dict(pipeline.CONFIG, {"PIPELINE_BATCH_SIZE": 4, "PIPELINE_QUEUE_SIZE": 1, "CHUNKING_ENABLED": False}),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    async def fake_analyze_all_sections(self, sections):
+        await asyncio.sleep(0.15)
+        return [None] * len(sections), [[] for _ in sections]
+
+    def test_analyze_webpage_overlaps_nlp_with_embedding(self):
+        """
+        Test that NLP analysis runs alongside embedding and stage timings are reported.
+        """
+        timings = {}
+        sections, scores, sentiments, entities = asyncio.run(analyze_webpage("https://example.com", "widgets", "model", timings))
+
+        self.assertEqual(sections, self.sections)
+        self.assertEqual(len(scores), 10)
+        self.assertEqual(len(sentiments), 10)
+        self.assertEqual(set(timings), {"scrape", "preprocess", "embed", "score", "nlp", "total"})
+        # Three embedding batches (0.15s) and NLP (0.15s) would take 0.3s if run serially
+        self.assertGreaterEqual(timings["embed"], 0.14)
+        self.assertLess(timings["total"], timings["embed"] + timings["nlp"] - 0.05)
+
+    def test_analyze_webpage_embedding_failure(self):
+        """
+        Test that a failed embedding batch aborts the analysis.
+        """
+        with patch.object(pipeline, "embed_texts", return_value=None):
+            result = asyncio.run(analyze_webpage("https://example.com", "widgets", "model"))
+        self.assertEqual(result, (None, None, None, None))
+
+    def test_preprocessing_error_is_raised(self):
+        """
+        Test that an error while preprocessing fails the analysis instead of leaving it waiting for a batch.
+        """
+        async def analyze():
+            return await asyncio.wait_for(analyze_webpage("https://example.com", "widgets", "model"), 5)
+
+        with patch.object(pipeline, "preprocess_texts", side_effect=LookupError("punkt_tab not found")):
+            with self.assertRaises(LookupError):
+                asyncio.run(analyze())
+
+    def test_large_pages_are_preprocessed_in_one_pool_run(self):
+        """
+        Test that a page big enough for the process pool is preprocessed in one call and embedded in batches.
+        """
+        preprocessed, embedded = [], []
+
+        def recording_preprocess_texts(texts):
+            preprocessed.append(len(texts))
+            return texts
+
+        def recording_embed_texts(model_name, texts, embed_fn=None):
+            embedded.append(len(texts))
+            return fake_embed_texts(model_name, texts)
+
+        with patch.object(pipeline, "preprocess_texts", side_effect=recording_preprocess_texts), \
+             patch.object(pipeline, "embed_texts", side_effect=recording_embed_texts), \
+             patch.object(text_preprocessor, "PROCESS_POOL_MIN_TEXTS", 5):
+            with patch.dict(pipeline.CONFIG, {"PREPROCESS_PROCESSES": 2}):
+                asyncio.run(analyze_webpage("https://example.com", "widgets", "model"))
+            self.assertEqual((preprocessed, embedded), ([11], [4, 4, 3]))
+
+            preprocessed.clear()
+            embedded.clear()
+            with patch.dict(pipeline.CONFIG, {"PREPROCESS_PROCESSES": 0}):
+                asyncio.run(analyze_webpage("https://example.com", "widgets", "model"))
+            self.assertEqual((preprocessed, embedded), ([4, 4, 3], [4, 4, 3]))
+
+    def test_analyze_webpage_embeds_chunks_and_scores_sections(self):
+        """
+        Test that small sections are embedded as merged chunks and every section still gets a score and embedding.
+        """
+        embedded = []
+        page = {}
+
+        def recording_embed_texts(model_name, texts, embed_fn=None):
+            embedded.extend(texts)
+            return fake_embed_texts(model_name, texts)
+
+        with patch.object(pipeline, "embed_texts", side_effect=recording_embed_texts), \
+             patch.dict(pipeline.CONFIG, {"CHUNKING_ENABLED": True, "CHUNK_MIN_TOKENS": 10}):
+            sections, scores, sentiments, _ = asyncio.run(analyze_webpage("https://example.com", "widgets", "model",
+                                                                          page=page))
+
+        self.assertEqual(sections, self.sections)
+        self.assertEqual(len(scores), 10)
+        self.assertEqual(len(sentiments), 10)
+        self.assertEqual(len(embedded), 1 + 1 + 5)  # The query, its one term and five chunks of two sections
+        self.assertEqual(scores[0], scores[1])
+        self.assertEqual(page["terms"], ["widgets"])
+        self.assertEqual(page["embeddings"].shape, (10, 2))
+        self.assertEqual(len(page["term_embeddings"]), 1)
+
+    def test_analyze_site_scores_sections_like_analyze_webpage(self):
+        """
+        Test that a crawled page is chunked and scored exactly as the same page analyzed on its own.
+        """
+        async def fake_crawl(seeds, sitemap, **options):
+            yield {"url": "https://example.com", "title": "T", "sections": self.sections, "links": []}
+
+        async def collect():
+            return [result async for result in pipeline.analyze_site("widgets", "model", ["https://example.com"],
+                                                                     index_pages=False)]
+
+        with patch.object(pipeline, "crawl", side_effect=fake_crawl), \
+             patch.dict(pipeline.CONFIG, {"CHUNKING_ENABLED": True, "CHUNK_MIN_TOKENS": 10}):
+            _, _, _, site_scores = asyncio.run(collect())[0]
+            _, page_scores, _, _ = asyncio.run(analyze_webpage("https://example.com", "widgets", "model"))
+        self.assertEqual(list(site_scores), list(page_scores))
+        self.assertEqual(site_scores[0], site_scores[1])
+
+    def test_analyze_webpage_stream_processes_fixed_size_batches(self):
+        """
+        Test that streamed sections are scored and annotated batch by batch and summarized at the end.
+        """
+        def fake_stream_webpage(url, page=None, dedup_window=None):
+            page["title"] = "Streamed"
+            for i in range(10):
+                yield f"Section {'x' * i}", "body"
+
+        batches = []
+        timings = {}
+        with patch.object(pipeline, "stream_webpage", side_effect=fake_stream_webpage):
+            summary = asyncio.run(analyze_webpage_stream(
+                "https://example.com", "widgets", "model",
+                lambda offset, sections, scores, sentiments, entities: batches.append((offset, sections, scores, sentiments)),
+                batch_size=4, timings=timings))
+
+        self.assertEqual([(offset, len(sections)) for offset, sections, _, _ in batches], [(0, 4), (4, 4), (8, 2)])
+        self.assertTrue(all(len(scores) == len(sentiments) == len(sections) for _, sections, scores, sentiments in batches))
+        self.assertEqual(summary["title"], "Streamed")
+        self.assertEqual(summary["sections"], 10)
+        self.assertEqual(len(summary["best"]), 5)
+        self.assertEqual(summary["max"], max(score for _, _, scores, _ in batches for score in scores))
+        self.assertEqual(summary["min"], summary["worst"][0]["score"])
+        self.assertLessEqual(summary["min"], summary["average"])
+        self.assertEqual(set(timings), {"scrape", "embed", "nlp", "total"})
+
+    def test_reanalyze_webpage_recomputes_changed_sections(self):
+        """
+        Test that re-analysis only embeds and annotates changed sections and reports a score diff.
+        """
+        from google.cloud import language_v1
+
+        annotated = []
+
+        async def fake_annotate(sections):
+            annotated.append(list(sections))
+            return [language_v1.Sentiment(score=0.5, magnitude=1.0) for _ in sections], [[] for _ in sections]
+
+        embedded = []
+
+        def recording_embed_texts(model_name, texts, embed_fn=None):
+            embedded.extend(texts)
+            return fake_embed_texts(model_name, texts)
+
+        with tempfile.TemporaryDirectory() as tmp, \
+             patch.object(pipeline, "analyze_all_sections", side_effect=fake_annotate), \
+             patch.object(pipeline, "embed_texts", side_effect=recording_embed_texts):
+            store = SnapshotStore(os.path.join(tmp, "snapshots.sqlite"))
+            result = asyncio.run(reanalyze_webpage("https://example.com", "widgets", "model", store=store))
+            self.assertEqual(result[0], self.sections)
+            self.assertEqual({change["status"] for change in result[4]}, {"added"})
+
+            edited = list(self.sections)
+            edited[3] = "A rewritten paragraph about gadgets and more"
+            embedded.clear()
+            timings = {}
+            with patch.object(pipeline, "scrape_webpage", return_value={"title": "T", "sections": edited, "links": [],
+                                                                        "etag": '"v2"', "last_modified": None}):
+                sections, scores, sentiments, entities, diff = asyncio.run(
+                    reanalyze_webpage("https://example.com", "widgets", "model", timings, store=store))
+            self.assertEqual(sections, edited)
+            self.assertEqual(len(embedded), 2)  # The query and the edited section
+            self.assertEqual(annotated[-1], [edited[3]])
+            self.assertEqual((timings["recomputed"], timings["reused"]), (1, 9))
+            self.assertEqual(scores[:3], result[1][:3])
+            self.assertEqual(sentiments[0].score, 0.5)
+            self.assertEqual([change["status"] for change in diff].count("modified"), 1)
+            self.assertEqual(diff[3]["section"], edited[3])
+            self.assertAlmostEqual(diff[3]["delta"], scores[3] - result[1][3])
+
+            embedded.clear()
+            with patch.object(pipeline, "scrape_webpage", return_value={"not_modified": True, "etag": '"v2"',
+                                                                        "last_modified": None}) as scrape:
+                sections, scores, _, _, diff = asyncio.run(
+                    reanalyze_webpage("https://example.com", "widgets", "model", store=store))
+            self.assertEqual(scrape.call_args.kwargs["etag"], '"v2"')
+            self.assertEqual(sections, edited)
+            self.assertEqual(embedded, [])
+            self.assertEqual({change["status"] for change in diff}, {"unchanged"})
+
+    def test_import_does_not_load_backends(self):
+        """
+        Test that importing the entry points leaves TensorFlow, NLTK and the Google clients unloaded.
+        """
+        heavy = ['tensorflow', 'tensorflow_hub', 'google.generativeai', 'google.cloud.language_v1', 'sklearn', 'nltk']
+        code = ("import sys, similarity_analyzer.pipeline, similarity_analyzer.cli, similarity_analyzer.main; "
+                f"print([name for name in {heavy!r} if name in sys.modules])")
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), "[]")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from similarity_analyzer.quantization import QuantizedEmbeddings, quantization_report, quantize_rows
+from similarity_analyzer.similarity_scorer import calculate_similarity, calculate_similarity_matrix
+
+class TestQuantization(unittest.TestCase):
+    """
+    Unit tests for the quantization module.
+    """
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.embeddings = rng.normal(size=(50, 32)) * rng.uniform(0.1, 5.0, size=(50, 1))
+        self.queries = rng.normal(size=(3, 32))
+
+    def test_quantized_storage_size(self):
+        """
+        Test that float16 and int8 storage take a half and about a quarter of float32.
+        """
+        float32 = QuantizedEmbeddings.quantize(self.embeddings, "float32")
+        float16 = QuantizedEmbeddings.quantize(self.embeddings, "float16")
+        int8 = QuantizedEmbeddings.quantize(self.embeddings, "int8")
+        self.assertEqual(float16.nbytes * 2, float32.nbytes)
+        self.assertEqual(int8.nbytes, 50 * 32 + 50 * 4)
+        self.assertEqual(int8.values.dtype, np.int8)
+        self.assertEqual(int(np.abs(int8.values).max(axis=1).min()), 127)
+
+    def test_quantized_scores_match_float32(self):
+        """
+        Test that scoring quantized sections stays close to exact cosine similarity.
+        """
+        expected = calculate_similarity_matrix(self.queries, self.embeddings)
+        for dtype, tolerance in (("float32", 1e-4), ("float16", 1e-2), ("int8", 0.1)):
+            stored = QuantizedEmbeddings.quantize(self.embeddings, dtype, block_rows=16)
+            np.testing.assert_allclose(calculate_similarity_matrix(self.queries, stored), expected, atol=tolerance)
+            np.testing.assert_allclose(stored.dot(self.queries, block_rows=7), stored.dot(self.queries), atol=1e-6)
+        scores = calculate_similarity(self.queries[:1], QuantizedEmbeddings.quantize(self.embeddings, "int8"))
+        self.assertEqual(len(scores), 50)
+
+    def test_quantize_rows(self):
+        """
+        Test that rows are normalized and int8 rows use the full range with a scale each.
+        """
+        embeddings = np.array([[0.6, -0.8, 0.0], [2.0, 0.0, 0.0]], dtype=np.float32)
+        values, scales = quantize_rows(embeddings, "float16")
+        self.assertEqual(values.dtype, np.float16)
+        self.assertIsNone(scales)
+        np.testing.assert_allclose(values[1], [1.0, 0.0, 0.0])
+        values, scales = quantize_rows(embeddings, "int8")
+        np.testing.assert_array_equal(values, [[95, -127, 0], [127, 0, 0]])
+        np.testing.assert_allclose(values * scales[:, None], [[0.6, -0.8, 0.0], [1.0, 0.0, 0.0]], atol=0.01)
+
+    def test_save_and_load(self):
+        """
+        Test that quantized embeddings round-trip through .npy files, int8 scales included.
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for dtype in ("float16", "int8"):
+                path = os.path.join(tmpdir, f"{dtype}.npy")
+                stored = QuantizedEmbeddings.quantize(self.embeddings, dtype)
+                stored.save(path)
+                loaded = QuantizedEmbeddings.load(path)
+                self.assertEqual(loaded.dtype, dtype)
+                np.testing.assert_array_equal(loaded.dequantize(), stored.dequantize())
+                np.testing.assert_array_equal(loaded.dot(self.queries), stored.dot(self.queries))
+
+    def test_zero_rows(self):
+        """
+        Test that all-zero embeddings score 0 instead of producing NaN.
+        """
+        stored = QuantizedEmbeddings.quantize(np.zeros((2, 4)), "int8")
+        self.assertTrue(np.array_equal(stored.dot(np.ones((1, 4))), np.zeros((1, 2))))
+
+    def test_quantization_report(self):
+        """
+        Test that the accuracy report measures error and top-k recall against float32.
+        """
+        report = quantization_report(self.embeddings, self.queries, "int8", k=5)
+        self.assertEqual(report["bytes_per_vector"], 36)
+        self.assertLess(report["max_abs_error"], 0.1)
+        self.assertGreaterEqual(report["top_k_recall"], 0.8)
+        self.assertEqual(quantization_report(self.embeddings, self.queries, "float32")["max_abs_error"], 0.0)
+
+    def test_unsupported_dtype(self):
+        """
+        Test that an unknown storage type is rejected.
+        """
+        with self.assertRaises(ValueError):
+            QuantizedEmbeddings.quantize(self.embeddings, "int4")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from similarity_analyzer.config import CONFIG
+from similarity_analyzer.quota import (BATCH, INTERACTIVE, QuotaScheduler, QuotaStore, current_priority, key_id,
+                                       request_priority)
+
+class TestQuota(unittest.TestCase):
+    """
+    Unit tests for the quota module.
+    """
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = os.path.join(tmpdir.name, "quota.sqlite")
+        config_patch = patch.dict(CONFIG, {"QUOTA_BURST_SECONDS": 0.05, "QUOTA_INTERACTIVE_RESERVE": 1})
+        config_patch.start()
+        self.addCleanup(config_patch.stop)
+
+    def test_rate_is_shared_across_schedulers(self):
+        """
+        Test that schedulers with their own store on one file, as in separate processes, share a single rate.
+        """
+        schedulers = [QuotaScheduler(QuotaStore(self.path), {"gemini": 50}) for _ in range(2)]
+
+        def worker(scheduler):
+            for _ in range(5):
+                scheduler.acquire("gemini", "key")
+
+        threads = [threading.Thread(target=worker, args=(schedulers[i % 2],)) for i in range(4)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 20 requests at 50/s with a burst of 2 take at least 18 / 50 seconds
+        self.assertGreaterEqual(time.perf_counter() - start, 0.34)
+
+    def test_keys_have_separate_buckets(self):
+        """
+        Test that requests billed to another API key do not wait for the first key's quota.
+        """
+        store = QuotaStore(self.path)
+        store.take("gemini", key_id("first"), 1, 1)
+        self.assertGreater(store.take("gemini", key_id("first"), 1, 1), 0)
+        self.assertEqual(store.take("gemini", key_id("second"), 1, 1), 0)
+        self.assertNotIn("first", key_id("first"))
+
+    def test_batch_requests_leave_the_reserve(self):
+        """
+        Test that a batch request cannot take the tokens reserved for interactive requests.
+        """
+        store = QuotaStore(self.path)
+        self.assertEqual(store.take("cloud_nlp", "default", 0.1, 2), 0)
+        self.assertGreater(store.take("cloud_nlp", "default", 0.1, 2, reserve=1), 5)
+        self.assertEqual(store.take("cloud_nlp", "default", 0.1, 2), 0)
+
+    def test_interactive_request_preempts_queued_batch(self):
+        """
+        Test that an interactive request is admitted before batch requests that queued earlier.
+        """
+        scheduler = QuotaScheduler(QuotaStore(self.path), {"gemini": 10})
+        admitted = []
+
+        def batch_worker():
+            for _ in range(4):
+                scheduler.acquire("gemini", priority=BATCH)
+                admitted.append("batch")
+
+        thread = threading.Thread(target=batch_worker)
+        thread.start()
+        time.sleep(0.05)
+        waited = scheduler.acquire("gemini", priority=INTERACTIVE)
+        admitted.append("interactive")
+        thread.join()
+
+        self.assertLess(waited, 0.2)
+        self.assertLess(admitted.index("interactive"), 3)
+        self.assertGreater(scheduler.total_wait, waited)
+
+    def test_penalize_halves_rate_until_recovered(self):
+        """
+        Test that a 429 halves the refill rate and that the rate recovers over time.
+        """
+        store = QuotaStore(self.path)
+        self.assertEqual(store.take("gemini", "default", 10, 1), 0)
+        self.assertAlmostEqual(store.take("gemini", "default", 10, 1), 0.1, delta=0.02)
+        store.penalize("gemini", "default", 1)
+        self.assertAlmostEqual(store.take("gemini", "default", 10, 1), 0.2, delta=0.02)
+        # A second 429 from the same burst does not slow the bucket down further
+        store.penalize("gemini", "default", 1)
+        self.assertAlmostEqual(store.take("gemini", "default", 10, 1), 0.2, delta=0.02)
+
+        with patch.dict(CONFIG, {"QUOTA_RECOVERY_SECONDS": 0.01}):
+            time.sleep(0.15)
+            self.assertEqual(store.take("gemini", "default", 10, 1), 0)
+            self.assertAlmostEqual(store.take("gemini", "default", 10, 1), 0.1, delta=0.02)
+
+    def test_request_priority_context(self):
+        """
+        Test that the priority is set for the enclosed block only and accepts names.
+        """
+        self.assertEqual(current_priority(), INTERACTIVE)
+        with request_priority("batch"):
+            self.assertEqual(current_priority(), BATCH)
+        self.assertEqual(current_priority(), INTERACTIVE)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+import numpy as np
+from typer.testing import CliRunner
+from unittest.mock import patch
+from similarity_analyzer import result_store
+from similarity_analyzer.result_store import ResultStore, app, section_rows
+
+class TestResultStore(unittest.TestCase):
+    """
+    Unit tests for the result_store module.
+    """
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = os.path.join(tmpdir.name, "results.sqlite")
+        self.store = ResultStore(self.path)
+
+    def record(self, url, query, scores, analyzed, model="model", **kwargs):
+        sections = [f"{url} section {i}" for i in range(len(scores))]
+        sentiment = SimpleNamespace(score=0.5, magnitude=1.0)
+        entities = [[SimpleNamespace(name="Widget", type_="CONSUMER_GOOD", salience=0.7)] for _ in sections]
+        rows = section_rows(url, query, sections, scores, [sentiment] * len(sections), entities)
+        return self.store.record(url, query, model, rows, analyzed=analyzed, **kwargs)
+
+    def test_record_and_read_back_sections(self):
+        """
+        Test that a run keeps its aggregates, sections, sentiment, entities and embeddings.
+        """
+        embeddings = np.array([[1.0, 0.0], [0.0, 1.0]])
+        run_id = self.record("https://a.com/x", "widgets", [2.0, 6.0], 100.0, title="X", embeddings=embeddings)
+
+        run = self.store.runs(url="https://a.com/x")[0]
+        self.assertEqual(run["id"], run_id)
+        self.assertEqual((run["title"], run["section_count"], run["average"], run["min_score"], run["max_score"]),
+                         ("X", 2, 4.0, 2.0, 6.0))
+        sections = self.store.sections(run_id)
+        self.assertEqual([row["score"] for row in sections], [2.0, 6.0])
+        self.assertEqual(sections[1]["entities"], [{"name": "Widget", "type": "CONSUMER_GOOD", "salience": 0.7}])
+        self.assertEqual(sections[0]["sentiment_magnitude"], 1.0)
+        np.testing.assert_array_equal(self.store.embeddings(run_id).dequantize(), embeddings)
+        self.assertIsNone(self.store.embeddings(self.record("https://a.com/y", "widgets", [1.0], 101.0)))
+
+    def test_score_trend_is_ordered_by_time(self):
+        """
+        Test that the trend of a page lists the average of each run, oldest first, filtered by query.
+        """
+        self.record("https://a.com/x", "widgets", [4.0, 6.0], 200.0)
+        self.record("https://a.com/x", "widgets", [2.0, 4.0], 100.0)
+        self.record("https://a.com/x", "gadgets", [9.0], 150.0)
+        self.record("https://a.com/y", "widgets", [1.0], 150.0)
+
+        trend = self.store.score_trend("https://a.com/x", "widgets")
+        self.assertEqual([(run["analyzed"], run["average"]) for run in trend], [(100.0, 3.0), (200.0, 5.0)])
+        self.assertEqual(len(self.store.score_trend("https://a.com/x")), 3)
+
+    def test_worst_sections_use_latest_run_of_each_page(self):
+        """
+        Test that the worst sections for a query come from the latest run of each page under a prefix.
+        """
+        self.record("https://a.com/x", "widgets", [0.5, 7.0], 100.0)
+        self.record("https://a.com/x", "widgets", [3.0, 7.0], 200.0)
+        self.record("https://a.com/y", "widgets", [1.0, 2.0], 150.0)
+        self.record("https://b.com/z", "widgets", [0.1], 150.0)
+        self.record("https://a.com/y", "gadgets", [0.0], 150.0)
+
+        worst = self.store.worst_sections("widgets", url_prefix="https://a.com/", limit=3)
+        self.assertEqual([(row["url"], row["score"]) for row in worst],
+                         [("https://a.com/y", 1.0), ("https://a.com/y", 2.0), ("https://a.com/x", 3.0)])
+        self.assertEqual(worst[2]["analyzed"], 200.0)
+        self.assertEqual(self.store.worst_sections("widgets", limit=1)[0]["url"], "https://b.com/z")
+        self.assertEqual(self.store.worst_sections("widgets", model="other"), [])
+
+    def test_queries_answer_quickly_on_a_large_history(self):
+        """
+        Test that trend and worst-section queries stay fast with thousands of runs.
+        """
+        for day in range(20):
+            for page in range(100):
+                self.store.record(f"https://a.com/{page}", "widgets", "model",
+                                  ({"section": f"page {page} section {i}", "score": (page * 7 + i + day) % 10}
+                                   for i in range(20)), analyzed=day * 86400.0)
+        start = time.perf_counter()
+        trend = self.store.score_trend("https://a.com/42", "widgets", "model")
+        trend_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        worst = self.store.worst_sections("widgets", "model", limit=10)
+        worst_seconds = time.perf_counter() - start
+
+        self.assertEqual(len(trend), 20)
+        self.assertEqual(len(worst), 10)
+        self.assertTrue(all(row["analyzed"] == 19 * 86400.0 for row in worst))
+        self.assertLess(trend_seconds, 0.05)
+        self.assertLess(worst_seconds, 0.2)
+
+    def test_commands_print_stored_results(self):
+        """
+        Test that the trend and worst commands read the store without analyzing anything.
+        """
+        self.record("https://a.com/x", "widgets", [2.0, 6.0], 100.0)
+        with patch.object(result_store, "ResultStore", return_value=self.store):
+            trend = CliRunner().invoke(app, ["trend", "https://a.com/x"])
+            worst = CliRunner().invoke(app, ["worst", "widgets", "--limit", "1"])
+        self.assertEqual(trend.exit_code, 0, trend.output)
+        self.assertIn("4.00 (min 2.00, max 6.00, 2 sections)  widgets [model]", trend.output)
+        self.assertEqual(worst.exit_code, 0, worst.output)
+        self.assertIn("2.00  https://a.com/x #1  https://a.com/x section 0", worst.output)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import numpy as np
+import requests
+from similarity_analyzer import pipeline, server
+from similarity_analyzer.client import (analyze_remote, analyze_queries_remote, analyze_site_remote, history_remote,
+                                        search_remote, server_health)
+from similarity_analyzer.result_store import ResultStore
+from similarity_analyzer.server import ScoringServer
+from similarity_analyzer.vector_index import VectorIndex
+from test_onnx_embedding import HAS_ONNX, write_model
+
+def fake_worker_embed(model_name, texts, priority):
+    return np.array([[1.0, float(len(text))] for text in texts], dtype=np.float32)
+
+async def fake_analyze_all_sections(sections):
+    return [None] * len(sections), [[] for _ in sections]
+
+def fake_scrape_webpage(url):
+    return {"title": "T", "sections": [f"{url} section {i}" for i in range(3)], "links": []}
+
+async def fake_crawl(seeds, sitemap, **options):
+    for url in seeds[:options.get("max_pages", len(seeds))]:
+        yield {"url": url, **fake_scrape_webpage(url)}
+
+class TestServer(unittest.TestCase):
+    """
+    Unit tests for the server module.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.store = ResultStore(os.path.join(self.tmpdir.name, "results.sqlite"))
+        patches = [
+            patch.object(server, "get_result_store", return_value=self.store),
+            patch.object(pipeline, "scrape_webpage", side_effect=fake_scrape_webpage),
+            patch.object(pipeline, "analyze_all_sections", side_effect=fake_analyze_all_sections),
+            patch.dict(pipeline.CONFIG, {"EMBEDDING_CACHE_ENABLED": False}),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def start_server(self, **kwargs):
+        scoring_server = ScoringServer("127.0.0.1", 0, **kwargs)
+        thread = threading.Thread(target=scoring_server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(scoring_server.shutdown)
+        return scoring_server
+
+    @patch.object(server, "_worker_embed", side_effect=fake_worker_embed)
+    def test_concurrent_requests_share_embedding_batches(self, worker_embed):
+        """
+        Test that concurrent analyses are merged into shared embedding batches and reported in metrics.
+        """
+        scoring_server = self.start_server(workers=1, models=["model"], batch_wait=0.2,
+                                           executor=ThreadPoolExecutor(max_workers=1))
+        scoring_server.ready.wait(5)
+        self.assertEqual(server_health(scoring_server.url)["status"], "ok")
+
+        urls = [f"https://example.com/{i}" for i in range(4)]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda url: analyze_remote(scoring_server.url, url, "query", "model"), urls))
+
+        for url, (sections, scores, sentiments, entities) in zip(urls, results):
+            self.assertEqual(sections, fake_scrape_webpage(url)["sections"])
+            self.assertEqual(len(scores), 3)
+            self.assertEqual(sentiments, [None] * 3)
+        # Four requests arrived within one batching window
+        self.assertLess(worker_embed.call_count, 4)
+
+        metrics = requests.get(f"{scoring_server.url}/metrics", timeout=5).text
+        self.assertIn("similarity_analyzer_requests_total 4", metrics)
+        self.assertIn("similarity_analyzer_embedding_batch_requests_total 4", metrics)
+
+    @patch.object(server, "_worker_embed", side_effect=fake_worker_embed)
+    def test_every_mode_runs_on_the_server(self, worker_embed):
+        """
+        Test multi-query, site crawl, site search and history through the client, and the page data of /analyze.
+        """
+        index = VectorIndex(os.path.join(self.tmpdir.name, "index"), dtype="float32")
+        for p in (patch.object(pipeline, "crawl", fake_crawl),
+                  patch.object(pipeline, "get_vector_index", return_value=index)):
+            p.start()
+            self.addCleanup(p.stop)
+        scoring_server = self.start_server(workers=1, models=["model"], executor=ThreadPoolExecutor(max_workers=1))
+        url = scoring_server.url
+
+        page = {}
+        sections, scores, _, _ = analyze_remote(url, "https://example.com/a", "search engine", "model", page=page)
+        self.assertEqual(page["title"], "T")
+        self.assertEqual(page["embeddings"].shape, (3, 2))
+        self.assertEqual(page["query_embedding"].shape, (2,))
+        self.assertEqual(page["terms"], ["search", "engine"])
+        self.assertEqual(page["term_embeddings"].shape, (2, 2))
+        np.testing.assert_allclose(page["query_embedding"], [1.0, len("search engin")])
+        # Embeddings are only sent when asked for
+        plain = requests.post(f"{url}/analyze", json={"url": "https://example.com/a", "query": "q"}, timeout=5).json()
+        self.assertEqual(plain["title"], "T")
+        self.assertNotIn("embeddings", plain)
+
+        sections, score_matrix, summaries = analyze_queries_remote(url, "https://example.com/b", ["q1", "query 2"],
+                                                                   "model", top_k=2)
+        self.assertEqual(score_matrix.shape, (2, 3))
+        self.assertEqual([summary["query"] for summary in summaries], ["q1", "query 2"])
+        self.assertEqual(len(summaries[0]["top_sections"]), 2)
+
+        seeds = [f"https://example.com/site/{i}" for i in range(3)]
+        pages = list(analyze_site_remote(url, "widgets", "model", seeds, max_pages=2))
+        self.assertEqual([page[0] for page in pages], seeds[:2])
+        self.assertEqual(pages[0][1:3], ("T", fake_scrape_webpage(seeds[0])["sections"]))
+        results = search_remote(url, "widgets", "model", k=3)
+        self.assertEqual({result["url"] for result in results}, set(seeds[:2]))
+
+        # Every analysis was recorded in the server's result store
+        self.assertEqual(len(self.store.runs()), 2 + 2 + 2)
+        self.assertEqual(self.store.runs(url="https://example.com/a")[0]["title"], "T")
+        self.assertIsNotNone(self.store.embeddings(self.store.runs(url="https://example.com/a")[0]["id"]))
+        history = history_remote(url, seeds[0], "widgets", "model")
+        self.assertEqual(len(history["trend"]), 1)
+        self.assertEqual({row["url"] for row in history["worst"]}, {seeds[0]})
+        self.assertEqual(len(history_remote(url, None, "widgets", "model", limit=4)["worst"]), 4)
+        self.assertIsNone(history_remote(url, None, None, "model"))
+
+    @patch.object(server, "_worker_embed", side_effect=fake_worker_embed)
+    def test_bad_requests(self, worker_embed):
+        """
+        Test that unknown models and missing fields are rejected with 400.
+        """
+        scoring_server = self.start_server(workers=1, models=["model"], executor=ThreadPoolExecutor(max_workers=1))
+        response = requests.post(f"{scoring_server.url}/analyze", json={"url": "https://example.com"}, timeout=5)
+        self.assertEqual(response.status_code, 400)
+        response = requests.post(f"{scoring_server.url}/analyze",
+                                 json={"url": "https://example.com", "query": "q", "model": "other"}, timeout=5)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(analyze_remote(scoring_server.url, "https://example.com", "q", "other"), (None, None, None, None))
+
+    @unittest.skipUnless(HAS_ONNX, "onnx, onnxruntime and tokenizers are required")
+    def test_worker_processes_serve_local_model(self):
+        """
+        Test the spawned worker pool end to end with a local ONNX model preloaded in each worker.
+        """
+        with tempfile.TemporaryDirectory() as model_dir:
+            write_model(model_dir)
+            with patch.dict(os.environ, {"ONNX_MODEL_DIR": model_dir}):
+                scoring_server = self.start_server(workers=2, models=["Local Sentence Encoder (ONNX)"])
+                self.assertTrue(scoring_server.ready.wait(60))
+                sections, scores, _, _ = analyze_remote(scoring_server.url, "https://example.com", "search engine",
+                                                        "Local Sentence Encoder (ONNX)")
+        self.assertEqual(len(sections), 3)
+        self.assertTrue(all(-10.0 <= score <= 10.0 for score in scores))
+
+if __name__ == '__main__':
+    unittest.main()
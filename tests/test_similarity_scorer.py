@@ -1,6 +1,6 @@
 import unittest
 import numpy as np
-from similarity_analyzer.similarity_scorer import calculate_similarity
+from similarity_analyzer.similarity_scorer import calculate_similarity, calculate_similarity_matrix, top_k_sections
 
 class TestSimilarityScorer(unittest.TestCase):
     """
@@ -18,5 +18,27 @@ class TestSimilarityScorer(unittest.TestCase):
         self.assertAlmostEqual(scores[0], 10.0)
         self.assertAlmostEqual(scores[1], 0.0)
 
+    def test_calculate_similarity_matrix(self):
+        """
+        Test that the score matrix matches per-query calculate_similarity results.
+        """
+        rng = np.random.default_rng(0)
+        query_embeddings = rng.normal(size=(4, 8))
+        section_embeddings = rng.normal(size=(6, 8))
+        matrix = calculate_similarity_matrix(query_embeddings, section_embeddings)
+        self.assertEqual(matrix.shape, (4, 6))
+        for query_embedding, row in zip(query_embeddings, matrix):
+            expected = calculate_similarity(query_embedding[None, :], section_embeddings)
+            np.testing.assert_allclose(row, expected, rtol=1e-5, atol=1e-5)
+
+    def test_top_k_sections(self):
+        """
+        Test that top_k_sections returns the best sections per query in descending order.
+        """
+        score_matrix = np.array([[1.0, 9.0, 5.0, 7.0], [3.0, 2.0, 8.0, 0.0]])
+        top = top_k_sections(score_matrix, 2)
+        self.assertEqual(top, [[(1, 9.0), (3, 7.0)], [(2, 8.0), (0, 3.0)]])
+        self.assertEqual(len(top_k_sections(score_matrix, 10)[0]), 4)
+
 if __name__ == '__main__':
     unittest.main()
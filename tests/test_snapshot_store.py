@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+from similarity_analyzer.snapshot_store import SnapshotStore, diff_scores
+
+class TestSnapshotStore(unittest.TestCase):
+    """
+    Unit tests for the snapshot_store module.
+    """
+
+    def test_save_and_load(self):
+        """
+        Test that a saved snapshot is loaded back in section order and replaced on the next save.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SnapshotStore(os.path.join(tmp, "snapshots.sqlite"))
+            self.assertIsNone(store.load("https://example.com", "q", "m"))
+            store.save("https://example.com", "q", "m", ["b", "a"], [2.0, 1.0], [b"x", None], etag='"1"')
+            snapshot = store.load("https://example.com", "q", "m")
+            self.assertEqual(snapshot["sections"], ["b", "a"])
+            self.assertEqual(snapshot["scores"], [2.0, 1.0])
+            self.assertEqual(snapshot["annotations"], [b"x", None])
+            self.assertEqual(snapshot["etag"], '"1"')
+            self.assertIsNone(store.load("https://example.com", "other query", "m"))
+
+            store.save("https://example.com", "q", "m", ["c"], [3.0], [None])
+            self.assertEqual(store.load("https://example.com", "q", "m")["sections"], ["c"])
+
+    def test_diff_scores(self):
+        """
+        Test that sections are classified as unchanged, modified, added or removed.
+        """
+        old = ["intro", "old paragraph", "footer", "gone"]
+        new = ["intro", "new paragraph", "extra", "footer"]
+        diff = diff_scores(old, [1.0, 2.0, 3.0, 4.0], new, [1.0, 5.0, 6.0, 3.0])
+        statuses = [(change["status"], change["section"]) for change in diff]
+        self.assertEqual(statuses, [("unchanged", "intro"), ("modified", "new paragraph"), ("added", "extra"),
+                                    ("unchanged", "footer"), ("removed", "gone")])
+        self.assertEqual(diff[1]["delta"], 3.0)
+        self.assertIsNone(diff[2]["old_score"])
+        self.assertIsNone(diff[4]["new_index"])
+
+if __name__ == '__main__':
+    unittest.main()
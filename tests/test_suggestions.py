@@ -0,0 +1,77 @@
+import time
+import unittest
+import numpy as np
+from similarity_analyzer.suggestions import SectionTokenIndex, format_suggestions, query_terms, suggest_improvements
+
+class TestSuggestions(unittest.TestCase):
+    """
+    Unit tests for the suggestions module.
+    """
+
+    def test_query_terms_drop_stopwords(self):
+        """
+        Test that query terms are lowercased, deduplicated and free of stopwords.
+        """
+        self.assertEqual(query_terms("The best Widgets for the best price"), ["best", "widgets", "price"])
+        self.assertEqual(query_terms("to be"), ["to", "be"])
+
+    def test_section_token_index_presence(self):
+        """
+        Test that the index matches whole lowercase tokens only.
+        """
+        index = SectionTokenIndex(["Blue Widgets here", "A widgetsmith", "widgets and gadgets"])
+        presence = index.presence(["widgets", "gadgets", "missing"])
+        np.testing.assert_array_equal(presence, [[True, False, False], [False, False, False], [True, True, False]])
+
+    def test_missing_terms_ranked_by_embedding_contribution(self):
+        """
+        Test that missing terms are ranked by query contribution and low sections get their nearest high section.
+        """
+        sections = ["cheap shoes", "running shoes for trails", "about our company", "trail running tips"]
+        scores = [2.0, 8.0, 1.0, 7.0]
+        terms = ["trail", "running", "shoes"]
+        term_embeddings = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]])
+        query_embedding = np.array([0.2, 0.9, 0.4])
+        section_embeddings = np.array([[0.0, 0.1, 1.0], [0.3, 0.7, 0.6], [1.0, 0.0, 0.1], [0.9, 0.4, 0.0]])
+
+        suggestions = suggest_improvements(sections, scores, "trail running shoes", section_embeddings=section_embeddings,
+                                           query_embedding=query_embedding, terms=terms,
+                                           term_embeddings=term_embeddings)
+
+        self.assertEqual([s["section"] for s in suggestions], [0, 2])
+        self.assertEqual(suggestions[0]["missing_terms"], ["running", "trail"])
+        self.assertEqual(suggestions[0]["nearest"], 1)
+        self.assertEqual(suggestions[1]["missing_terms"], ["running", "shoes", "trail"])
+        self.assertEqual(suggestions[1]["nearest"], 3)
+        lines = format_suggestions(suggestions, "trail running shoes")
+        self.assertEqual(len(lines), 6)
+        self.assertEqual(lines[2], "  - Expand on topics covered by Section 2 (Score: 8.00)")
+
+    def test_without_embeddings_terms_keep_query_order(self):
+        """
+        Test the lexical fallback used when no embeddings are available.
+        """
+        suggestions = suggest_improvements(["nothing relevant", "widgets galore"], [1.0, 9.0], "blue widgets online")
+        self.assertEqual(suggestions[0]["missing_terms"], ["blue", "widgets", "online"])
+        self.assertIsNone(suggestions[0]["nearest"])
+        self.assertEqual(format_suggestions(suggestions, "q")[2], "  - Expand on topics related to: q")
+
+    def test_large_page_is_handled_in_one_pass(self):
+        """
+        Test that thousands of sections and a long query are handled quickly.
+        """
+        rng = np.random.default_rng(0)
+        sections = [f"section {i} about topic{i % 50} and more text" for i in range(5000)]
+        query = " ".join(f"topic{i}" for i in range(100))
+        terms = query_terms(query)
+        start = time.perf_counter()
+        suggestions = suggest_improvements(sections, rng.uniform(0, 10, 5000), query,
+                                           section_embeddings=rng.standard_normal((5000, 64)),
+                                           query_embedding=rng.standard_normal(64), terms=terms,
+                                           term_embeddings=rng.standard_normal((len(terms), 64)))
+        self.assertLess(time.perf_counter() - start, 2.0)
+        self.assertGreater(len(suggestions), 2000)
+        self.assertTrue(all(len(s["missing_terms"]) == 5 for s in suggestions))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,7 @@
 import unittest
-from similarity_analyzer.text_preprocessor import preprocess_text
+from unittest.mock import patch
+from similarity_analyzer import text_preprocessor
+from similarity_analyzer.text_preprocessor import preprocess_text, preprocess_texts
 
 class TestTextPreprocessor(unittest.TestCase):
     """
@@ -14,5 +16,25 @@ class TestTextPreprocessor(unittest.TestCase):
         expected_output = "test sentenc punctuat stopword"
         self.assertEqual(preprocess_text(input_text), expected_output)
 
+    def test_preprocess_texts_matches_preprocess_text(self):
+        """
+        Test that the batch API returns the same output as preprocess_text, in order.
+        """
+        texts = ["Running runners ran quickly.", "The cats are sleeping!", "", "Stemming stems stemmed words."]
+        expected = [preprocess_text(text) for text in texts]
+        self.assertEqual(preprocess_texts(texts), expected)
+        with patch.object(text_preprocessor, 'PROCESS_POOL_MIN_TEXTS', 1):
+            self.assertEqual(preprocess_texts(texts, processes=2), expected)
+
+    def test_offline_mode_never_downloads(self):
+        """
+        Test that offline mode uses bundled resources without calling nltk.download.
+        """
+        with patch('nltk.download') as mock_download, \
+             patch.dict(text_preprocessor.CONFIG, {"NLTK_OFFLINE": True}):
+            self.assertEqual(preprocess_text("This is a Test sentence. It has punctuation and Stopwords!"),
+                             "test sentenc punctuat stopword")
+        mock_download.assert_not_called()
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,138 @@
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+from similarity_analyzer import vector_index
+from similarity_analyzer.vector_index import VectorIndex
+
+class TestVectorIndex(unittest.TestCase):
+    """
+    Unit tests for the vector_index module.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_exact_search_across_pages(self):
+        """
+        Test that search returns the best sections across pages with 0-10 scores.
+        """
+        index = VectorIndex(self.tmpdir.name, dtype="float32")
+        index.add_page("http://a", ["a0", "a1"], np.array([[1.0, 0.0, 0.0], [0.0, 2.0, 0.0]]))
+        index.add_page("http://b", ["b0"], np.array([[3.0, 3.0, 0.0]]))
+        results = index.search(np.array([0.0, 1.0, 0.0]), k=2)
+        self.assertEqual([(r["url"], r["section"]) for r in results], [("http://a", "a1"), ("http://b", "b0")])
+        self.assertAlmostEqual(results[0]["score"], 10.0, places=5)
+        self.assertAlmostEqual(results[1]["score"], 10.0 / np.sqrt(2), places=5)
+
+    def test_chunks_of_one_section_are_returned_once(self):
+        """
+        Test that a section indexed as several chunks is returned once, with the score of its best chunk.
+        """
+        index = VectorIndex(self.tmpdir.name)
+        index.add_page("http://a", ["a0 part 1", "a0 part 2", "a1"],
+                       np.array([[0.8, 0.6, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 1.0]]), section_indices=[0, 0, 1])
+        results = index.search(np.array([1.0, 0.0, 0.0]), k=2)
+        self.assertEqual([(r["section_index"], r["section"]) for r in results], [(0, "a0 part 2"), (1, "a1")])
+        self.assertAlmostEqual(results[0]["score"], 10.0, places=5)
+
+    def test_readding_page_replaces_sections_and_persists(self):
+        """
+        Test that re-adding a page drops its old sections and that the index survives a reload.
+        """
+        index = VectorIndex(self.tmpdir.name)
+        index.add_page("http://a", ["old"], np.array([[1.0, 0.0]]))
+        index.add_page("http://b", ["other"], np.array([[0.0, 1.0]]))
+        index.add_page("http://a", ["new"], np.array([[0.6, 0.8]]))
+        index.save()
+
+        reloaded = VectorIndex(self.tmpdir.name)
+        self.assertEqual(len(reloaded), 2)
+        results = reloaded.search(np.array([1.0, 0.0]), k=5)
+        self.assertEqual([r["section"] for r in results], ["new", "other"])
+        self.assertEqual(reloaded.delete_page("http://b"), 1)
+        self.assertEqual([r["section"] for r in reloaded.search(np.array([1.0, 0.0]), k=5)], ["new"])
+
+    def test_quantized_storage(self):
+        """
+        Test that float16 and int8 indexes rank like float32 and keep their type across reloads and compaction.
+        """
+        rng = np.random.default_rng(2)
+        embeddings = rng.normal(size=(60, 16))
+        query = rng.normal(size=16)
+        expected = None
+        for dtype in ("float32", "float16", "int8"):
+            directory = f"{self.tmpdir.name}/{dtype}"
+            index = VectorIndex(directory, dtype=dtype)
+            index.add_page("http://dropped", ["x"], embeddings[:1])
+            index.add_page("http://a", [str(i) for i in range(60)], embeddings)
+            index.delete_page("http://dropped")
+            index.save()
+            reloaded = VectorIndex(directory, dtype="float32")
+            self.assertEqual(reloaded.dtype, dtype)
+            self.assertEqual(reloaded.live_vectors().dtype, dtype)
+            results = reloaded.search(query, k=5)
+            if expected is None:
+                expected = results
+            self.assertEqual([r["section"] for r in results], [r["section"] for r in expected])
+            np.testing.assert_allclose([r["score"] for r in results], [r["score"] for r in expected], atol=0.1)
+        with self.assertRaises(ValueError):
+            VectorIndex(f"{self.tmpdir.name}/int4", dtype="int4")
+
+    def test_compact_keeps_live_sections(self):
+        """
+        Test that compaction removes dead rows without changing search results.
+        """
+        index = VectorIndex(self.tmpdir.name)
+        rng = np.random.default_rng(1)
+        for page in range(5):
+            index.add_page(f"http://{page}", [f"{page}-{i}" for i in range(3)], rng.normal(size=(3, 4)))
+        index.delete_page("http://1")
+        index.delete_page("http://3")
+        query = rng.normal(size=4)
+        before = index.search(query, k=9)
+        index.compact()
+        self.assertEqual(index.count, 9)
+        self.assertEqual(index.search(query, k=9), before)
+
+    def test_ivf_search_recall(self):
+        """
+        Test that IVF search finds nearly the same neighbours as exact search on clustered data.
+        """
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(20, 16))
+        vectors = centers[rng.integers(0, 20, size=4000)] + 0.1 * rng.normal(size=(4000, 16))
+        index = VectorIndex(self.tmpdir.name, nprobe=4)
+        for page in range(40):
+            rows = slice(page * 100, (page + 1) * 100)
+            index.add_page(f"http://page/{page}", [str(i) for i in range(100)], vectors[rows])
+        index.train(n_lists=20)
+        # Pages added after training are assigned to the existing lists
+        index.add_page("http://page/late", ["late"], centers[:1])
+
+        recalls = []
+        for query in centers[:10] + 0.1 * rng.normal(size=(10, 16)):
+            exact = {(r["url"], r["section_index"]) for r in index.search(query, k=10, exact=True)}
+            approximate = {(r["url"], r["section_index"]) for r in index.search(query, k=10)}
+            recalls.append(len(exact & approximate) / 10)
+        self.assertGreaterEqual(np.mean(recalls), 0.9)
+        self.assertEqual(index.search(centers[0], k=1)[0]["url"], "http://page/late")
+
+    def test_maybe_train_threshold(self):
+        """
+        Test that the IVF partition is only trained once the index is large enough.
+        """
+        index = VectorIndex(self.tmpdir.name)
+        index.add_page("http://a", [str(i) for i in range(50)], np.random.default_rng(0).normal(size=(50, 4)))
+        with patch.dict(vector_index.CONFIG, {"VECTOR_INDEX_IVF_MIN_SIZE": 100}):
+            self.assertFalse(index.maybe_train())
+        with patch.dict(vector_index.CONFIG, {"VECTOR_INDEX_IVF_MIN_SIZE": 50}):
+            self.assertTrue(index.maybe_train())
+            self.assertFalse(index.maybe_train())
+        self.assertIsNotNone(index.centroids)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
 from unittest.mock import patch
-from similarity_analyzer.web_scraper import scrape_webpage
+from similarity_analyzer import web_scraper
+from similarity_analyzer.web_scraper import (SectionDeduplicator, scrape_webpage, parse_html, deduplicate_sections,
+                                             stream_webpage)
 
 class TestWebScraper(unittest.TestCase):
     """
@@ -29,5 +31,89 @@ class TestWebScraper(unittest.TestCase):
         result = scrape_webpage('http://example.com')
         self.assertIsNone(result)
 
+    @patch('similarity_analyzer.web_scraper.requests.get')
+    def test_scrape_webpage_not_modified(self, MockGet):
+        """
+        Test that a conditional request answered with 304 skips parsing and keeps the validators.
+        """
+        MockGet.return_value.status_code = 304
+        MockGet.return_value.headers = {}
+
+        result = scrape_webpage('http://example.com', etag='"abc"', last_modified='Mon, 01 Jan 2024 00:00:00 GMT')
+        self.assertEqual(result, {'not_modified': True, 'etag': '"abc"', 'last_modified': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+        self.assertEqual(MockGet.call_args.kwargs['headers'],
+                         {'If-None-Match': '"abc"', 'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+
+    def test_parse_html_emits_nested_text_once(self):
+        """
+        Test that text inside nested containers is extracted once, by its nearest block.
+        """
+        html = ('<html><body><div><section>Intro<article><h2>Title</h2><p>First <b>para</b></p>'
+                '<ul><li>Item</li></ul></article>Outro</section></div>'
+                '<script>var x = 1;</script></body></html>')
+        expected = ['Intro', 'Title', 'Firstpara', 'Item', 'Outro']
+        self.assertEqual(parse_html(html)['sections'], expected)
+        with patch.object(web_scraper, 'HAS_LXML', False):
+            self.assertEqual(parse_html(html)['sections'], expected)
+
+    def test_parse_html_labels_sections_with_regions(self):
+        """
+        Test that each section is labelled with its innermost landmark element.
+        """
+        html = ('<html><body><nav><ul><li>Home</li></ul></nav><main><h1>Title</h1><article><p>Body text</p>'
+                '</article></main><footer><p>Copyright</p></footer><div>Loose text</div></body></html>')
+        result = parse_html(html)
+        self.assertEqual(result['sections'], ['Home', 'Title', 'Body text', 'Copyright', 'Loose text'])
+        self.assertEqual(result['regions'], ['nav 1', 'main 1', 'article 1', 'footer 1', 'body'])
+
+    def test_deduplicate_sections(self):
+        """
+        Test that exact and near-duplicate sections are collapsed to their first occurrence.
+        """
+        long_text = ('Our team builds fast and reliable tools for auditing the content of large websites every day. '
+                     'We help editors find weak pages, fix thin sections and measure how well each page answers '
+                     'the questions their customers actually search for.')
+        sections = ['Home', 'home!', long_text, long_text.replace('every day', 'every single day'), 'Contact']
+        self.assertEqual(deduplicate_sections(sections), ['Home', long_text, 'Contact'])
+
+    def test_bounded_deduplicator_forgets_oldest_sections(self):
+        """
+        Test that a deduplicator limited to a few sections keeps a repeat of a section it no longer remembers.
+        """
+        texts = [f'Section number {i} describes product {i} in enough words to be compared by signature'
+                 for i in range(5)]
+        deduplicator = SectionDeduplicator(max_sections=3)
+        self.assertEqual(deduplicator.filter(texts[:4]), [0, 1, 2, 3])
+        # Section 3 is still remembered, section 0 was forgotten
+        self.assertEqual(deduplicator.filter([texts[3], texts[0], 'Short', 'short']), [1, 2])
+        self.assertEqual(len(deduplicator.seen), 3)
+        self.assertLessEqual(len(deduplicator.kept), 3)
+        self.assertEqual(sum(len(bucket) for bucket in deduplicator.buckets), 3 * len(deduplicator.buckets))
+
+    @patch('similarity_analyzer.web_scraper.requests.get')
+    def test_stream_webpage_matches_parse_html(self, MockGet):
+        """
+        Test that a page fed to the incremental parser in tiny chunks yields the same sections as parse_html.
+        """
+        long_text = ('Our team builds fast and reliable tools for auditing the content of large websites every day. '
+                     'We help editors find weak pages and fix thin sections.')
+        html = ('<html><head><title>Big Page</title></head><body><main><h1>Catalog</h1>'
+                + ''.join(f'<div><p>Product {i} description</p><p>{long_text}</p></div>' for i in range(30))
+                + '</main><footer><a href="/about">About us</a></footer></body></html>')
+        body = html.encode('utf-8')
+        MockGet.return_value.headers = {'Content-Type': 'text/html'}
+        MockGet.return_value.iter_content.side_effect = lambda size: (body[i:i + 7] for i in range(0, len(body), 7))
+
+        page = {}
+        streamed = list(stream_webpage('http://example.com/big', page=page, dedup_window=4))
+
+        expected = parse_html(html, 'http://example.com/big')
+        self.assertEqual([text for text, _ in streamed], expected['sections'])
+        self.assertEqual([region for _, region in streamed], expected['regions'])
+        self.assertEqual(len(streamed), 32)
+        self.assertEqual(page['title'], 'Big Page')
+        self.assertEqual(page['links'], ['http://example.com/about'])
+        self.assertTrue(MockGet.call_args.kwargs['stream'])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file